@@ -0,0 +1,142 @@
+"""
+Admission control for simulations. Each profile has a token bucket of its own and
+every profile shares a global one, so one user cannot use up the simulator for
+everyone and everyone together cannot send it more than it can run.
+"""
+import threading
+import time
+from typing import Callable, Optional
+
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+
+from zigzag_backend import metrics
+from zigzag_backend.cache import LRUCache
+from zigzag_backend.ratelimit import TokenBucket
+
+simulations_admitted = metrics.counter(
+    "simulations_admitted", "Submissions admitted by the simulation rate limits"
+)
+simulations_throttled_user = metrics.counter(
+    "simulations_throttled_user",
+    "Submissions rejected because their user was over their rate limit",
+)
+simulations_throttled_global = metrics.counter(
+    "simulations_throttled_global",
+    "Submissions rejected because the simulator was over its global rate limit",
+)
+
+
+class Admission:
+    """Decides whether a profile may start another simulation"""
+
+    def __init__(
+        self,
+        user_rate: float,
+        user_burst: int,
+        global_rate: float,
+        global_burst: int,
+        max_users: int,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        :param user_rate: Simulations per second each profile can average
+        :param user_burst: Simulations a profile can start at once
+        :param global_rate: Simulations per second every profile together can
+        average
+        :param global_burst: Simulations every profile together can start at once
+        :param max_users: Most profiles whose buckets are remembered. A forgotten
+        profile starts again with a full bucket, so once more than max_users
+        profiles are active a throttled one can be admitted early, and only the
+        global bucket still limits it
+        :param clock: Gives the current time in seconds, for tests
+        """
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.clock = clock
+        self.global_bucket = TokenBucket(global_rate, global_burst, clock)
+        self._user_buckets = LRUCache(max_users)
+        self._lock = threading.Lock()
+
+    def admit(self, profile_id, cost: int = 1) -> float:
+        """
+        Take a token for each simulation from the profile's bucket and from the
+        global one.
+
+        :param profile_id: The profile starting the simulations
+        :param cost: Number of simulations, at most both bursts
+        :return: 0 if the simulations can start, otherwise the seconds to wait
+        before trying again
+        """
+        with self._lock:
+            bucket = self._user_buckets.get(profile_id)
+            if bucket is None:
+                bucket = TokenBucket(self.user_rate, self.user_burst, self.clock)
+                self._user_buckets.set(profile_id, bucket)
+
+        # The buckets take tokens under their own locks
+        wait = bucket.take(cost)
+        if wait:
+            simulations_throttled_user.inc()
+            return wait
+        wait = self.global_bucket.take(cost)
+        if wait:
+            # The profile did not get to use its tokens
+            bucket.give_back(cost)
+            simulations_throttled_global.inc()
+            return wait
+        simulations_admitted.inc()
+        return 0.0
+
+
+class SimulationThrottle(BaseThrottle):
+    """Rejects submissions that :class:`Admission` does not admit with a 429"""
+
+    def allow_request(self, request, view) -> bool:
+        self._wait = admit(request.user.profile.pk)
+        return not self._wait
+
+    def wait(self) -> Optional[float]:
+        return self._wait
+
+
+_admission: Optional[Admission] = None
+_admission_lock = threading.Lock()
+
+
+def admit(profile_id, cost: int = 1) -> float:
+    """
+    Ask the process-wide admission controller configured by the SIMULATION_RATE
+    setting whether a profile may start simulations.
+
+    :param profile_id: The profile starting the simulations
+    :param cost: Number of simulations, at most max_cost()
+    :return: 0 if the simulations can start, otherwise the seconds to wait
+    """
+    global _admission
+    config = settings.SIMULATION_RATE
+    if not config["ENABLED"]:
+        return 0.0
+    with _admission_lock:
+        if _admission is None:
+            _admission = Admission(
+                config["USER_RATE"],
+                config["USER_BURST"],
+                config["GLOBAL_RATE"],
+                config["GLOBAL_BURST"],
+                config["MAX_USERS"],
+            )
+    return _admission.admit(profile_id, cost)
+
+
+def max_cost() -> Optional[int]:
+    """
+    Get the most simulations that admit() can admit at once.
+
+    :return: The smaller of the user and global bursts, or None when the
+    simulation rate limits are disabled
+    """
+    config = settings.SIMULATION_RATE
+    if not config["ENABLED"]:
+        return None
+    return min(config["USER_BURST"], config["GLOBAL_BURST"])
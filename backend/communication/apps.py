@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CommunicationConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "communication"
+
+    def ready(self):
+        # Connect the signals that keep the prepared maze cache up to date
+        from communication import maze_cache  # noqa: F401
@@ -0,0 +1,202 @@
+"""
+Benchmarks of the simulation request and response paths against the code they
+replaced. They are not part of the test suite, since their timings depend on the
+machine, run them with ``python manage.py benchmark``.
+"""
+import json
+import time
+import tracemalloc
+from typing import Dict, Iterable, List
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from communication.payload import encode_maze, simulator_payload
+from communication.result_writer import ResultWriter
+from communication.telemetry import (
+    SimulatorLog,
+    telemetry_columns,
+    telemetry_json,
+    telemetry_packed,
+)
+from maze.encoding import pack_masks
+from maze.models import MazeConfiguration, RunResult
+from maze.serializers import SimulatorMazeSerializer
+
+
+def split_telemetry(log: str) -> Dict:
+    """The list-of-lines parsing the views used before SimulatorLog"""
+    lines = log.strip().split("\n")
+    directions = ["up", "right", "down", "left"]
+    telemetry = []
+    for time_step, line in enumerate(lines[:-1]):
+        direction, x, y = line.split(" ")
+        telemetry.append(
+            {
+                "time": time_step,
+                "x": int(x),
+                "y": int(y),
+                "direction": directions[int(direction)],
+            }
+        )
+    return {
+        "status": "ok",
+        "total_time": len(telemetry) - 1,
+        "telemetry": telemetry,
+        "did_win": lines[-1].startswith("1"),
+    }
+
+
+def parsing_benchmark(ticks: int = 100_000) -> List[Dict]:
+    """
+    Time splitting a log into lists against parsing and encoding it as a stream.
+
+    :param ticks: Number of ticks in the log
+    :return: The seconds taken and peak bytes allocated by each way of parsing
+    """
+    lines = [f"{i % 4} {i % 300} {i % 200}" for i in range(ticks)]
+    log = "\n".join(lines + ["1"])
+
+    def split():
+        return split_telemetry(log)
+
+    def streamed():
+        for _ in telemetry_json(SimulatorLog(log)):
+            pass
+
+    results = []
+    for name, parse in (("split", split), ("streamed", streamed)):
+        tracemalloc.start()
+        start = time.perf_counter()
+        parse()
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        results.append({"name": name, "seconds": seconds, "peak": peak})
+    return results
+
+
+def format_benchmark(ticks: int = 100_000) -> List[Dict]:
+    """
+    Time encoding telemetry in each format and measure the size of each.
+
+    :param ticks: Number of ticks to encode
+    :return: The seconds taken and characters produced by each encoder
+    """
+    log = [(i % 300, i % 200, i % 4) for i in range(ticks)]
+    results = []
+    for encode in (telemetry_json, telemetry_columns, telemetry_packed):
+        start = time.perf_counter()
+        size = len("".join(encode(log)))
+        seconds = time.perf_counter() - start
+        results.append({"name": encode.__name__, "seconds": seconds, "size": size})
+    return results
+
+
+def random_maze(size: int) -> MazeConfiguration:
+    """An unsaved maze of random walls"""
+    rng = np.random.default_rng(size)
+    masks = rng.integers(0, 16, size=(size, size), dtype=np.uint8)
+    return MazeConfiguration(
+        name="Random",
+        start_row=0,
+        start_col=0,
+        end_row=size - 1,
+        end_col=size - 1,
+        level_data=pack_masks(masks),
+    )
+
+
+def serialized_payload(maze_configuration: MazeConfiguration, code: str) -> str:
+    """The payload encoding the views used before the maze JSON was prepared"""
+    maze = SimulatorMazeSerializer(maze_configuration).data
+    maze["num_row"] = len(maze["level_configuration"])
+    maze["num_col"] = len(maze["level_configuration"][0])
+    return json.dumps({"maze": maze, "java_content": code})
+
+
+def payload_benchmark(
+    sizes: Iterable[int] = (15, 100, 250), repeat: int = 20
+) -> List[Dict]:
+    """
+    Time building a simulator request by serializing the whole payload, by
+    splicing the code into a prepared str maze and encoding the result, and by
+    splicing it into prepared bytes.
+
+    :param sizes: Side lengths of the mazes
+    :param repeat: How many requests to build each way
+    :return: The mean seconds per request of each way, for each size
+    """
+    code = "public class Robot { public void execute() {} }\n" * 50
+    results = []
+    for size in sizes:
+        maze = random_maze(size)
+        text = json.dumps(json.loads(encode_maze(maze)))
+        fragment = encode_maze(maze)
+        for name, build in (
+            ("serialized", lambda: serialized_payload(maze, code).encode()),
+            (
+                "spliced str",
+                lambda: (
+                    f'{{"maze": {text}, "java_content": {json.dumps(code)}}}'
+                ).encode(),
+            ),
+            ("spliced bytes", lambda: simulator_payload(fragment, code)),
+        ):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                build()
+            seconds = (time.perf_counter() - start) / repeat
+            results.append({"name": name, "size": size, "seconds": seconds})
+    return results
+
+
+def result_benchmark(count: int = 500) -> List[Dict]:
+    """
+    Time saving run results one by one against buffering them and flushing them
+    in bulk. Everything is written in a transaction that is rolled back.
+
+    :param count: Number of results to save each way
+    :return: The seconds taken by each way
+    """
+    with transaction.atomic():
+        profile = User.objects.create_user("result-benchmark").profile
+        maze = MazeConfiguration.objects.create(
+            start_row=0, start_col=0, end_row=0, end_col=0, level_configuration=[["f"]]
+        )
+
+        def results():
+            return [
+                RunResult(
+                    timestamp=timezone.now(),
+                    duration=index,
+                    did_win=False,
+                    run_error="",
+                    result_data={},
+                    profile=profile,
+                    maze_configuration=maze,
+                )
+                for index in range(count)
+            ]
+
+        writer = ResultWriter(batch_size=100, flush_interval=60, spool_path="")
+        unsaved = results()
+        start = time.perf_counter()
+        for result in unsaved:
+            result.save()
+        saved = time.perf_counter() - start
+
+        unsaved = results()
+        start = time.perf_counter()
+        writer.add(*unsaved)
+        buffered = time.perf_counter() - start
+        writer.flush()
+        flushed = time.perf_counter() - start
+        transaction.set_rollback(True)
+    return [
+        {"name": "saved one by one", "seconds": saved},
+        {"name": "buffered", "seconds": buffered},
+        {"name": "flushed", "seconds": flushed},
+    ]
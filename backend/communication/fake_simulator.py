@@ -0,0 +1,134 @@
+"""
+A stand-in for the simulation manager that speaks its /file JSON contract, so the
+backend can be run and load tested without the Java simulator. It answers like
+the mock in mock/simulator, and can also be made slow, unreliable or chatty.
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+_DEFAULT_LOG = "0 1 2\n3 4 5\n1 successful"
+# The direction numbers the simulator logs and the (x, y) step of each
+_STEPS = ((0, -1), (1, 0), (0, 1), (-1, 0))
+
+
+class FakeSimulator(ThreadingHTTPServer):
+    """
+    A fake simulation manager. Code that is "loop", "error" or "timeout" gets the
+    same answer as from the mock simulator, and anything else a successful run.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address,
+        latency: float = 0,
+        jitter: float = 0,
+        error_rate: float = 0,
+        log_length: Optional[int] = None,
+        seed: Optional[int] = None,
+    ):
+        """
+        :param address: The host and port to listen on
+        :param latency: Mean seconds to wait before answering each request
+        :param jitter: Standard deviation of the wait, in seconds
+        :param error_rate: Fraction of requests answered with a 500
+        :param log_length: Ticks in each successful log, a random walk through
+        the maze, or None for the mock simulator's two tick log
+        :param seed: Seed for the waits, errors and walks
+        """
+        super().__init__(address, _FakeSimulatorHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.log_length = log_length
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def answer(self, request) -> tuple:
+        """
+        Decide how to answer a request to run code.
+
+        :param request: The JSON body of the request
+        :return: The seconds to wait, the status code and the JSON body to send
+        """
+        with self._lock:
+            self.requests += 1
+            wait = max(0.0, self._random.gauss(self.latency, self.jitter))
+            failed = self._random.random() < self.error_rate
+            walk_seed = self._random.getrandbits(32)
+
+        code = request.get("java_content")
+        if failed:
+            return wait, 500, {"error": "Simulated failure"}
+        if code == "loop":
+            return wait, 200, {"log": "-1\nInfinite loop", "error": None}
+        if code == "error":
+            return wait, 200, {"error": "Error details"}
+        if code == "timeout":
+            return 20, 200, {"message": "Delayed response after 20 seconds"}
+        if self.log_length is None:
+            return wait, 200, {"log": _DEFAULT_LOG, "error": None}
+        log = random_walk(request["maze"], self.log_length, random.Random(walk_seed))
+        return wait, 200, {"log": log, "error": None}
+
+
+def random_walk(maze, ticks: int, rng: random.Random) -> str:
+    """
+    Build the log of a robot wandering a maze, ignoring its walls.
+
+    :param maze: The maze of the request, with its size and start
+    :param ticks: How many ticks to log
+    :param rng: Chooses the steps
+    :return: The log, ending with the robot reaching the goal
+    """
+    rows, cols = maze["num_row"], maze["num_col"]
+    x, y = maze["start_col"], maze["start_row"]
+    lines = []
+    for _ in range(ticks):
+        direction = rng.randrange(4)
+        dx, dy = _STEPS[direction]
+        x = min(max(x + dx, 0), cols - 1)
+        y = min(max(y + dy, 0), rows - 1)
+        lines.append(f"{direction} {x} {y}")
+    lines.append("1 successful")
+    return "\n".join(lines)
+
+
+class _FakeSimulatorHandler(BaseHTTPRequestHandler):
+    server: FakeSimulator
+
+    def do_POST(self):
+        if self.path != "/file":
+            self.send_error(404)
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        wait, status, body = self.server.answer(json.loads(self.rfile.read(length)))
+        time.sleep(wait)
+        data = json.dumps(body).encode()
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The backend gave up waiting
+
+    def do_GET(self):
+        # The simulation manager's health check
+        if self.path != "/hello":
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", "5")
+        self.end_headers()
+        self.wfile.write(b"hello")
+
+    def log_message(self, *args):
+        pass
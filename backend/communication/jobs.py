@@ -0,0 +1,205 @@
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpResponse
+
+from zigzag_backend import metrics
+from zigzag_backend.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+"""Status of a job waiting for a worker"""
+RUNNING = "running"
+"""Status of a job a worker is running"""
+DONE = "done"
+"""Status of a job whose response is ready"""
+
+jobs_queued = metrics.counter(
+    "simulation_jobs_queued", "Simulation jobs waiting for a worker"
+)
+jobs_running = metrics.counter("simulation_jobs_running", "Simulation jobs running")
+jobs_rejected = metrics.counter(
+    "simulation_jobs_rejected", "Simulation jobs rejected because the queue was full"
+)
+
+
+class QueueFull(Exception):
+    """Raised when a job is submitted while the queue holds its maximum number of
+    unfinished jobs"""
+
+
+class Job:
+    """A submitted unit of work and, once it has run, the response it produced"""
+
+    def __init__(self, owner):
+        """
+        :param owner: Identifies who submitted the job, only they can look it up
+        """
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.status = QUEUED
+        self.status_code: Optional[int] = None
+        self.content: Optional[bytes] = None
+        self.content_type: Optional[str] = None
+
+    def response(self) -> HttpResponse:
+        """Build a new copy of the response the job produced"""
+        return HttpResponse(
+            self.content, status=self.status_code, content_type=self.content_type
+        )
+
+
+class JobQueue:
+    """
+    Runs jobs that produce an HTTP response on a pool of worker threads, so the
+    request that submits a job can return straight away and the response can be
+    collected later by polling with the job id. Jobs are kept in process memory,
+    so polls have to reach the process the job was submitted to.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        max_queued: int,
+        max_jobs: int,
+        ttl: Optional[float] = None,
+        eager: bool = False,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        :param workers: Number of jobs that can run at the same time
+        :param max_queued: Most unfinished jobs the queue accepts before rejecting
+        new ones
+        :param max_jobs: Most jobs remembered, the least recently looked up
+        finished jobs are forgotten first
+        :param ttl: Seconds a finished job and its response are kept for polling,
+        or None to keep them until max_jobs forgets them
+        :param eager: Run each job in the submitting thread before returning,
+        for tests
+        :param clock: Gives the current time in seconds, for tests
+        """
+        self.max_queued = max_queued
+        self.ttl = ttl
+        self.eager = eager
+        self.clock = clock
+        self._jobs = LRUCache(max_jobs)
+        # (expires, job id) of finished jobs in the order they finished
+        self._expiries = deque()
+        self._unfinished = 0
+        self._lock = threading.Lock()
+        self._executor = None
+        if not eager:
+            self._executor = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="simulation-job"
+            )
+
+    def submit(self, owner, fn: Callable[..., HttpResponse], *args) -> Job:
+        """
+        Queue `fn(*args)` to be run by a worker.
+
+        :param owner: Identifies who submitted the job, only they can look it up
+        :param fn: The work to do, returning the response for the job
+        :return: The queued job
+        :raises QueueFull: If the queue already holds max_queued unfinished jobs
+        """
+        self._forget_expired()
+        with self._lock:
+            if self._unfinished >= self.max_queued:
+                jobs_rejected.inc()
+                raise QueueFull()
+            self._unfinished += 1
+
+        job = Job(owner)
+        self._jobs.set(job.id, job)
+        jobs_queued.inc()
+        if self.eager:
+            self._run(job, fn, args)
+        else:
+            self._executor.submit(self._run, job, fn, args)
+        return job
+
+    def get(self, job_id: str, owner) -> Optional[Job]:
+        """
+        Look up a job.
+
+        :param job_id: The id of the job
+        :param owner: Who is asking for the job
+        :return: The job, or None if it does not exist, has been forgotten or
+        belongs to someone else
+        """
+        self._forget_expired()
+        job = self._jobs.get(job_id)
+        if job is None or job.owner != owner:
+            return None
+        return job
+
+    def _run(self, job: Job, fn, args):
+        jobs_queued.dec()
+        jobs_running.inc()
+        job.status = RUNNING
+        if not self.eager:
+            close_old_connections()
+        try:
+            response = fn(*args)
+        except Exception:
+            logger.exception("Job %s failed", job.id)
+            response = HttpResponse(
+                b'{"error": "An unexpected error occurred. Please try again later."}',
+                status=500,
+                content_type="application/json",
+            )
+        finally:
+            jobs_running.dec()
+            with self._lock:
+                self._unfinished -= 1
+            if not self.eager:
+                # Worker threads have no request cycle to close their connection
+                close_old_connections()
+
+        job.status_code = response.status_code
+        job.content = response.content
+        job.content_type = response["Content-Type"]
+        job.status = DONE
+        if self.ttl is not None:
+            with self._lock:
+                self._expiries.append((self.clock() + self.ttl, job.id))
+
+    def _forget_expired(self):
+        # Every job has the same ttl, so the jobs that finished first expire first
+        now = self.clock()
+        with self._lock:
+            while self._expiries and self._expiries[0][0] <= now:
+                self._jobs.delete(self._expiries.popleft()[1])
+
+
+_queue: Optional[JobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """
+    Get the process-wide simulation job queue configured by the SIMULATION_JOBS
+    setting, starting its workers on first use.
+
+    :return: The queue
+    """
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            config = settings.SIMULATION_JOBS
+            _queue = JobQueue(
+                config["WORKERS"],
+                config["MAX_QUEUED"],
+                config["MAX_JOBS"],
+                config["TTL"],
+                config["EAGER"],
+            )
+    return _queue
@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from communication.benchmark import (
+    format_benchmark,
+    parsing_benchmark,
+    payload_benchmark,
+    result_benchmark,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the simulation request and response paths against the code they "
+        "replaced. Pick benchmarks by name, or run all of them."
+    )
+
+    benchmarks = ("parsing", "formats", "payload", "results")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "names", nargs="*", metavar="name", help=", ".join(self.benchmarks)
+        )
+        parser.add_argument(
+            "--ticks", type=int, default=100_000, help="Ticks in each simulator log"
+        )
+        parser.add_argument(
+            "--results", type=int, default=500, help="Run results to save each way"
+        )
+
+    def handle(self, *args, **options):
+        unknown = set(options["names"]) - set(self.benchmarks)
+        if unknown:
+            raise CommandError(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+        for name in options["names"] or self.benchmarks:
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            getattr(self, f"_{name}")(options)
+
+    def _parsing(self, options):
+        for result in parsing_benchmark(options["ticks"]):
+            self.stdout.write(
+                f"{result['name']:<10} {result['seconds'] * 1000:>8.0f}ms "
+                f"{result['peak'] / 2**20:>8.1f}MiB peak"
+            )
+
+    def _formats(self, options):
+        for result in format_benchmark(options["ticks"]):
+            self.stdout.write(
+                f"{result['name']:<18} {result['seconds'] * 1000:>8.0f}ms "
+                f"{result['size'] / 2**10:>8.0f}KiB"
+            )
+
+    def _payload(self, options):
+        for result in payload_benchmark():
+            size = f"{result['size']}x{result['size']}"
+            self.stdout.write(
+                f"{size:<8} {result['name']:<14} {result['seconds'] * 1000:>8.3f}ms"
+            )
+
+    def _results(self, options):
+        for result in result_benchmark(options["results"]):
+            self.stdout.write(
+                f"{result['name']:<18} {result['seconds'] * 1000:>8.2f}ms"
+            )
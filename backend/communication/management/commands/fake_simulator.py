@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from communication.fake_simulator import FakeSimulator
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a fake simulation manager that answers the backend's /file requests, "
+        "with configurable latency, error rate and log length. Point the "
+        "SIMULATOR_URL environment variable of the backend at it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=9999)
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=0,
+            help="Mean seconds to wait before answering",
+        )
+        parser.add_argument(
+            "--jitter",
+            type=float,
+            default=0,
+            help="Standard deviation of the wait, in seconds",
+        )
+        parser.add_argument(
+            "--error-rate",
+            type=float,
+            default=0,
+            help="Fraction of requests answered with a 500",
+        )
+        parser.add_argument(
+            "--log-length",
+            type=int,
+            help="Ticks in each log, instead of the mock simulator's two",
+        )
+        parser.add_argument("--seed", type=int)
+
+    def handle(self, *args, **options):
+        if not 0 <= options["error_rate"] <= 1:
+            raise CommandError("--error-rate must be between 0 and 1")
+        if options["log_length"] is not None and options["log_length"] < 1:
+            raise CommandError("--log-length must be at least 1")
+
+        server = FakeSimulator(
+            (options["host"], options["port"]),
+            latency=options["latency"],
+            jitter=options["jitter"],
+            error_rate=options["error_rate"],
+            log_length=options["log_length"],
+            seed=options["seed"],
+        )
+        host, port = server.server_address[:2]
+        self.stdout.write(f"Fake simulator listening on http://{host}:{port}/file")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f"Answered {server.requests} requests")
@@ -0,0 +1,211 @@
+import math
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Sequence, Tuple
+
+import requests
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from maze.generator import Maze
+from maze.models import MazeConfiguration, RunResult
+
+
+def percentile(latencies: Sequence[float], percent: float) -> float:
+    """
+    Get a percentile of sorted latencies by the nearest rank method.
+
+    :param latencies: The latencies, sorted
+    :param percent: The percentile, from 0 to 100
+    :return: The latency that `percent` percent of latencies are at most
+    """
+    rank = max(1, math.ceil(percent / 100 * len(latencies)))
+    return latencies[rank - 1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the simulation endpoints at a steady rate and report latency "
+        "percentiles, status codes and how fast run results are written. Requests "
+        "are started on schedule whether or not earlier ones have finished, and "
+        "latency counts from when a request was due, so a backlog shows up in it. "
+        "Run it with the settings of the backend under test, since it creates the "
+        "users and maze it submits with and counts the run results in that "
+        "database. Pair it with the fake_simulator command to test without the "
+        "simulation manager. Each user is held to the SIMULATION_RATE limits, so "
+        "by default the requests are spread over enough users that their own "
+        "limits do not throttle them. Requests throttled with 429 are reported "
+        "apart from errors."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--url",
+            default="http://localhost:8000/backend/communication/",
+            help="Base URL of the communication endpoints",
+        )
+        parser.add_argument(
+            "--endpoint", choices=("receive_file", "simulate"), default="receive_file"
+        )
+        parser.add_argument("--rps", type=float, default=10, help="Requests/second")
+        parser.add_argument("--duration", type=float, default=30, help="Seconds")
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=64,
+            help="Most requests in flight at once, the rest wait their turn",
+        )
+        parser.add_argument(
+            "--users",
+            type=int,
+            help=(
+                "Number of load-test users to spread the requests over (defaults "
+                "to enough to stay under each user's simulation rate limit)"
+            ),
+        )
+        parser.add_argument(
+            "--maze-id", type=int, help="Maze to submit to (defaults to a new one)"
+        )
+        parser.add_argument("--code", default="", help="The Java code to submit")
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=0.05,
+            help="Seconds between polls of a queued job",
+        )
+
+    def handle(self, *args, **options):
+        rps, duration = options["rps"], options["duration"]
+        if rps <= 0 or duration <= 0:
+            raise CommandError("--rps and --duration must be positive")
+        users = options["users"] or self._users_for(rps)
+        if users < 1 or options["concurrency"] < 1:
+            raise CommandError("--users and --concurrency must be at least 1")
+        rate = settings.SIMULATION_RATE
+        if rate["ENABLED"] and rps > rate["GLOBAL_RATE"]:
+            self.stderr.write(
+                self.style.WARNING(
+                    f"{rps:g}/s is over the global simulation rate limit of "
+                    f"{rate['GLOBAL_RATE']:g}/s, so some requests will be throttled"
+                )
+            )
+
+        tokens = [self._token(f"load-test-{index}") for index in range(users)]
+        maze_id = options["maze_id"] or self._maze()
+        url = options["url"].rstrip("/") + f"/{options['endpoint']}/"
+        total = max(1, round(rps * duration))
+        sessions = threading.local()
+        results_before = RunResult.objects.count()
+
+        def request(index: int, due: float) -> Tuple[float, str]:
+            if not hasattr(sessions, "session"):
+                sessions.session = requests.Session()
+            outcome = self._submit(
+                sessions.session,
+                url,
+                tokens[index % len(tokens)],
+                {"maze_id": maze_id, "user_code": options["code"]},
+                options["poll_interval"],
+            )
+            return time.perf_counter() - due, outcome
+
+        self.stdout.write(
+            f"Sending {total} requests to {url} at {rps:g}/s from {users} users"
+        )
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as executor:
+            futures = []
+            for index in range(total):
+                due = start + index / rps
+                time.sleep(max(0.0, due - time.perf_counter()))
+                futures.append(executor.submit(request, index, due))
+            outcomes = [future.result() for future in futures]
+        elapsed = time.perf_counter() - start
+        if not settings.RESULT_WRITES["EAGER"]:
+            # Let the backend save the results it is still buffering
+            time.sleep(settings.RESULT_WRITES["FLUSH_INTERVAL"])
+
+        self._report(outcomes, elapsed, RunResult.objects.count() - results_before)
+
+    @staticmethod
+    def _users_for(rps: float) -> int:
+        """Get enough users that each stays under their simulation rate limit"""
+        rate = settings.SIMULATION_RATE
+        if not rate["ENABLED"]:
+            return 1
+        return math.ceil(rps / rate["USER_RATE"])
+
+    @staticmethod
+    def _token(username: str) -> str:
+        """Get the token of a load-test user, creating the user on first use"""
+        user, _ = User.objects.get_or_create(username=username)
+        return Token.objects.get_or_create(user=user)[0].key
+
+    @staticmethod
+    def _maze() -> int:
+        """Save a new 10x10 maze to submit to"""
+        grid = Maze(10, 10).hex_grid
+        return MazeConfiguration.objects.create(
+            name="Load test",
+            start_row=0,
+            start_col=0,
+            end_row=9,
+            end_col=9,
+            level_configuration=grid,
+        ).pk
+
+    @staticmethod
+    def _submit(session, url, token, data, poll_interval) -> str:
+        """
+        Submit code, polling the job until it is done if one is queued.
+
+        :return: The final status code, or the name of the error that stopped
+        the request
+        """
+        headers = {"Authorization": f"Token {token}"}
+        try:
+            response = session.post(url, json=data, headers=headers)
+            if response.status_code == 202:
+                job_url = requests.compat.urljoin(url, response.headers["Location"])
+                while response.status_code == 202:
+                    time.sleep(poll_interval)
+                    response = session.get(job_url, headers=headers)
+        except requests.RequestException as e:
+            return type(e).__name__
+        return str(response.status_code)
+
+    def _report(self, outcomes: List[Tuple[float, str]], elapsed: float, written):
+        latencies = sorted(latency for latency, _ in outcomes)
+        statuses = Counter(outcome for _, outcome in outcomes)
+        throttled = statuses["429"]
+        errors = len(outcomes) - statuses["200"] - throttled
+
+        self.stdout.write(
+            f"Sent {len(outcomes)} requests in {elapsed:.2f}s "
+            f"({len(outcomes) / elapsed:.1f}/s)"
+        )
+        self.stdout.write(
+            "Latency: "
+            + ", ".join(
+                f"p{percent} {percentile(latencies, percent) * 1000:.0f}ms"
+                for percent in (50, 95, 99)
+            )
+            + f", max {latencies[-1] * 1000:.0f}ms"
+        )
+        self.stdout.write(
+            "Statuses: "
+            + ", ".join(
+                f"{status} x{count}" for status, count in sorted(statuses.items())
+            )
+        )
+        self.stdout.write(f"Throttled: {throttled} ({throttled / len(outcomes):.1%})")
+        self.stdout.write(f"Errors: {errors} ({errors / len(outcomes):.1%})")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Run results written: {written} ({written / elapsed:.1f}/s)"
+            )
+        )
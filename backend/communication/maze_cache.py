@@ -0,0 +1,137 @@
+"""
+A cache of the mazes submissions run in, ready to send to the simulator. Popular
+mazes and tournament mazes are looked up and serialized once, kept in a
+per-process LRU cache and in the default Django cache, and dropped from both when
+the maze or tournament is saved or deleted.
+
+Signals only reach the process that made the change, so other processes can keep
+using their own copy of a changed maze for up to LOCAL_TIMEOUT seconds. The
+default cache is only shared between processes when CACHES points it at a shared
+backend. Otherwise it is one more per-process copy, kept for TIMEOUT seconds, so
+TIMEOUT should not be longer than LOCAL_TIMEOUT.
+"""
+import time
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from communication.payload import encode_maze
+from maze.models import MazeConfiguration
+from tournament.models import Tournament
+from zigzag_backend import metrics
+from zigzag_backend.cache import LRUCache
+
+CACHE_ALIAS = "default"
+"""The entry of the CACHES setting that prepared mazes are kept in, which shares
+them between processes if its backend does"""
+
+local_hits = metrics.counter(
+    "prepared_maze_local_hits", "Maze lookups answered from the process cache"
+)
+shared_hits = metrics.counter(
+    "prepared_maze_shared_hits", "Maze lookups answered from the default cache"
+)
+misses = metrics.counter(
+    "prepared_maze_misses", "Maze lookups that had to query the database"
+)
+
+_local = LRUCache(settings.PREPARED_MAZE_CACHE["LOCAL_SIZE"])
+"""Maps cache keys to the time they expire and the prepared maze"""
+
+
+class PreparedMaze(NamedTuple):
+    """A maze a submission runs in, with the parts of the request built from it"""
+
+    maze_configuration: Optional[MazeConfiguration]
+    tournament: Optional[Tournament]
+    fragment: Optional[bytes]
+    """The JSON of the maze as the simulator reads it, from :func:`encode_maze`"""
+
+
+def get_prepared_maze(request_data) -> PreparedMaze:
+    """
+    Find the maze a submission is for, and its tournament if it has one.
+
+    :param request_data: The submission, with a maze_id or a tournament_id
+    :return: The prepared maze, with no maze configuration if there is none
+    :raises Tournament.DoesNotExist: If the tournament does not exist
+    """
+    if "tournament_id" in request_data:
+        key = _tournament_key(request_data["tournament_id"])
+    else:
+        key = _maze_key(request_data["maze_id"])
+
+    cached = _local.get(key)
+    if cached is not None and cached[0] > time.monotonic():
+        local_hits.inc()
+        return cached[1]
+
+    prepared = caches[CACHE_ALIAS].get(key)
+    if prepared is not None:
+        shared_hits.inc()
+    else:
+        misses.inc()
+        prepared = _prepare(request_data)
+        if prepared.maze_configuration is None:
+            return prepared
+        caches[CACHE_ALIAS].set(key, prepared, settings.PREPARED_MAZE_CACHE["TIMEOUT"])
+    expires = time.monotonic() + settings.PREPARED_MAZE_CACHE["LOCAL_TIMEOUT"]
+    _local.set(key, (expires, prepared))
+    return prepared
+
+
+def _prepare(request_data) -> PreparedMaze:
+    # The simulator payload and scoring read the packed level data instead
+    if "tournament_id" in request_data:
+        tournament = (
+            Tournament.objects.select_related("maze_configuration")
+            .defer("maze_configuration__level_configuration")
+            .get(pk=request_data["tournament_id"])
+        )
+        maze_configuration = tournament.maze_configuration
+    else:
+        tournament = None
+        maze_configuration = (
+            MazeConfiguration.objects.defer("level_configuration")
+            .filter(pk=request_data["maze_id"])
+            .first()
+        )
+    fragment = None
+    if maze_configuration is not None:
+        fragment = encode_maze(maze_configuration)
+    return PreparedMaze(maze_configuration, tournament, fragment)
+
+
+def _maze_key(maze_id) -> str:
+    return f"prepared-maze:maze:{maze_id}"
+
+
+def _tournament_key(tournament_id) -> str:
+    return f"prepared-maze:tournament:{tournament_id}"
+
+
+def _forget(*keys):
+    for key in keys:
+        _local.delete(key)
+    caches[CACHE_ALIAS].delete_many(keys)
+
+
+@receiver(post_save, sender=MazeConfiguration)
+@receiver(pre_delete, sender=MazeConfiguration)
+def forget_maze(sender, instance: MazeConfiguration, **kwargs):
+    """Drop a changed maze, and the tournaments that run in it. Deletions are
+    handled before the tournaments are detached from the maze."""
+    tournament_ids = Tournament.objects.filter(
+        maze_configuration=instance.pk
+    ).values_list("pk", flat=True)
+    _forget(_maze_key(instance.pk), *map(_tournament_key, tournament_ids))
+
+
+@receiver(post_save, sender=Tournament)
+@receiver(post_delete, sender=Tournament)
+def forget_tournament(sender, instance: Tournament, **kwargs):
+    """Drop a changed tournament"""
+    _forget(_tournament_key(instance.pk))
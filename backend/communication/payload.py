@@ -0,0 +1,50 @@
+"""
+Encoding of simulator requests. The maze part of a request is encoded once, when
+the maze is prepared, and each submission only encodes its code and splices the
+two together. orjson is used to encode when it is installed.
+"""
+import json
+
+from maze.models import MazeConfiguration
+from maze.serializers import SimulatorMazeSerializer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(value) -> bytes:
+    """
+    Encode a value as JSON, with orjson if it is installed.
+
+    :param value: The value
+    :return: The UTF-8 JSON
+    """
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value).encode()
+
+
+def encode_maze(maze_configuration: MazeConfiguration) -> bytes:
+    """
+    Encode a maze the way the simulator reads it.
+
+    :param maze_configuration: The maze
+    :return: The JSON of the maze
+    """
+    maze = SimulatorMazeSerializer(maze_configuration).data
+    maze["num_row"] = len(maze["level_configuration"])
+    maze["num_col"] = len(maze["level_configuration"][0])
+    return dumps(dict(maze))
+
+
+def simulator_payload(maze: bytes, java_content: str) -> bytes:
+    """
+    Build a request to run code in a maze.
+
+    :param maze: The maze's JSON from :func:`encode_maze`
+    :param java_content: The code to run
+    :return: The JSON request body
+    """
+    return b'{"maze": ' + maze + b', "java_content": ' + dumps(java_content) + b"}"
@@ -0,0 +1,148 @@
+"""
+An append-only store of compressed replays on disk, so the telemetry of every run
+can be watched again without keeping it in the database. Each replay is appended
+to the segment file of the day it was recorded as its own gzip member, and its
+run result remembers the segment, offset and length to read it back.
+
+The store is kept under the REPLAYS ROOT setting, outside MEDIA_ROOT, since
+replays are only served to the user who recorded them.
+"""
+import datetime
+import gzip
+import logging
+import os
+import re
+import struct
+import zlib
+from typing import Iterator, Optional, Tuple
+
+from django.conf import settings
+
+from communication.telemetry import SimulatorLog, telemetry_columns
+from maze.models import RunResult
+from zigzag_backend import metrics
+
+logger = logging.getLogger(__name__)
+
+replay_bytes_written = metrics.counter(
+    "replay_bytes_written", "Compressed bytes appended to the replay store"
+)
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+_READ_SIZE = 64 * 1024
+
+
+class RangeNotSatisfiable(Exception):
+    """Raised when a requested byte range lies outside a replay"""
+
+
+def _directory() -> str:
+    return settings.REPLAYS["ROOT"]
+
+
+def write_replay(result: RunResult, log: SimulatorLog):
+    """
+    Compress the telemetry of a run, in the columns format, and append it to the
+    replay store. A replay that cannot be written is logged and the run is left
+    without one.
+
+    :param result: The run, which is pointed at the stored replay
+    :param log: The log of the run
+    """
+    data = gzip.compress(
+        "".join(telemetry_columns(log)).encode(),
+        compresslevel=settings.REPLAYS["COMPRESS_LEVEL"],
+        mtime=0,
+    )
+    segment = f"{datetime.date.today():%Y-%m-%d}.gz"
+    try:
+        os.makedirs(_directory(), exist_ok=True)
+        fd = os.open(
+            os.path.join(_directory(), segment), os.O_WRONLY | os.O_APPEND | os.O_CREAT
+        )
+        try:
+            # Appends are atomic, so writers in other threads and processes can
+            # share the segment and the end of this write is where this replay ends
+            written = os.write(fd, data)
+            end = os.lseek(fd, 0, os.SEEK_CUR)
+        finally:
+            os.close(fd)
+        if written != len(data):
+            # Finishing with a second write could interleave with other writers.
+            # Replays are read from their own offset, so the partial member left
+            # behind is never read and later replays are unaffected.
+            raise OSError(f"Wrote {written} of {len(data)} bytes to {segment}")
+    except OSError:
+        logger.exception("Failed to store the replay of a run")
+        return
+    replay_bytes_written.inc(len(data))
+    result.replay_segment = segment
+    result.replay_offset = end - len(data)
+    result.replay_length = len(data)
+
+
+def replay_size(result: RunResult) -> int:
+    """
+    Get the uncompressed size of a stored replay, from its gzip trailer.
+
+    :param result: A run with a stored replay
+    :return: The size in bytes
+    """
+    with open(os.path.join(_directory(), result.replay_segment), "rb") as segment:
+        segment.seek(result.replay_offset + result.replay_length - 4)
+        (size,) = struct.unpack("<I", segment.read(4))
+    return size
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a Range header that asks for a single range of bytes.
+
+    :param header: The header, if the request had one
+    :param size: The size of the replay
+    :return: The first and last byte of the range, or None for the whole replay
+    or a header that is not a single byte range, which is ignored
+    :raises RangeNotSatisfiable: If the range starts past the end of the replay
+    """
+    match = _RANGE.match(header or "")
+    if match is None or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if not first:
+        # A suffix range, counting back from the end
+        if not int(last) or not size:
+            raise RangeNotSatisfiable()
+        return max(size - int(last), 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    return start, min(int(last), size - 1) if last else size - 1
+
+
+def read_replay(result: RunResult, start: int, end: int) -> Iterator[bytes]:
+    """
+    Read part of a stored replay, decompressing it as it is read.
+
+    :param result: A run with a stored replay
+    :param start: The first uncompressed byte to read
+    :param end: The last uncompressed byte to read
+    :return: The chunks of the range
+    """
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    position = 0
+    with open(os.path.join(_directory(), result.replay_segment), "rb") as segment:
+        segment.seek(result.replay_offset)
+        remaining = result.replay_length
+        while remaining and position <= end:
+            compressed = segment.read(min(_READ_SIZE, remaining))
+            if not compressed:
+                break
+            remaining -= len(compressed)
+            chunk = decompressor.decompress(compressed)
+            chunk_start = max(start - position, 0)
+            chunk_end = end + 1 - position
+            position += len(chunk)
+            if chunk_start < len(chunk) and chunk_end > 0:
+                yield chunk[chunk_start:chunk_end]
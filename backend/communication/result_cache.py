@@ -0,0 +1,124 @@
+"""
+A content-addressed cache of simulator responses. Resubmitting the same code
+against the same maze replays the stored response instead of running the
+simulation again, as long as nothing in the code can make two runs differ.
+"""
+import hashlib
+import re
+from typing import NamedTuple, Optional
+
+from django.core.cache import caches
+
+from maze.models import MazeConfiguration
+from zigzag_backend import metrics
+
+CACHE_ALIAS = "simulations"
+"""The entry of the CACHES setting that stores simulator responses"""
+
+cache_hits = metrics.counter(
+    "simulation_cache_hits", "Submissions answered from the simulation cache"
+)
+cache_misses = metrics.counter(
+    "simulation_cache_misses", "Cacheable submissions that had to be simulated"
+)
+
+_NONDETERMINISTIC = re.compile(
+    r"\b(?:Math\s*\.\s*random|Random|ThreadLocalRandom|SecureRandom|UUID"
+    r"|System\s*\.\s*(?:currentTimeMillis|nanoTime)|LocalDateTime|Instant)\b"
+)
+
+
+class SimulatorResult(NamedTuple):
+    """The parts of a simulator response that a run result is built from"""
+
+    status_code: int
+    text: str
+    reason: str
+
+
+def normalize_source(source: str) -> str:
+    """
+    Normalize Java source so that edits which cannot change what it does, such as
+    line endings and trailing whitespace, do not change its cache key.
+
+    :param source: The Java source code
+    :return: The normalized source
+    """
+    lines = source.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip("\n")
+
+
+def result_key(
+    source: str,
+    maze_configuration: MazeConfiguration,
+    robot_configuration_id: Optional[int] = None,
+) -> Optional[str]:
+    """
+    Get the cache key of a submission.
+
+    :param source: The submitted Java source code
+    :param maze_configuration: The maze the code runs in
+    :param robot_configuration_id: The robot configuration the code runs with
+    :return: A hash of the normalized source, the maze and the robot
+    configuration, or None if the result cannot be cached because the code may
+    behave differently each run or the maze has no packed level data
+    """
+    if (
+        maze_configuration is None
+        or maze_configuration.level_data is None
+        or _NONDETERMINISTIC.search(source)
+    ):
+        return None
+    digest = hashlib.sha256(normalize_source(source).encode())
+    # The layout is part of the key so that editing a maze invalidates its results
+    digest.update(
+        f"\0{maze_configuration.pk}\0{robot_configuration_id}"
+        f"\0{maze_configuration.start_row},{maze_configuration.start_col}"
+        f"\0{maze_configuration.end_row},{maze_configuration.end_col}\0".encode()
+    )
+    digest.update(maze_configuration.level_data)
+    return f"simulation:{digest.hexdigest()}"
+
+
+def get_cached_result(key: Optional[str]) -> Optional[SimulatorResult]:
+    """
+    Look up the stored simulator response of a submission.
+
+    :param key: The submission's :func:`result_key`
+    :return: The response, or None if it is not cached
+    """
+    if key is None:
+        return None
+    return _counted(caches[CACHE_ALIAS].get(key))
+
+
+async def aget_cached_result(key: Optional[str]) -> Optional[SimulatorResult]:
+    """The async version of :func:`get_cached_result`"""
+    if key is None:
+        return None
+    return _counted(await caches[CACHE_ALIAS].aget(key))
+
+
+def cache_result(key: Optional[str], result: SimulatorResult):
+    """
+    Store the simulator response of a submission, if it is a successful one.
+
+    :param key: The submission's :func:`result_key`
+    :param result: The simulator's response
+    """
+    if key is not None and result.status_code == 200:
+        caches[CACHE_ALIAS].set(key, tuple(result))
+
+
+async def acache_result(key: Optional[str], result: SimulatorResult):
+    """The async version of :func:`cache_result`"""
+    if key is not None and result.status_code == 200:
+        await caches[CACHE_ALIAS].aset(key, tuple(result))
+
+
+def _counted(cached) -> Optional[SimulatorResult]:
+    if cached is None:
+        cache_misses.inc()
+        return None
+    cache_hits.inc()
+    return SimulatorResult(*cached)
@@ -0,0 +1,230 @@
+"""
+Write-behind saving of run results. Submissions hand their results to a buffer
+and respond straight away, and a background thread saves the buffer with one
+bulk insert once it holds BATCH_SIZE results or every FLUSH_INTERVAL seconds.
+
+Results that cannot be saved are appended to a spool file and saved with a later
+flush once the database is back. The spool holds profile ids and run errors, so
+it is kept in a private directory set by RESULT_WRITES SPOOL. The buffer is
+flushed when the process exits, but results still buffered when a process is
+killed are lost. A spool file claimed by a process that dies or cannot spool its
+results again before saving them is left next to the spool, for an operator to
+load.
+"""
+import atexit
+import logging
+import os
+import threading
+import uuid
+from typing import List, Optional
+
+from django.conf import settings
+from django.core import serializers
+from django.core.serializers.base import DeserializationError
+from django.db import DatabaseError, DataError, IntegrityError, close_old_connections
+
+from maze.models import RunResult
+from zigzag_backend import metrics
+
+logger = logging.getLogger(__name__)
+
+results_buffered = metrics.counter(
+    "run_results_buffered", "Run results waiting to be saved"
+)
+results_written = metrics.counter("run_results_written", "Run results saved")
+results_spooled = metrics.counter(
+    "run_results_spooled", "Run results spooled to disk because saving them failed"
+)
+result_flushes = metrics.counter(
+    "run_result_flushes", "Bulk inserts of buffered run results"
+)
+
+
+class ResultWriter:
+    """
+    Buffers run results and saves them in batches on a background thread, or
+    saves each one as it is added when eager.
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        flush_interval: float,
+        spool_path: str,
+        eager: bool = False,
+    ):
+        """
+        :param batch_size: Flush once this many results are buffered, and insert
+        at most this many results per query
+        :param flush_interval: Most seconds a result waits in the buffer
+        :param spool_path: File that results which could not be saved are
+        appended to
+        :param eager: Save results in the thread that adds them, for tests
+        """
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spool_path = spool_path
+        self.eager = eager
+        self._buffer: List[RunResult] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+
+    def add(self, *results: RunResult):
+        """
+        Queue results to be saved.
+
+        :param results: The unsaved results
+        """
+        if self.eager:
+            self._save(list(results))
+            return
+        with self._lock:
+            self._buffer.extend(results)
+            full = len(self._buffer) >= self.batch_size
+        results_buffered.inc(len(results))
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        """Save the buffered results, then any spooled ones if that worked"""
+        with self._flush_lock:
+            with self._lock:
+                results, self._buffer = self._buffer, []
+            results_buffered.dec(len(results))
+            if results and not self._save(results):
+                try:
+                    self._spool(results)
+                except OSError:
+                    logger.exception("Failed to spool %d run results", len(results))
+                    # Keep them for the next flush instead of losing them
+                    with self._lock:
+                        self._buffer[:0] = results
+                    results_buffered.inc(len(results))
+            elif os.path.exists(self.spool_path):
+                self._load_spool()
+
+    def start(self):
+        """Start the background thread that flushes the buffer"""
+        if self._worker is None and not self.eager:
+            self._worker = threading.Thread(
+                target=self._run, name="result-writer", daemon=True
+            )
+            self._worker.start()
+
+    def close(self):
+        """Stop the background thread and save what is left in the buffer"""
+        self._stopped.set()
+        self._wake.set()
+        if self._worker is not None:
+            self._worker.join()
+        self.flush()
+
+    def __len__(self):
+        return len(self._buffer)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            # Worker threads have no request cycle to close their connection
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to flush run results")
+
+    def _save(self, results: List[RunResult]) -> bool:
+        try:
+            RunResult.objects.bulk_create(results, batch_size=self.batch_size)
+        except (DataError, IntegrityError):
+            if self.eager:
+                raise
+            # A bad result would fail every retry, so save the others one by one
+            logger.exception("Failed to save %d run results in bulk", len(results))
+            for result in results:
+                try:
+                    result.save()
+                except (DataError, IntegrityError):
+                    logger.exception("Dropped a run result that cannot be saved")
+                else:
+                    results_written.inc()
+            return True
+        except DatabaseError:
+            if self.eager:
+                raise
+            logger.exception("Failed to save %d run results", len(results))
+            return False
+        results_written.inc(len(results))
+        result_flushes.inc()
+        return True
+
+    def _spool(self, results: List[RunResult]):
+        # Each append starts a new line, so the rest of a partial append cannot be
+        # joined onto the first line of the next one
+        data = b"\n" + serializers.serialize("jsonl", results).encode()
+        os.makedirs(os.path.dirname(self.spool_path), exist_ok=True)
+        fd = os.open(self.spool_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+        try:
+            # One append, so processes sharing the spool do not interleave lines
+            written = os.write(fd, data)
+        finally:
+            os.close(fd)
+        if written != len(data):
+            raise OSError(f"Wrote {written} of {len(data)} bytes to the spool")
+        results_spooled.inc(len(results))
+
+    def _load_spool(self):
+        # Renaming claims the spool, so only one process saves each spooled result
+        claimed = f"{self.spool_path}.{uuid.uuid4().hex}"
+        try:
+            os.rename(self.spool_path, claimed)
+        except FileNotFoundError:
+            return
+        results = []
+        with open(claimed) as spool:
+            for line in spool:
+                try:
+                    results.extend(
+                        deserialized.object
+                        for deserialized in serializers.deserialize("jsonl", line)
+                    )
+                except DeserializationError:
+                    logger.exception("Skipped a partly written spooled run result")
+        if results and not self._save(results):
+            try:
+                self._spool(results)
+            except OSError:
+                logger.exception("Failed to spool run results again, kept %s", claimed)
+                return
+        else:
+            logger.info("Saved %d spooled run results", len(results))
+        os.remove(claimed)
+
+
+_writer: Optional[ResultWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_result_writer() -> ResultWriter:
+    """
+    Get the process-wide result writer configured by the RESULT_WRITES setting,
+    starting its thread on first use. The writer is flushed when the process exits.
+
+    :return: The writer
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            config = settings.RESULT_WRITES
+            _writer = ResultWriter(
+                config["BATCH_SIZE"],
+                config["FLUSH_INTERVAL"],
+                config["SPOOL"],
+                config["EAGER"],
+            )
+            _writer.start()
+            atexit.register(_writer.close)
+    return _writer
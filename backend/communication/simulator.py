@@ -0,0 +1,430 @@
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from typing import Callable, List, Optional
+from urllib.parse import urljoin
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from zigzag_backend import metrics
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+"""Circuit state of a simulator that requests are sent to"""
+OPEN = "open"
+"""Circuit state of a simulator that kept failing and is left alone for a while"""
+HALF_OPEN = "half-open"
+"""Circuit state of a simulator that is sent one request to see if it recovered"""
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15)
+"""Upper bounds in seconds of the simulator latency histogram buckets"""
+
+circuits_opened = metrics.counter(
+    "simulator_circuits_opened", "Times a simulator was cut off after failing"
+)
+health_check_failures = metrics.counter(
+    "simulator_health_check_failures", "Simulator health checks that failed"
+)
+simulator_unavailable = metrics.counter(
+    "simulator_unavailable",
+    "Requests that found every simulator unhealthy or cut off",
+)
+requests_in_flight = metrics.counter(
+    "simulator_requests_in_flight", "Requests waiting for the simulator to respond"
+)
+requests_queued = metrics.counter(
+    "simulator_requests_queued",
+    "Requests waiting for a free connection to the simulator",
+)
+
+
+class SimulatorUnavailable(Exception):
+    """Raised when every simulator is failing its health checks or cut off"""
+
+
+class SimulatorEndpoint:
+    """One simulation manager and what the pool knows about its health"""
+
+    def __init__(self, url: str, health_path: str):
+        """
+        :param url: The simulation manager's endpoint for running code
+        :param health_path: Path on the same server that health checks request
+        """
+        self.url = url
+        self.health_url = urljoin(url, health_path)
+        self.outstanding = 0
+        self.failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.healthy = True
+        self.latency = metrics.histogram(
+            f'simulator_latency_seconds{{endpoint="{url}"}}',
+            "Seconds the simulator took to respond",
+            LATENCY_BUCKETS,
+        )
+
+
+class SimulatorPool:
+    """
+    Spreads requests over several simulation managers. Each request goes to the
+    healthy simulator with the fewest requests outstanding. A simulator that
+    fails `failure_threshold` requests in a row has its circuit opened and gets
+    no requests for `reset_timeout` seconds, after which a single request tests
+    whether it recovered. Health checks in the background take simulators that
+    stop answering out of rotation and put them back once they answer again.
+    """
+
+    def __init__(
+        self,
+        urls: List[str],
+        failure_threshold: int,
+        reset_timeout: float,
+        health_path: str,
+        health_interval: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        :param urls: The simulation managers' endpoints for running code
+        :param failure_threshold: Failures in a row that open a circuit
+        :param reset_timeout: Seconds an open circuit waits before a test request
+        :param health_path: Path on each server that health checks request
+        :param health_interval: Seconds between health checks, 0 for none
+        :param clock: Gives the current time in seconds, for tests
+        """
+        if not urls:
+            raise ValueError("At least one simulator URL is needed")
+        self.endpoints = [SimulatorEndpoint(url, health_path) for url in urls]
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.health_interval = health_interval
+        self.clock = clock
+        self._next = 0
+        self._lock = threading.Lock()
+        self._health_thread: Optional[threading.Thread] = None
+
+    def acquire(self) -> SimulatorEndpoint:
+        """
+        Choose the simulator to send a request to and count the request as
+        outstanding on it until :meth:`release`.
+
+        :return: The simulator
+        :raises SimulatorUnavailable: If no simulator can take the request
+        """
+        self._start_health_checks()
+        with self._lock:
+            now = self.clock()
+            chosen = None
+            count = len(self.endpoints)
+            # Start from a rotating position so ties are shared out in turn
+            for offset in range(count):
+                endpoint = self.endpoints[(self._next + offset) % count]
+                if not self._available(endpoint, now):
+                    continue
+                if chosen is None or endpoint.outstanding < chosen.outstanding:
+                    chosen = endpoint
+            if chosen is None:
+                simulator_unavailable.inc()
+                raise SimulatorUnavailable()
+            self._next = (self._next + 1) % count
+            if chosen.state == OPEN:
+                chosen.state = HALF_OPEN
+            chosen.outstanding += 1
+            return chosen
+
+    def release(self, endpoint: SimulatorEndpoint, seconds: float, failed: bool):
+        """
+        Record the outcome of a request sent to a simulator.
+
+        :param endpoint: The simulator from :meth:`acquire`
+        :param seconds: How long the simulator took
+        :param failed: Did the simulator fail to answer or answer with an error
+        """
+        endpoint.latency.observe(seconds)
+        with self._lock:
+            endpoint.outstanding -= 1
+            if not failed:
+                endpoint.failures = 0
+                endpoint.state = CLOSED
+                return
+            endpoint.failures += 1
+            if (
+                endpoint.state == HALF_OPEN
+                or endpoint.failures >= self.failure_threshold
+            ):
+                if endpoint.state != OPEN:
+                    circuits_opened.inc()
+                    logger.warning("Cutting off failing simulator %s", endpoint.url)
+                endpoint.state = OPEN
+                endpoint.opened_at = self.clock()
+
+    def check_health(self, timeout: float = 2):
+        """
+        Request every simulator's health path, taking the ones that cannot be
+        reached or answer with a server error out of rotation.
+
+        :param timeout: Seconds to wait for each simulator
+        """
+        for endpoint in self.endpoints:
+            try:
+                # Any answer that is not a server error means it is up
+                response = requests.get(endpoint.health_url, timeout=timeout)
+                healthy = response.status_code < 500
+            except requests.RequestException:
+                healthy = False
+            if not healthy:
+                health_check_failures.inc()
+            if healthy != endpoint.healthy:
+                logger.warning(
+                    "Simulator %s is %s",
+                    endpoint.url,
+                    "healthy" if healthy else "unhealthy",
+                )
+            with self._lock:
+                endpoint.healthy = healthy
+
+    def _available(self, endpoint: SimulatorEndpoint, now: float) -> bool:
+        if not endpoint.healthy:
+            return False
+        if endpoint.state == OPEN:
+            return now - endpoint.opened_at >= self.reset_timeout
+        # A half-open circuit waits for the outcome of its test request
+        return endpoint.state == CLOSED
+
+    def _start_health_checks(self):
+        if self.health_interval <= 0 or self._health_thread is not None:
+            return
+        with self._lock:
+            if self._health_thread is None:
+                self._health_thread = threading.Thread(
+                    target=self._check_health_forever,
+                    name="simulator-health",
+                    daemon=True,
+                )
+                self._health_thread.start()
+
+    def _check_health_forever(self):
+        while True:
+            time.sleep(self.health_interval)
+            self.check_health()
+
+
+class SimulatorClient:
+    """
+    A shared HTTP client for the simulation managers. Connections are kept alive
+    and reused from a bounded pool, at most `max_connections` requests are sent at
+    once with the rest waiting their turn, and requests that fail to connect are
+    retried with exponential backoff. Requests that time out while the simulator
+    is running the code are not retried, since the simulation already started,
+    but they count as failures of the simulator so one that hangs is cut off.
+    """
+
+    def __init__(
+        self,
+        simulators: SimulatorPool,
+        timeout: float,
+        max_connections: int,
+        connect_retries: int,
+        backoff: float,
+    ):
+        """
+        :param simulators: The simulation managers to spread requests over
+        :param timeout: Seconds to wait for a connection and then for the response
+        :param max_connections: Most requests sent to the simulators at once
+        :param connect_retries: How many times to retry failed connections
+        :param backoff: Seconds to wait before the first retry, doubling after that
+        """
+        self.simulators = simulators
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_connections)
+        retry = Retry(
+            total=connect_retries,
+            connect=connect_retries,
+            read=False,
+            redirect=False,
+            status=0,
+            other=0,
+            backoff_factor=backoff,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=len(simulators.endpoints),
+            pool_maxsize=max_connections,
+            pool_block=True,
+            max_retries=retry,
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def post(self, payload: bytes) -> requests.Response:
+        """
+        Send code to a simulator, waiting for a free connection first.
+
+        :param payload: The JSON request body
+        :return: The simulator's response
+        :raises requests.ReadTimeout: If the simulator took too long to respond
+        :raises requests.ConnectionError: If the simulator could not be reached
+        after every retry
+        :raises SimulatorUnavailable: If no simulator can take the request
+        """
+        requests_queued.inc()
+        with self._slots:
+            requests_queued.dec()
+            endpoint = self.simulators.acquire()
+            requests_in_flight.inc()
+            start = time.perf_counter()
+            failed = True
+            try:
+                response = self.session.post(
+                    endpoint.url,
+                    data=payload,
+                    headers={"Content-Type": "application/json"},
+                    timeout=self.timeout,
+                )
+                failed = response.status_code >= 500
+                return response
+            finally:
+                requests_in_flight.dec()
+                self.simulators.release(endpoint, time.perf_counter() - start, failed)
+
+
+class AsyncSimulatorClient:
+    """
+    The asyncio counterpart of :class:`SimulatorClient`, for async views. Waiting
+    for the simulator does not hold a thread, so a process can have many
+    simulations in flight at once. The client belongs to the event loop it was
+    created on.
+    """
+
+    def __init__(
+        self,
+        simulators: SimulatorPool,
+        timeout: float,
+        max_connections: int,
+        connect_retries: int,
+    ):
+        """
+        :param simulators: The simulation managers to spread requests over
+        :param timeout: Seconds to wait for a connection and then for the response
+        :param max_connections: Most requests sent to the simulators at once
+        :param connect_retries: How many times to retry failed connections, with
+        httpx's exponential backoff
+        """
+        self.simulators = simulators
+        self._slots = asyncio.Semaphore(max_connections)
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        )
+        self.client = httpx.AsyncClient(
+            timeout=timeout,
+            transport=httpx.AsyncHTTPTransport(limits=limits, retries=connect_retries),
+        )
+
+    async def post(self, payload: bytes) -> httpx.Response:
+        """
+        Send code to a simulator, waiting for a free connection first.
+
+        :param payload: The JSON request body
+        :return: The simulator's response
+        :raises httpx.ReadTimeout: If the simulator took too long to respond
+        :raises httpx.TransportError: If the simulator could not be reached after
+        every retry
+        :raises SimulatorUnavailable: If no simulator can take the request
+        """
+        requests_queued.inc()
+        async with self._slots:
+            requests_queued.dec()
+            endpoint = self.simulators.acquire()
+            requests_in_flight.inc()
+            start = time.perf_counter()
+            failed = True
+            try:
+                response = await self.client.post(
+                    endpoint.url,
+                    content=payload,
+                    headers={"Content-Type": "application/json"},
+                )
+                failed = response.status_code >= 500
+                return response
+            finally:
+                requests_in_flight.dec()
+                self.simulators.release(endpoint, time.perf_counter() - start, failed)
+
+
+_pool: Optional[SimulatorPool] = None
+_client: Optional[SimulatorClient] = None
+_client_lock = threading.Lock()
+
+
+def get_simulator_pool() -> SimulatorPool:
+    """
+    Get the process-wide pool of simulators configured by the SIMULATOR setting,
+    shared by the sync and async clients.
+
+    :return: The pool
+    """
+    global _pool
+    with _client_lock:
+        if _pool is None:
+            config = settings.SIMULATOR
+            _pool = SimulatorPool(
+                config["URLS"],
+                config["FAILURE_THRESHOLD"],
+                config["RESET_TIMEOUT"],
+                config["HEALTH_PATH"],
+                config["HEALTH_INTERVAL"],
+            )
+    return _pool
+
+
+def get_simulator_client() -> SimulatorClient:
+    """
+    Get the process-wide simulator client configured by the SIMULATOR setting.
+
+    :return: The client
+    """
+    global _client
+    simulators = get_simulator_pool()
+    with _client_lock:
+        if _client is None:
+            config = settings.SIMULATOR
+            _client = SimulatorClient(
+                simulators,
+                config["TIMEOUT"],
+                config["MAX_CONNECTIONS"],
+                config["CONNECT_RETRIES"],
+                config["BACKOFF"],
+            )
+    return _client
+
+
+_async_clients = weakref.WeakKeyDictionary()
+"""The async client of each event loop"""
+
+
+def get_async_simulator_client() -> AsyncSimulatorClient:
+    """
+    Get the async simulator client of the running event loop, configured by the
+    SIMULATOR setting.
+
+    :return: The client
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        config = settings.SIMULATOR
+        client = AsyncSimulatorClient(
+            get_simulator_pool(),
+            config["TIMEOUT"],
+            config["MAX_CONNECTIONS"],
+            config["CONNECT_RETRIES"],
+        )
+        _async_clients[loop] = client
+    return client
@@ -0,0 +1,159 @@
+"""
+Parsing of simulator logs. A log has one "<direction> <x> <y>" line per tick
+followed by a final line that starts with 1 if the robot reached the goal, or it
+is a "-1" line followed by the error the code raised.
+"""
+import base64
+import struct
+import sys
+from array import array
+from typing import Iterable, Iterator, Optional, Tuple
+
+DIRECTIONS = ("up", "right", "down", "left")
+"""The direction names, indexed by the simulator's direction numbers"""
+
+Tick = Tuple[int, int, int]
+"""The x, y and direction number of the robot on one tick"""
+
+OBJECTS = "objects"
+"""Telemetry as a list of {"time", "x", "y", "direction"} objects, the default"""
+COLUMNS = "columns"
+"""Telemetry as parallel x and y lists and a string of direction numbers"""
+PACKED = "packed"
+"""Telemetry as base64 of the tick count, then the x, y and direction columns"""
+
+_TICK_FORMAT = '{"time": %d, "x": %d, "y": %d, "direction": "%s"}'
+_PACKED_HEADER = struct.Struct("<I")
+_DIRECTION_DIGITS = bytes.maketrans(bytes(range(10)), b"0123456789")
+
+
+class SimulatorLog:
+    """
+    A simulator log that is only parsed as far as it is used. The summary comes
+    from scanning for line breaks, and the ticks are parsed one at a time as they
+    are iterated, so a long log is never split into a list of lines.
+    """
+
+    def __init__(self, log: str):
+        """
+        :param log: The log the simulator returned
+        """
+        self.log = log.strip()
+        self._last_break = self.log.rfind("\n")
+
+    @property
+    def error(self) -> Optional[str]:
+        """The error the robot's code raised, if it did"""
+        first_break = self.log.find("\n")
+        if first_break == -1 or self.log[:first_break] != "-1":
+            return None
+        start = first_break + 1
+        end = self.log.find("\n", start)
+        return self.log[start:] if end == -1 else self.log[start:end]
+
+    @property
+    def did_win(self) -> bool:
+        """Did the robot reach the goal"""
+        return self.log.startswith("1", self._last_break + 1)
+
+    def __len__(self) -> int:
+        """The number of ticks"""
+        return self.log.count("\n")
+
+    def final_tick(self) -> Optional[Tick]:
+        """The last tick, parsed without reading the rest of the log"""
+        if self._last_break == -1:
+            return None
+        start = self.log.rfind("\n", 0, self._last_break) + 1
+        end = self._last_break
+        return _parse_tick(self.log[start:end])
+
+    def __iter__(self) -> Iterator[Tick]:
+        log, last_break = self.log, self._last_break
+        start = 0
+        while start <= last_break:
+            end = log.index("\n", start)
+            yield _parse_tick(log[start:end])
+            start = end + 1
+
+
+def telemetry_json(ticks: Iterable[Tick], batch: int = 1024) -> Iterator[str]:
+    """
+    Encode ticks as a JSON list of {"time", "x", "y", "direction"} objects, in
+    pieces of `batch` ticks.
+
+    :param ticks: The ticks in order
+    :param batch: How many ticks to encode in each piece
+    :return: The pieces of the JSON list
+    """
+    yield "["
+    separator = ""
+    encoded = []
+    for time, (x, y, direction) in enumerate(ticks):
+        encoded.append(_TICK_FORMAT % (time, x, y, DIRECTIONS[direction]))
+        if len(encoded) == batch:
+            yield separator + ", ".join(encoded)
+            separator, encoded = ", ", []
+    if encoded:
+        yield separator + ", ".join(encoded)
+    yield "]"
+
+
+def _parse_tick(line: str) -> Tick:
+    direction, x, y = line.split(" ")
+    return int(x), int(y), int(direction)
+
+
+def telemetry_columns(ticks: Iterable[Tick]) -> Iterator[str]:
+    """
+    Encode ticks as {"format": "columns", "x": [...], "y": [...], "direction":
+    "..."}, where the time of a tick is its index and each character of direction
+    is a direction number.
+
+    :param ticks: The ticks in order
+    :return: The pieces of the JSON object
+    """
+    xs, ys, directions = _columns(ticks)
+    yield '{"format": "columns", "x": ['
+    yield ", ".join(map(str, xs))
+    yield '], "y": ['
+    yield ", ".join(map(str, ys))
+    yield '], "direction": "'
+    yield directions.translate(_DIRECTION_DIGITS).decode("ascii")
+    yield '"}'
+
+
+def telemetry_packed(ticks: Iterable[Tick]) -> Iterator[str]:
+    """
+    Encode ticks as {"format": "packed", "data": "..."}, where data is the base64
+    of the number of ticks as a little-endian uint32, then every x and every y as
+    little-endian uint16s and every direction number as a byte.
+
+    :param ticks: The ticks in order
+    :return: The pieces of the JSON object
+    """
+    xs, ys, directions = _columns(ticks)
+    if sys.byteorder == "big":
+        xs.byteswap()
+        ys.byteswap()
+    data = _PACKED_HEADER.pack(len(directions)) + xs.tobytes() + ys.tobytes()
+    yield '{"format": "packed", "data": "'
+    yield base64.b64encode(data + directions).decode("ascii")
+    yield '"}'
+
+
+TELEMETRY_ENCODERS = {
+    OBJECTS: telemetry_json,
+    COLUMNS: telemetry_columns,
+    PACKED: telemetry_packed,
+}
+"""The telemetry encoder of each format a client can ask for"""
+
+
+def _columns(ticks: Iterable[Tick]) -> Tuple[array, array, bytearray]:
+    xs, ys, directions = array("H"), array("H"), bytearray()
+    for x, y, direction in ticks:
+        xs.append(x)
+        ys.append(y)
+        directions.append(direction)
+    return xs, ys, directions
@@ -1,13 +1,91 @@
+import asyncio
+import base64
+import datetime
+import json
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import time
+import warnings
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock
+
+import httpx
+import requests
+from django.conf import settings as django_settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import OperationalError
+from django.http import JsonResponse
+from django.test import LiveServerTestCase, override_settings
+from django.utils import timezone
 from hypothesis import given, settings
 from hypothesis.extra.django import TestCase
 from rest_framework import status
 from rest_framework.authtoken.models import Token
 from rest_framework.reverse import reverse
 from rest_framework.test import APITestCase
+from urllib3.connection import HTTPConnection
 
 from accounts.models import Profile
 from accounts.tests import user_profiles
-from maze.models import MazeConfiguration
+from communication.admission import (
+    Admission,
+    simulations_throttled_global,
+    simulations_throttled_user,
+)
+from communication.benchmark import (
+    payload_benchmark,
+    random_maze,
+    serialized_payload,
+    split_telemetry,
+)
+from communication.fake_simulator import FakeSimulator
+from communication.maze_cache import _local, get_prepared_maze
+from communication.payload import encode_maze, simulator_payload
+from communication.jobs import DONE, QUEUED, RUNNING, JobQueue, QueueFull
+from communication.replays import (
+    RangeNotSatisfiable,
+    parse_range,
+    read_replay,
+    replay_size,
+    write_replay,
+)
+from communication.result_writer import ResultWriter
+from communication.result_cache import (
+    cache_hits,
+    cache_misses,
+    normalize_source,
+    result_key,
+)
+from communication.management.commands.load_test import percentile
+from communication.simulator import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    AsyncSimulatorClient,
+    SimulatorClient,
+    SimulatorPool,
+    SimulatorUnavailable,
+    requests_in_flight,
+    requests_queued,
+)
+from communication.telemetry import (
+    SimulatorLog,
+    telemetry_columns,
+    telemetry_json,
+    telemetry_packed,
+)
+from maze.models import MazeConfiguration, RunResult
+from maze.serializers import SimulatorMazeSerializer
+from tournament.models import Tournament
+from zigzag_backend.metrics import Counter, Histogram
+from zigzag_backend.ratelimit import TokenBucket
+from zigzag_backend.singleflight import AsyncSingleFlight, SingleFlight
 
 
 def make_maze():
@@ -28,20 +106,34 @@ def make_maze():
     return m.pk
 
 
+def simulators(*urls, clock=time.monotonic) -> SimulatorPool:
+    """A pool of simulators that opens circuits after 2 failures for 10 seconds"""
+    return SimulatorPool(list(urls), 2, 10, "/hello", 0, clock)
+
+
+def streamed_content(response) -> bytes:
+    """Read the whole body of a response streamed from a worker thread"""
+    with warnings.catch_warnings():
+        # The test client consumes the async stream synchronously
+        warnings.simplefilter("ignore")
+        return b"".join(response)
+
+
+def run_job(test, data, url_name="receive_file"):
+    """Submit code with a test's client and poll for the response of the job"""
+    response = test.client.post(reverse(url_name), data, format="json")
+    test.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+    job_id = response.json()["job_id"]
+    test.assertEqual(response["Location"], reverse("simulation_job", args=[job_id]))
+    return test.client.get(response["Location"])
+
+
 class CommunicationTests(APITestCase, TestCase):
     @given(profile=user_profiles())
     def test_receive_post_ok(self, profile: Profile):
         token = Token.objects.create(user=profile.user)
         self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
-        response = self.client.post(
-            reverse("receive_file"),
-            {
-                "maze_id": make_maze(),
-                "user_code": "",
-            },
-            format="json",
-            follow=True,
-        )
+        response = run_job(self, {"maze_id": make_maze(), "user_code": ""})
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertDictEqual(
@@ -61,15 +153,7 @@ class CommunicationTests(APITestCase, TestCase):
     def test_receive_post_infinte_loop(self, profile: Profile):
         token = Token.objects.create(user=profile.user)
         self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
-        response = self.client.post(
-            reverse("receive_file"),
-            {
-                "maze_id": make_maze(),
-                "user_code": "loop",
-            },
-            format="json",
-            follow=True,
-        )
+        response = run_job(self, {"maze_id": make_maze(), "user_code": "loop"})
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertDictEqual(
@@ -82,15 +166,7 @@ class CommunicationTests(APITestCase, TestCase):
     def test_receive_post_timeout(self, profile: Profile):
         token = Token.objects.create(user=profile.user)
         self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
-        response = self.client.post(
-            reverse("receive_file"),
-            {
-                "maze_id": make_maze(),
-                "user_code": "timeout",
-            },
-            format="json",
-            follow=True,
-        )
+        response = run_job(self, {"maze_id": make_maze(), "user_code": "timeout"})
 
         self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -98,15 +174,7 @@ class CommunicationTests(APITestCase, TestCase):
     def test_receive_post_error_in_code(self, profile: Profile):
         token = Token.objects.create(user=profile.user)
         self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
-        response = self.client.post(
-            reverse("receive_file"),
-            {
-                "maze_id": make_maze(),
-                "user_code": "error",
-            },
-            format="json",
-            follow=True,
-        )
+        response = run_job(self, {"maze_id": make_maze(), "user_code": "error"})
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertDictEqual(
@@ -136,3 +204,1265 @@ class CommunicationTests(APITestCase, TestCase):
         )
 
         self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    @given(profile=user_profiles())
+    def test_receive_post_proximity(self, profile: Profile):
+        token = Token.objects.create(user=profile.user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+        simulator_response = mock.Mock(status_code=200)
+        simulator_response.text = (
+            '{"log": "0 3 3\\n1 3 4\\n-1 unsuccessful", "error": null}'
+        )
+        with mock.patch.object(
+            SimulatorClient, "post", return_value=simulator_response
+        ):
+            response = run_job(self, {"maze_id": make_maze(), "user_code": ""})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.json()["did_win"])
+        result = RunResult.objects.get(profile=profile)
+        self.assertFalse(result.did_win)
+        # The goal is 2 moves from the start and the robot stopped 1 move away
+        self.assertEqual(result.proximity, 0.5)
+
+    @given(profile=user_profiles())
+    def test_receive_batch(self, profile: Profile):
+        token = Token.objects.create(user=profile.user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+        first, second = make_maze(), make_maze()
+        missing = second + 1
+        response = run_job(
+            self,
+            {"maze_ids": [first, missing, second, first], "user_code": ""},
+            "receive_batch",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.json()["results"]
+        self.assertEqual(
+            [(entry["maze_id"], entry["status_code"]) for entry in results],
+            [(first, 200), (missing, 404), (second, 200)],
+        )
+        self.assertTrue(results[0]["response"]["did_win"])
+        self.assertEqual(len(results[2]["response"]["telemetry"]), 2)
+        self.assertEqual(
+            set(
+                RunResult.objects.filter(profile=profile).values_list(
+                    "maze_configuration", flat=True
+                )
+            ),
+            {first, second},
+        )
+
+    @given(profile=user_profiles())
+    def test_receive_batch_unavailable(self, profile: Profile):
+        token = Token.objects.create(user=profile.user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+        with mock.patch.object(
+            SimulatorClient, "post", side_effect=requests.ConnectionError()
+        ):
+            response = run_job(
+                self,
+                {"maze_ids": [make_maze(), make_maze()], "user_code": ""},
+                "receive_batch",
+            )
+
+        self.assertEqual(
+            [entry["status_code"] for entry in response.json()["results"]],
+            [503, 503],
+        )
+        self.assertEqual(
+            list(
+                RunResult.objects.filter(profile=profile).values_list(
+                    "run_error", flat=True
+                )
+            ),
+            ["Connection error"] * 2,
+        )
+
+    @given(profile=user_profiles())
+    def test_receive_batch_rejected(self, profile: Profile):
+        token = Token.objects.create(user=profile.user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+        for maze_ids in (None, [], ["1"], list(range(1, 100))):
+            response = self.client.post(
+                reverse("receive_batch"),
+                {"maze_ids": maze_ids, "user_code": ""},
+                format="json",
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @given(profile=user_profiles())
+    def test_receive_post_no_simulator(self, profile: Profile):
+        token = Token.objects.create(user=profile.user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+        with mock.patch.object(
+            SimulatorPool, "acquire", side_effect=SimulatorUnavailable()
+        ):
+            response = run_job(self, {"maze_id": make_maze(), "user_code": ""})
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    @given(profile=user_profiles(), other=user_profiles())
+    def test_simulation_job_belongs_to_submitter(self, profile: Profile, other):
+        token = Token.objects.create(user=profile.user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+        response = self.client.post(
+            reverse("receive_file"),
+            {"maze_id": make_maze(), "user_code": ""},
+            format="json",
+        )
+
+        token = Token.objects.create(user=other.user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+        response = self.client.get(response["Location"])
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @given(profile=user_profiles())
+    def test_simulate_ok(self, profile: Profile):
+        token = Token.objects.create(user=profile.user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+        response = self.client.post(
+            reverse("simulate"),
+            {"maze_id": make_maze(), "user_code": ""},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertDictEqual(
+            response.json(),
+            {
+                "status": "ok",
+                "telemetry": [
+                    {"direction": "up", "time": 0, "x": 1, "y": 2},
+                    {"direction": "left", "time": 1, "x": 4, "y": 5},
+                ],
+                "total_time": 1,
+                "did_win": True,
+            },
+        )
+        self.assertTrue(RunResult.objects.get(profile=profile).did_win)
+
+    @given(profile=user_profiles())
+    def test_simulate_proximity(self, profile: Profile):
+        token = Token.objects.create(user=profile.user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+        simulator_response = mock.Mock(status_code=200, reason_phrase="OK")
+        simulator_response.text = (
+            '{"log": "0 3 3\\n1 3 4\\n-1 unsuccessful", "error": null}'
+        )
+        with mock.patch.object(
+            AsyncSimulatorClient, "post", return_value=simulator_response
+        ):
+            response = self.client.post(
+                reverse("simulate"),
+                {"maze_id": make_maze(), "user_code": ""},
+                format="json",
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.json()["did_win"])
+        self.assertEqual(RunResult.objects.get(profile=profile).proximity, 0.5)
+
+    @given(profile=user_profiles())
+    def test_simulate_streams_long_logs(self, profile: Profile):
+        token = Token.objects.create(user=profile.user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+        simulator_response = mock.Mock(status_code=200, reason_phrase="OK")
+        simulator_response.text = '{"log": "0 1 2\\n3 4 5\\n1", "error": null}'
+        with mock.patch.object(
+            AsyncSimulatorClient, "post", return_value=simulator_response
+        ), override_settings(
+            SIMULATOR={**django_settings.SIMULATOR, "STREAM_TICKS": 1}
+        ):
+            response = self.client.post(
+                reverse("simulate"),
+                {"maze_id": make_maze(), "user_code": ""},
+                format="json",
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        with warnings.catch_warnings():
+            # The test client consumes the async stream synchronously
+            warnings.simplefilter("ignore")
+            data = json.loads(b"".join(response))
+        self.assertEqual(data["total_time"], 1)
+        self.assertEqual(
+            data["telemetry"][1], {"time": 1, "x": 4, "y": 5, "direction": "left"}
+        )
+        self.assertTrue(data["did_win"])
+
+    @given(profile=user_profiles())
+    def test_simulate_unavailable(self, profile: Profile):
+        token = Token.objects.create(user=profile.user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+        with mock.patch.object(
+            AsyncSimulatorClient, "post", side_effect=httpx.ConnectError("refused")
+        ):
+            response = self.client.post(
+                reverse("simulate"),
+                {"maze_id": make_maze(), "user_code": ""},
+                format="json",
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        result = RunResult.objects.get(profile=profile)
+        self.assertEqual(result.run_error, "Connection error")
+
+    def test_simulate_requires_token(self):
+        response = self.client.post(
+            reverse("simulate"), {"maze_id": 1, "user_code": ""}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.credentials(HTTP_AUTHORIZATION="Token invalid")
+        response = self.client.post(
+            reverse("simulate"), {"maze_id": 1, "user_code": ""}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @given(profile=user_profiles())
+    def test_simulate_get_rejected(self, profile: Profile):
+        token = Token.objects.create(user=profile.user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+        response = self.client.get(reverse("simulate"))
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+
+class AdmissionTests(APITestCase, TestCase):
+    """Testing for the simulation rate limits"""
+
+    def test_token_bucket(self):
+        """Test that the bucket allows a burst and then refills at its rate"""
+        now = [0.0]
+        bucket = TokenBucket(2, 3, clock=lambda: now[0])
+        self.assertEqual([bucket.take() for _ in range(3)], [0, 0, 0])
+        self.assertAlmostEqual(bucket.take(), 0.5)
+        now[0] = 0.5
+        self.assertEqual(bucket.take(), 0)
+        self.assertAlmostEqual(bucket.take(), 0.5)
+        now[0] = 100
+        self.assertEqual([bucket.take() for _ in range(3)], [0, 0, 0])
+        bucket.give_back()
+        self.assertEqual(bucket.take(), 0)
+
+    def test_token_bucket_cost(self):
+        """Test that a call can take several tokens at once"""
+        now = [0.0]
+        bucket = TokenBucket(2, 3, clock=lambda: now[0])
+        self.assertEqual(bucket.take(2), 0)
+        self.assertAlmostEqual(bucket.take(2), 0.5)
+        now[0] = 0.5
+        self.assertEqual(bucket.take(2), 0)
+        bucket.give_back(3)
+        self.assertEqual(bucket.take(3), 0)
+        with self.assertRaises(ValueError):
+            bucket.take(4)
+
+    def test_admission(self):
+        """Test that users are limited separately and together"""
+        admission = Admission(0.001, 2, 0.001, 3, 10)
+        user_throttled = simulations_throttled_user.value
+        global_throttled = simulations_throttled_global.value
+
+        self.assertEqual(admission.admit(1), 0)
+        self.assertEqual(admission.admit(1), 0)
+        self.assertGreater(admission.admit(1), 0)
+        self.assertEqual(simulations_throttled_user.value, user_throttled + 1)
+
+        self.assertEqual(admission.admit(2), 0)
+        self.assertGreater(admission.admit(2), 0)
+        self.assertEqual(simulations_throttled_global.value, global_throttled + 1)
+        # The rejected call gave its token back to the user's bucket
+        admission.global_bucket.give_back()
+        self.assertEqual(admission.admit(2), 0)
+
+    @given(profile=user_profiles())
+    def test_throttled_submissions(self, profile: Profile):
+        token = Token.objects.create(user=profile.user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+        data = {"maze_id": make_maze(), "user_code": ""}
+        with override_settings(
+            SIMULATION_RATE={**django_settings.SIMULATION_RATE, "ENABLED": True}
+        ), mock.patch(
+            "communication.admission._admission",
+            Admission(0.1, 1, 100, 100, 10, clock=lambda: 0.0),
+        ):
+            run_job(self, data)
+            response = self.client.post(reverse("receive_file"), data, format="json")
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            self.assertEqual(response["Retry-After"], "10")
+
+            response = self.client.post(reverse("simulate"), data, format="json")
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            self.assertEqual(response["Retry-After"], "10")
+
+    @given(profile=user_profiles())
+    def test_throttled_batch(self, profile: Profile):
+        """Test that a batch takes a token for each maze"""
+        token = Token.objects.create(user=profile.user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+        maze_ids = [make_maze() for _ in range(3)]
+        with override_settings(
+            SIMULATION_RATE={
+                **django_settings.SIMULATION_RATE,
+                "ENABLED": True,
+                "USER_BURST": 4,
+            }
+        ), mock.patch(
+            "communication.admission._admission",
+            Admission(0.1, 4, 100, 100, 10, clock=lambda: 0.0),
+        ):
+            data = {"maze_ids": maze_ids + maze_ids[:1], "user_code": ""}
+            self.assertEqual(run_job(self, data, "receive_batch").status_code, 200)
+            # One token is left, a batch of two needs 10 more seconds
+            data = {"maze_ids": maze_ids[:2], "user_code": ""}
+            response = self.client.post(reverse("receive_batch"), data, format="json")
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            self.assertEqual(response["Retry-After"], "10")
+
+            # Larger than the burst, so it could never be admitted
+            data = {"maze_ids": list(range(1, 6)), "user_code": ""}
+            response = self.client.post(reverse("receive_batch"), data, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PreparedMazeTests(TestCase):
+    """Testing for the cache of mazes ready to send to the simulator"""
+
+    def test_cached_lookup(self):
+        """Test that a maze is only looked up and serialized once"""
+        maze_id = make_maze()
+        prepared = get_prepared_maze({"maze_id": maze_id})
+        with self.assertNumQueries(0):
+            self.assertIs(get_prepared_maze({"maze_id": maze_id}), prepared)
+
+        maze = SimulatorMazeSerializer(MazeConfiguration.objects.get(pk=maze_id)).data
+        maze["num_row"] = maze["num_col"] = 5
+        self.assertEqual(json.loads(prepared.fragment), maze)
+
+        # Without the process cache it is found in the default cache
+        _local.clear()
+        with self.assertNumQueries(0):
+            shared = get_prepared_maze({"maze_id": maze_id})
+        self.assertEqual(shared.fragment, prepared.fragment)
+
+    def test_maze_changes(self):
+        """Test that saving or deleting a maze drops it and its tournaments"""
+        maze = MazeConfiguration.objects.get(pk=make_maze())
+        tournament = Tournament.create(
+            "Cached",
+            datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc),
+            datetime.datetime(2020, 1, 2, tzinfo=datetime.timezone.utc),
+            maze_configuration=maze,
+        )
+        by_tournament = {"tournament_id": tournament.pk}
+        self.assertEqual(get_prepared_maze(by_tournament).tournament, tournament)
+        get_prepared_maze({"maze_id": maze.pk})
+
+        maze.start_row = 1
+        maze.save()
+        for request_data in (by_tournament, {"maze_id": maze.pk}):
+            prepared = get_prepared_maze(request_data)
+            self.assertEqual(prepared.maze_configuration.start_row, 1)
+            self.assertEqual(json.loads(prepared.fragment)["start_row"], 1)
+
+        tournament.name = "Renamed"
+        tournament.save()
+        self.assertEqual(get_prepared_maze(by_tournament).tournament.name, "Renamed")
+
+        by_maze = {"maze_id": maze.pk}
+        maze.delete()
+        self.assertIsNone(get_prepared_maze(by_tournament).maze_configuration)
+        self.assertIsNone(get_prepared_maze(by_maze).maze_configuration)
+
+
+class PayloadTests(TestCase):
+    """Testing for the simulator request encoding"""
+
+    def test_payload(self):
+        """Test that the spliced payload decodes like the serialized one"""
+        maze = random_maze(7)
+        code = 'class Robot { String s = "\\"\u00e9\u2028"; }\n\t'
+        expected = json.loads(serialized_payload(maze, code))
+        self.assertEqual(
+            json.loads(simulator_payload(encode_maze(maze), code)), expected
+        )
+        with mock.patch("communication.payload.orjson", None):
+            payload = simulator_payload(encode_maze(maze), code)
+        self.assertEqual(json.loads(payload), expected)
+
+    def test_payload_benchmark(self):
+        """Test that the payload benchmark reports every way of encoding"""
+        results = payload_benchmark(sizes=(5,), repeat=1)
+        self.assertEqual(
+            [result["name"] for result in results],
+            ["serialized", "spliced str", "spliced bytes"],
+        )
+
+
+class ReplayTests(APITestCase, TestCase):
+    """Testing for the replay store"""
+
+    @given(profile=user_profiles(), other=user_profiles())
+    def test_replay(self, profile: Profile, other: Profile):
+        token = Token.objects.create(user=profile.user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+        run_job(self, {"maze_id": make_maze(), "user_code": ""})
+        result = RunResult.objects.get(profile=profile)
+        url = reverse("replay", args=[result.pk])
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        replay = streamed_content(response)
+        self.assertDictEqual(
+            json.loads(replay),
+            {"format": "columns", "x": [1, 4], "y": [2, 5], "direction": "03"},
+        )
+
+        response = self.client.get(url, HTTP_RANGE="bytes=2-11")
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(response["Content-Range"], f"bytes 2-11/{len(replay)}")
+        self.assertEqual(streamed_content(response), replay[2:12])
+
+        response = self.client.get(url, HTTP_RANGE=f"bytes={len(replay)}-")
+        self.assertEqual(
+            response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+        )
+
+        token = Token.objects.create(user=other.user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @given(profile=user_profiles())
+    def test_replay_segment_missing(self, profile: Profile):
+        """Test that a replay whose segment file is gone is not found"""
+        token = Token.objects.create(user=profile.user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+        run_job(self, {"maze_id": make_maze(), "user_code": ""})
+        result = RunResult.objects.get(profile=profile)
+        RunResult.objects.filter(pk=result.pk).update(replay_segment="missing.gz")
+
+        with self.assertLogs("communication.views", "WARNING"):
+            response = self.client.get(reverse("replay", args=[result.pk]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_parse_range(self):
+        """Test the single byte ranges that are understood"""
+        self.assertIsNone(parse_range(None, 10))
+        self.assertIsNone(parse_range("bytes=0-1,4-5", 10))
+        self.assertIsNone(parse_range("bytes=5-2", 10))
+        self.assertEqual(parse_range("bytes=2-", 10), (2, 9))
+        self.assertEqual(parse_range("bytes=2-50", 10), (2, 9))
+        self.assertEqual(parse_range("bytes=-3", 10), (7, 9))
+        self.assertEqual(parse_range("bytes=-30", 10), (0, 9))
+        self.assertRaises(RangeNotSatisfiable, parse_range, "bytes=10-", 10)
+        self.assertRaises(RangeNotSatisfiable, parse_range, "bytes=-0", 10)
+
+    def test_read_replay(self):
+        """Test reading ranges of a replay spread over many reads"""
+        log = "\n".join([f"{i % 4} {i % 300} {i % 200}" for i in range(20_000)])
+        first, second = RunResult(), RunResult()
+        write_replay(first, SimulatorLog("0 0 0\n1"))
+        write_replay(second, SimulatorLog(log + "\n1"))
+        self.assertEqual(first.replay_segment, second.replay_segment)
+        self.assertEqual(
+            second.replay_offset, first.replay_offset + first.replay_length
+        )
+
+        expected = "".join(telemetry_columns(SimulatorLog(log + "\n1"))).encode()
+        self.assertEqual(replay_size(second), len(expected))
+        with mock.patch("communication.replays._READ_SIZE", 512):
+            for start, stop in ((0, len(expected)), (1000, 50_000), (7, 8)):
+                with self.subTest(start=start, stop=stop):
+                    data = b"".join(read_replay(second, start, stop - 1))
+                    self.assertEqual(data, expected[start:stop])
+
+    def test_write_replay_fails(self):
+        """Test that a replay that cannot be written leaves the run without one"""
+        log = SimulatorLog("0 0 0\n1")
+        write = os.write
+        for error in (
+            mock.patch("communication.replays.os.open", side_effect=OSError(28, "")),
+            mock.patch(
+                "communication.replays.os.write",
+                side_effect=lambda fd, data: write(fd, data[:3]),
+            ),
+        ):
+            result = RunResult()
+            with error, self.assertLogs("communication.replays", "ERROR"):
+                write_replay(result, log)
+            self.assertIsNone(result.replay_segment)
+            self.assertIsNone(result.replay_offset)
+
+        # Replays after a partial write are still read from their own offset
+        result = RunResult()
+        write_replay(result, log)
+        self.assertEqual(
+            b"".join(read_replay(result, 0, replay_size(result) - 1)),
+            "".join(telemetry_columns(log)).encode(),
+        )
+
+
+@override_settings(
+    CACHES={
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+        "simulations": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    }
+)
+class ResultCacheTests(APITestCase, TestCase):
+    """Testing for the cache of simulator responses"""
+
+    def simulator_response(self):
+        response = mock.Mock(status_code=200, reason="OK", reason_phrase="OK")
+        response.text = '{"log": "0 3 3\\n1 4 4\\n1 successful", "error": null}'
+        return response
+
+    def test_normalize_source(self):
+        self.assertEqual(
+            normalize_source("\r\nclass A {  \r\n}\t\r\n\r\n"), "class A {\n}"
+        )
+
+    def test_result_key(self):
+        maze = MazeConfiguration.objects.get(pk=make_maze())
+        other = MazeConfiguration.objects.get(pk=make_maze())
+        key = result_key("move();\n", maze)
+        self.assertEqual(key, result_key("move();  \r\n", maze))
+        self.assertNotEqual(key, result_key("turn();\n", maze))
+        self.assertNotEqual(key, result_key("move();\n", other))
+        self.assertNotEqual(key, result_key("move();\n", maze, 1))
+
+        maze.end_col = 3
+        self.assertNotEqual(key, result_key("move();\n", maze))
+        self.assertIsNone(result_key("if (Math.random() > 0.5) move();", maze))
+        self.assertIsNone(result_key("new Random(1);", maze))
+        maze.level_data = None
+        self.assertIsNone(result_key("move();\n", maze))
+
+    @given(profile=user_profiles())
+    def test_resubmission_is_replayed(self, profile: Profile):
+        token = Token.objects.create(user=profile.user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+        data = {"maze_id": make_maze(), "user_code": "class Robot {}"}
+        caches["simulations"].clear()
+        hits = cache_hits.value
+        with mock.patch.object(
+            SimulatorClient, "post", return_value=self.simulator_response()
+        ) as post:
+            first = run_job(self, data)
+            second = run_job(self, data)
+
+        post.assert_called_once()
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(cache_hits.value, hits + 1)
+        results = RunResult.objects.filter(profile=profile).order_by("pk")
+        self.assertEqual([result.cache_hit for result in results], [False, True])
+        self.assertTrue(all(result.did_win for result in results))
+
+    @given(profile=user_profiles())
+    def test_async_resubmission_is_replayed(self, profile: Profile):
+        token = Token.objects.create(user=profile.user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+        data = {"maze_id": make_maze(), "user_code": "class Robot {}"}
+        caches["simulations"].clear()
+        with mock.patch.object(
+            AsyncSimulatorClient, "post", return_value=self.simulator_response()
+        ) as post:
+            first = self.client.post(reverse("simulate"), data, format="json")
+            second = self.client.post(reverse("simulate"), data, format="json")
+
+        post.assert_called_once()
+        self.assertEqual(first.json(), second.json())
+        self.assertTrue(RunResult.objects.filter(profile=profile).last().cache_hit)
+
+    @given(profile=user_profiles())
+    def test_failures_are_not_cached(self, profile: Profile):
+        token = Token.objects.create(user=profile.user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+        data = {"maze_id": make_maze(), "user_code": "class Robot {}"}
+        caches["simulations"].clear()
+        misses = cache_misses.value
+        with mock.patch.object(
+            SimulatorClient, "post", side_effect=requests.ConnectionError()
+        ) as post:
+            run_job(self, data)
+            run_job(self, data)
+
+        self.assertEqual(post.call_count, 2)
+        self.assertEqual(cache_misses.value, misses + 2)
+
+
+class SingleFlightTests(TestCase):
+    """Testing for coalescing identical concurrent calls"""
+
+    def test_concurrent_calls_share_one(self):
+        """Test that callers with the same key wait for the first caller's result"""
+        coalesced = Counter("test_coalesced")
+        flight = SingleFlight(coalesced)
+        release = threading.Event()
+        calls = []
+        results = []
+
+        def work():
+            calls.append(1)
+            release.wait(5)
+            return "result"
+
+        threads = [
+            threading.Thread(target=lambda: results.append(flight.do("key", work)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + 5
+        while coalesced.value < 4 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["result"] * 5)
+        self.assertEqual(coalesced.value, 4)
+        self.assertEqual(flight.do("key", lambda: "again"), "again")
+
+    def test_errors_are_shared(self):
+        """Test that every caller gets the exception of the shared call"""
+        flight = SingleFlight()
+        release = threading.Event()
+        errors = []
+
+        def work():
+            release.wait(5)
+            raise ValueError("failed")
+
+        def call():
+            try:
+                flight.do("key", work)
+            except ValueError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(errors), 3)
+
+    def test_none_key_is_not_coalesced(self):
+        """Test that calls without a key always run"""
+        flight = SingleFlight()
+        calls = []
+        flight.do(None, calls.append, 1)
+        flight.do(None, calls.append, 2)
+        self.assertEqual(calls, [1, 2])
+
+    def test_async_concurrent_calls_share_one(self):
+        """Test that coroutines with the same key await the first one's result"""
+        coalesced = Counter("test_coalesced")
+        flight = AsyncSingleFlight(coalesced)
+        calls = []
+
+        async def work(value):
+            calls.append(value)
+            await asyncio.sleep(0.05)
+            return value
+
+        async def main():
+            return await asyncio.gather(
+                flight.do("a", work, 1),
+                flight.do("a", work, 2),
+                flight.do("b", work, 3),
+                flight.do(None, work, 4),
+            )
+
+        self.assertEqual(asyncio.run(main()), [1, 1, 3, 4])
+        self.assertEqual(calls, [1, 3, 4])
+        self.assertEqual(coalesced.value, 1)
+
+    def test_async_errors_are_shared(self):
+        """Test that every coroutine gets the exception of the shared call"""
+        flight = AsyncSingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.05)
+            raise ValueError("failed")
+
+        async def main():
+            return await asyncio.gather(
+                flight.do("a", work), flight.do("a", work), return_exceptions=True
+            )
+
+        errors = asyncio.run(main())
+        self.assertTrue(all(isinstance(error, ValueError) for error in errors))
+
+
+class JobQueueTests(TestCase):
+    """Testing for the queue that runs simulation jobs on worker threads"""
+
+    def wait_for(self, job):
+        """Wait up to 5 seconds for a job to be done"""
+        deadline = time.monotonic() + 5
+        while job.status != DONE and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(job.status, DONE)
+
+    def test_job_runs_on_worker(self):
+        """Test that a job is queued straight away and done once its work returns"""
+        queue = JobQueue(workers=1, max_queued=4, max_jobs=16)
+        release = threading.Event()
+        finished = threading.Event()
+
+        def work():
+            release.wait(5)
+            finished.set()
+            return JsonResponse({"status": "ok"})
+
+        job = queue.submit("owner", work)
+        self.assertNotEqual(job.status, DONE)
+        self.assertIs(queue.get(job.id, "owner"), job)
+        self.assertIsNone(queue.get(job.id, "someone else"))
+
+        release.set()
+        self.wait_for(job)
+        self.assertTrue(finished.is_set())
+        self.assertEqual(job.response().status_code, 200)
+        self.assertEqual(job.response().content, b'{"status": "ok"}')
+
+    def test_queue_full(self):
+        """Test that jobs are rejected once max_queued jobs are unfinished"""
+        queue = JobQueue(workers=1, max_queued=1, max_jobs=16)
+        release = threading.Event()
+        job = queue.submit("owner", lambda: release.wait(5) and JsonResponse({}))
+        self.assertRaises(QueueFull, queue.submit, "owner", JsonResponse, {})
+        self.assertIn(job.status, (QUEUED, RUNNING))
+
+        release.set()
+        self.wait_for(job)
+        self.wait_for(queue.submit("owner", JsonResponse, {}))
+
+    def test_failed_job(self):
+        """Test that a job that raises gives an error response"""
+        queue = JobQueue(workers=1, max_queued=1, max_jobs=16, eager=True)
+        with self.assertLogs("communication.jobs", "ERROR"):
+            job = queue.submit("owner", lambda: 1 / 0)
+        self.assertEqual(job.status, DONE)
+        self.assertEqual(job.response().status_code, 500)
+
+    def test_finished_job_expires(self):
+        """Test that a finished job is forgotten ttl seconds after it finishes"""
+        now = [0.0]
+        queue = JobQueue(
+            workers=1,
+            max_queued=4,
+            max_jobs=16,
+            ttl=10,
+            eager=True,
+            clock=lambda: now[0],
+        )
+        first = queue.submit("owner", JsonResponse, {})
+        now[0] = 5
+        second = queue.submit("owner", JsonResponse, {})
+        now[0] = 10
+        self.assertIsNone(queue.get(first.id, "owner"))
+        self.assertIs(queue.get(second.id, "owner"), second)
+        now[0] = 15
+        self.assertIsNone(queue.get(second.id, "owner"))
+        self.assertEqual(len(queue._jobs), 0)
+
+
+class ResultWriterTests(TestCase):
+    """Testing for the write-behind buffer of run results"""
+
+    def setUp(self):
+        self.maze = MazeConfiguration.objects.get(pk=make_maze())
+        self.profile = User.objects.create_user("writer").profile
+        self.spool = os.path.join(tempfile.mkdtemp(), "spool.jsonl")
+        self.addCleanup(shutil.rmtree, os.path.dirname(self.spool))
+
+    def results(self, count: int):
+        return [
+            RunResult(
+                timestamp=timezone.now(),
+                duration=index,
+                did_win=False,
+                run_error="",
+                result_data={},
+                profile=self.profile,
+                maze_configuration=self.maze,
+            )
+            for index in range(count)
+        ]
+
+    def test_flush(self):
+        """Test that results are saved in one query when the buffer is flushed"""
+        writer = ResultWriter(batch_size=100, flush_interval=60, spool_path=self.spool)
+        writer.add(*self.results(3))
+        self.assertEqual(len(writer), 3)
+        self.assertEqual(RunResult.objects.count(), 0)
+
+        with self.assertNumQueries(1):
+            writer.flush()
+        self.assertEqual(len(writer), 0)
+        self.assertListEqual(
+            sorted(RunResult.objects.values_list("duration", flat=True)), [0, 1, 2]
+        )
+
+    def test_flush_when_full(self):
+        """Test that the background thread flushes once the batch size is reached"""
+        writer = ResultWriter(batch_size=2, flush_interval=60, spool_path=self.spool)
+        flushed = threading.Event()
+        with mock.patch.object(writer, "flush", side_effect=flushed.set):
+            writer.start()
+            writer.add(*self.results(1))
+            self.assertFalse(flushed.wait(0.1))
+            writer.add(*self.results(1))
+            self.assertTrue(flushed.wait(5))
+            writer.close()
+
+    def test_close(self):
+        """Test that closing the writer saves what is left in the buffer"""
+        writer = ResultWriter(batch_size=100, flush_interval=60, spool_path=self.spool)
+        with mock.patch.object(writer, "_run"):
+            writer.start()
+        writer.add(*self.results(2))
+        writer.close()
+        self.assertEqual(RunResult.objects.count(), 2)
+
+    def test_spool(self):
+        """Test that results that cannot be saved are spooled and saved later"""
+        writer = ResultWriter(batch_size=100, flush_interval=60, spool_path=self.spool)
+        writer.add(*self.results(2))
+        with mock.patch.object(
+            RunResult.objects, "bulk_create", side_effect=OperationalError
+        ), self.assertLogs("communication.result_writer", "ERROR"):
+            writer.flush()
+        self.assertEqual(RunResult.objects.count(), 0)
+        self.assertTrue(os.path.exists(self.spool))
+
+        writer.flush()
+        self.assertFalse(os.path.exists(self.spool))
+        self.assertListEqual(
+            sorted(RunResult.objects.values_list("duration", flat=True)), [0, 1]
+        )
+
+    def test_spool_partial_write(self):
+        """Test that a partial append to the spool keeps the results buffered and
+        is skipped when the spool is loaded"""
+        writer = ResultWriter(batch_size=100, flush_interval=60, spool_path=self.spool)
+        writer.add(*self.results(2))
+        write = os.write
+        with mock.patch.object(
+            RunResult.objects, "bulk_create", side_effect=OperationalError
+        ), mock.patch(
+            "communication.result_writer.os.write",
+            side_effect=lambda fd, data: write(fd, data[:20]),
+        ), self.assertLogs(
+            "communication.result_writer", "ERROR"
+        ):
+            writer.flush()
+        self.assertEqual(len(writer), 2)
+
+        with mock.patch.object(
+            RunResult.objects, "bulk_create", side_effect=OperationalError
+        ), self.assertLogs("communication.result_writer", "ERROR"):
+            writer.flush()
+        self.assertEqual(len(writer), 0)
+
+        with self.assertLogs("communication.result_writer", "ERROR"):
+            writer.flush()
+        self.assertFalse(os.path.exists(self.spool))
+        self.assertListEqual(
+            sorted(RunResult.objects.values_list("duration", flat=True)), [0, 1]
+        )
+
+    def test_spool_kept(self):
+        """Test that a claimed spool is kept if its results cannot be saved or
+        spooled again"""
+        writer = ResultWriter(batch_size=100, flush_interval=60, spool_path=self.spool)
+        writer._spool(self.results(2))
+        with mock.patch.object(
+            RunResult.objects, "bulk_create", side_effect=OperationalError
+        ), mock.patch(
+            "communication.result_writer.os.open", side_effect=OSError(28, "")
+        ), self.assertLogs(
+            "communication.result_writer", "ERROR"
+        ):
+            writer.flush()
+        self.assertFalse(os.path.exists(self.spool))
+
+        # An operator can load it by putting it back
+        (claimed,) = os.listdir(os.path.dirname(self.spool))
+        os.rename(os.path.join(os.path.dirname(self.spool), claimed), self.spool)
+        writer.flush()
+        self.assertEqual(RunResult.objects.count(), 2)
+
+    def test_eager(self):
+        """Test that an eager writer saves results as they are added"""
+        writer = ResultWriter(
+            batch_size=100, flush_interval=60, spool_path=self.spool, eager=True
+        )
+        writer.add(*self.results(1))
+        self.assertEqual(len(writer), 0)
+        self.assertEqual(RunResult.objects.count(), 1)
+
+
+class SimulatorPoolTests(TestCase):
+    """Testing for spreading requests over several simulators"""
+
+    def test_least_outstanding(self):
+        """Test that requests go to the simulator with the fewest outstanding"""
+        pool = simulators("http://a/file", "http://b/file", "http://c/file")
+        first, second, third = pool.acquire(), pool.acquire(), pool.acquire()
+        self.assertEqual(len({first.url, second.url, third.url}), 3)
+        pool.release(second, 0.2, False)
+        self.assertIs(pool.acquire(), second)
+        self.assertEqual(second.latency.value["count"], 1)
+
+    def test_circuit_breaker(self):
+        """Test that a failing simulator is cut off, then tried again"""
+        now = [0.0]
+        pool = simulators("http://a/file", clock=lambda: now[0])
+        endpoint = pool.acquire()
+        pool.release(endpoint, 1, True)
+        self.assertEqual(pool.acquire().state, CLOSED)
+        with self.assertLogs("communication.simulator", "WARNING"):
+            pool.release(endpoint, 1, True)
+        self.assertEqual(endpoint.state, OPEN)
+        self.assertRaises(SimulatorUnavailable, pool.acquire)
+
+        now[0] = 10
+        self.assertEqual(pool.acquire().state, HALF_OPEN)
+        # Only the one test request is let through
+        self.assertRaises(SimulatorUnavailable, pool.acquire)
+        with self.assertLogs("communication.simulator", "WARNING"):
+            pool.release(endpoint, 1, True)
+        self.assertEqual(endpoint.state, OPEN)
+
+        now[0] = 20
+        pool.release(pool.acquire(), 1, False)
+        self.assertEqual(endpoint.state, CLOSED)
+        self.assertEqual(endpoint.outstanding, 0)
+
+    def test_health_checks(self):
+        """Test that simulators that stop answering are taken out of rotation"""
+        server = FakeSimulator(("127.0.0.1", 0))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = f"http://127.0.0.1:{server.server_port}/file"
+
+        pool = simulators(url, "http://127.0.0.1:1/file")
+        with self.assertLogs("communication.simulator", "WARNING"):
+            pool.check_health(timeout=1)
+        self.assertEqual(
+            [endpoint.healthy for endpoint in pool.endpoints], [True, False]
+        )
+        for _ in range(3):
+            endpoint = pool.acquire()
+            self.assertEqual(endpoint.url, url)
+
+        client = SimulatorClient(pool, 5, 2, 0, 0)
+        self.assertEqual(client.post("{}").status_code, 200)
+        self.assertEqual(server.requests, 1)
+
+    def test_histogram(self):
+        """Test that observations are counted in cumulative buckets"""
+        histogram = Histogram("test", "", (0.1, 1))
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(value)
+        value = histogram.value
+        self.assertEqual(value["buckets"], {"0.1": 2, "1": 3, "+Inf": 4})
+        self.assertEqual(value["count"], 4)
+        self.assertAlmostEqual(value["sum"], 3.65)
+
+
+class SlowSimulator(BaseHTTPRequestHandler):
+    """A simulator that takes 0.2 seconds to respond and records how many requests
+    it was handling at once"""
+
+    lock = threading.Lock()
+    active = 0
+    peak = 0
+    handled = 0
+
+    def do_POST(self):
+        cls = type(self)
+        with cls.lock:
+            cls.active += 1
+            cls.handled += 1
+            cls.peak = max(cls.peak, cls.active)
+        self.rfile.read(int(self.headers["Content-Length"]))
+        time.sleep(0.2)
+        with cls.lock:
+            cls.active -= 1
+        try:
+            self.send_response(200)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"{}")
+        except BrokenPipeError:
+            pass  # The client timed out and hung up
+
+    def log_message(self, *args):
+        pass
+
+
+class SimulatorClientTests(TestCase):
+    """Testing for the pooled simulator client"""
+
+    def setUp(self):
+        SlowSimulator.active = SlowSimulator.peak = SlowSimulator.handled = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), SlowSimulator)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/file"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_concurrency_limit(self):
+        """Test that no more than max_connections requests are sent at once"""
+        client = SimulatorClient(simulators(self.url), 5, 2, 0, 0)
+        threads = [threading.Thread(target=client.post, args=("{}",)) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(SlowSimulator.handled, 6)
+        self.assertEqual(SlowSimulator.peak, 2)
+        self.assertEqual(requests_in_flight.value, 0)
+        self.assertEqual(requests_queued.value, 0)
+
+    def test_read_timeout_not_retried(self):
+        """
+        Test that a request the simulator is slow to answer is sent only once, and
+        counts as a failure of the simulator
+        """
+        pool = simulators(self.url)
+        client = SimulatorClient(pool, 0.05, 2, 3, 0)
+        self.assertRaises(requests.ReadTimeout, client.post, "{}")
+        self.assertEqual(SlowSimulator.handled, 1)
+        self.assertEqual(pool.endpoints[0].failures, 1)
+
+        self.assertRaises(requests.ReadTimeout, client.post, "{}")
+        self.assertEqual(pool.endpoints[0].state, OPEN)
+        self.assertRaises(SimulatorUnavailable, client.post, "{}")
+
+    def test_async_read_timeout(self):
+        """Test that the async client also counts a timeout as a failure"""
+        pool = simulators(self.url)
+
+        async def post():
+            client = AsyncSimulatorClient(pool, 0.05, 2, 3)
+            async with client.client:
+                with self.assertRaises(httpx.ReadTimeout):
+                    await client.post(b"{}")
+
+        asyncio.run(post())
+        self.assertEqual(SlowSimulator.handled, 1)
+        self.assertEqual(pool.endpoints[0].failures, 1)
+
+    def test_connection_error_retried(self):
+        """Test that failed connections are retried before giving up"""
+        client = SimulatorClient(simulators("http://127.0.0.1:1/file"), 1, 2, 2, 0)
+        new_conn = HTTPConnection._new_conn
+        with mock.patch.object(
+            HTTPConnection, "_new_conn", autospec=True, side_effect=new_conn
+        ) as connect:
+            self.assertRaises(requests.ConnectionError, client.post, "{}")
+        self.assertEqual(connect.call_count, 3)
+        self.assertEqual(requests_in_flight.value, 0)
+
+
+class TelemetryTests(TestCase):
+    """Testing for the simulator log parser"""
+
+    def test_summary(self):
+        """Test the fields read without parsing every tick"""
+        log = SimulatorLog("0 1 2\n3 4 5\n1 finished\n")
+        self.assertEqual(len(log), 2)
+        self.assertEqual(log.final_tick(), (4, 5, 3))
+        self.assertTrue(log.did_win)
+        self.assertIsNone(log.error)
+        self.assertEqual(list(log), [(1, 2, 0), (4, 5, 3)])
+
+    def test_error(self):
+        """Test that the error the code raised is found"""
+        log = SimulatorLog("-1\nNullPointerException")
+        self.assertEqual(log.error, "NullPointerException")
+        self.assertFalse(log.did_win)
+        self.assertIsNone(SimulatorLog("1").final_tick())
+        self.assertEqual(list(SimulatorLog("1")), [])
+
+    def test_telemetry_json(self):
+        """Test that the pieces join into the JSON the views used to build"""
+        lines = [f"{i % 4} {i} {i * 2}" for i in range(10)]
+        log = "\n".join(lines + ["0"])
+        expected = json.dumps(split_telemetry(log)["telemetry"])
+        for batch in (1, 3, 10, 1024):
+            with self.subTest(batch=batch):
+                pieces = telemetry_json(SimulatorLog(log), batch)
+                self.assertEqual(json.loads("".join(pieces)), json.loads(expected))
+        self.assertEqual("".join(telemetry_json(SimulatorLog("1"))), "[]")
+
+    def test_compact_formats(self):
+        """Test that the compact formats decode back into the ticks"""
+        ticks = [(i % 300, i % 200, i % 4) for i in range(1000)]
+
+        columns = json.loads("".join(telemetry_columns(ticks)))
+        self.assertEqual(columns["format"], "columns")
+        self.assertEqual(
+            list(zip(columns["x"], columns["y"], map(int, columns["direction"]))),
+            ticks,
+        )
+
+        packed = json.loads("".join(telemetry_packed(ticks)))
+        self.assertEqual(packed["format"], "packed")
+        data = base64.b64decode(packed["data"])
+        (count,) = struct.unpack_from("<I", data)
+        start = 4
+        xs = struct.unpack_from(f"<{count}H", data, start)
+        start += count * 2
+        ys = struct.unpack_from(f"<{count}H", data, start)
+        start += count * 2
+        self.assertEqual(list(zip(xs, ys, data[start:])), ticks)
+
+        self.assertEqual(
+            json.loads("".join(telemetry_packed([])))["data"],
+            base64.b64encode(bytes(4)).decode(),
+        )
+
+    def test_format_sizes(self):
+        """Test that each compact format is smaller than the last"""
+        ticks = [(i % 300, i % 200, i % 4) for i in range(10_000)]
+        sizes = {
+            encode: len("".join(encode(ticks)))
+            for encode in (telemetry_json, telemetry_columns, telemetry_packed)
+        }
+        self.assertLess(sizes[telemetry_columns], sizes[telemetry_json] / 3)
+        self.assertLess(sizes[telemetry_packed], sizes[telemetry_columns])
+
+    def test_benchmark_command(self):
+        """Test that the benchmark command reports each benchmark"""
+        out = StringIO()
+        call_command(
+            "benchmark",
+            "parsing",
+            "formats",
+            "payload",
+            "results",
+            ticks=100,
+            results=10,
+            stdout=out,
+        )
+        self.assertIn("streamed", out.getvalue())
+        self.assertIn("telemetry_packed", out.getvalue())
+        self.assertIn("spliced bytes", out.getvalue())
+        self.assertIn("flushed", out.getvalue())
+        self.assertEqual(RunResult.objects.count(), 0)
+        self.assertRaises(CommandError, call_command, "benchmark", "unknown")
+
+
+class FakeSimulatorTests(TestCase):
+    """Testing for the stand-in simulator"""
+
+    def start(self, **options) -> str:
+        server = FakeSimulator(("127.0.0.1", 0), seed=0, **options)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return f"http://127.0.0.1:{server.server_port}/file"
+
+    def test_contract(self):
+        """Test that the fake answers like the mock simulator"""
+        url = self.start()
+        response = requests.post(url, json={"maze": {}, "java_content": ""})
+        self.assertEqual(response.status_code, 200)
+        log = SimulatorLog(response.json()["log"])
+        self.assertEqual(list(log), [(1, 2, 0), (4, 5, 3)])
+        self.assertTrue(log.did_win)
+
+        response = requests.post(url, json={"maze": {}, "java_content": "error"})
+        self.assertEqual(response.json(), {"error": "Error details"})
+
+    def test_options(self):
+        """Test the latency, error rate and log length"""
+        maze = {"num_row": 5, "num_col": 4, "start_row": 2, "start_col": 1}
+        url = self.start(latency=0.05, log_length=300)
+        start = time.perf_counter()
+        response = requests.post(url, json={"maze": maze, "java_content": ""})
+        self.assertGreaterEqual(time.perf_counter() - start, 0.05)
+        log = SimulatorLog(response.json()["log"])
+        self.assertEqual(len(log), 300)
+        self.assertTrue(all(0 <= x < 4 and 0 <= y < 5 for x, y, _ in log))
+
+        url = self.start(error_rate=1)
+        response = requests.post(url, json={"maze": maze, "java_content": ""})
+        self.assertEqual(response.status_code, 500)
+
+
+class LoadTestTests(LiveServerTestCase):
+    """Testing for the load test command against a live backend"""
+
+    def test_load_test(self):
+        """Test that every request is counted and its run result written"""
+        server = FakeSimulator(("127.0.0.1", 0))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = f"http://127.0.0.1:{server.server_port}/file"
+
+        out = StringIO()
+        with override_settings(
+            SIMULATOR={**django_settings.SIMULATOR, "URLS": [url]}
+        ), mock.patch("communication.simulator._pool", None), mock.patch(
+            "communication.simulator._client", None
+        ):
+            call_command(
+                "load_test",
+                url=f"{self.live_server_url}/backend/communication/",
+                rps=40,
+                duration=0.25,
+                users=2,
+                stdout=out,
+            )
+        self.assertIn("Sent 10 requests", out.getvalue())
+        self.assertIn("Statuses: 200 x10", out.getvalue())
+        self.assertIn("Run results written: 10", out.getvalue())
+        self.assertEqual(server.requests, 10)
+
+    def test_load_test_throttled(self):
+        """Test that throttled requests are counted apart from errors"""
+        out = StringIO()
+        with override_settings(
+            SIMULATION_RATE={**django_settings.SIMULATION_RATE, "ENABLED": True}
+        ), mock.patch(
+            "communication.admission._admission",
+            Admission(0.001, 100, 0.001, 2, 10),
+        ):
+            call_command(
+                "load_test",
+                url=f"{self.live_server_url}/backend/communication/",
+                endpoint="simulate",
+                rps=40,
+                duration=0.25,
+                stdout=out,
+                stderr=StringIO(),
+            )
+        # The default limit of 0.5/s for each user needs 80 users for 40/s
+        self.assertIn("from 80 users", out.getvalue())
+        self.assertIn("Throttled: 8 (80.0%)", out.getvalue())
+        self.assertIn("Errors: 0 (0.0%)", out.getvalue())
+
+    def test_percentile(self):
+        """Test the nearest rank percentiles"""
+        latencies = list(range(1, 101))
+        self.assertEqual(percentile(latencies, 50), 50)
+        self.assertEqual(percentile(latencies, 99), 99)
+        self.assertEqual(percentile([3], 95), 3)
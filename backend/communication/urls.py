@@ -3,4 +3,8 @@ from . import views
 
 urlpatterns = [
     path("receive_file/", views.receive_file, name="receive_file"),
+    path("receive_batch/", views.receive_batch, name="receive_batch"),
+    path("simulate/", views.simulate, name="simulate"),
+    path("jobs/<str:job_id>/", views.simulation_job, name="simulation_job"),
+    path("replays/<int:result_id>/", views.replay, name="replay"),
 ]
@@ -1,29 +1,85 @@
 import datetime
 import json
-from typing import Optional
+import logging
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, List, Optional
 
+import httpx
 import pytz
-import requests
+from channels.db import database_sync_to_async
+from django.conf import settings
 from django.http import HttpRequest
 from django.http import HttpResponse
+from django.http import HttpResponseNotAllowed
 from django.http import JsonResponse
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+import requests
 from requests import ReadTimeout
-from rest_framework.decorators import api_view
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.decorators import api_view, throttle_classes
+from rest_framework.exceptions import AuthenticationFailed
 
+from accounts.models import Profile
+from communication.admission import SimulationThrottle, admit, max_cost
+from communication.jobs import DONE, QueueFull, get_job_queue
+from communication.replays import (
+    RangeNotSatisfiable,
+    parse_range,
+    read_replay,
+    replay_size,
+    write_replay,
+)
+from communication.maze_cache import PreparedMaze, get_prepared_maze
+from communication.payload import encode_maze, simulator_payload
+from communication.result_writer import get_result_writer
+from communication.result_cache import (
+    SimulatorResult,
+    acache_result,
+    aget_cached_result,
+    cache_result,
+    get_cached_result,
+    result_key,
+)
+from communication.simulator import (
+    SimulatorUnavailable,
+    get_async_simulator_client,
+    get_simulator_client,
+)
+from communication.telemetry import OBJECTS, TELEMETRY_ENCODERS, SimulatorLog
+from maze.analysis import proximity
 from maze.models import MazeConfiguration, RunResult
-from maze.serializers import MazeConfigurationSerializer
 from tournament.models import Tournament
+from zigzag_backend import metrics
+from zigzag_backend.singleflight import AsyncSingleFlight, SingleFlight
+from zigzag_backend.streaming import in_worker_thread
+
+logger = logging.getLogger(__name__)
+
+simulations_coalesced = metrics.counter(
+    "simulations_coalesced",
+    "Submissions that shared an identical simulation already in flight",
+)
+# Identical submissions that arrive together share one simulation, keyed the same
+# way as the result cache
+_simulations = SingleFlight(simulations_coalesced)
+_async_simulations = AsyncSingleFlight(simulations_coalesced)
 
 
 @api_view(["POST"])
+@throttle_classes([SimulationThrottle])
 def receive_file(request: HttpRequest) -> HttpResponse:
     """
         this function is a receiver for Robot.java file uploading
-        do some shallow checking and send the file to simulator
+        do some shallow checking and queue a job that sends the file to simulator
     Args:
-        request (HttpRequest): a POST request bring a file in byte format
+        request (HttpRequest): a POST request bring a file in byte format,
+        optionally with a telemetry_format of "objects", "columns" or "packed"
     Returns:
-        HttpResponse: return 200 if it sent successfully, otherwise an error
+        HttpResponse: return 202 with the id of the job to poll with
+        simulation_job if it was queued, 429 with Retry-After if the user or
+        everyone together is over their simulation rate, otherwise an error
         signal
     """
     body = request.body.decode("utf-8")
@@ -31,28 +87,378 @@ def receive_file(request: HttpRequest) -> HttpResponse:
         return JsonResponse({"error": "request cannot be empty"}, status=400)
 
     data = json.loads(request.body)
-    tournament = None
-    if "tournament_id" in data:
-        maze_configuration = MazeConfiguration.objects.filter(
-            tournament__pk=data["tournament_id"]
-        ).first()
-        tournament = Tournament.objects.get(pk=data["tournament_id"])
+    if data.get("telemetry_format", OBJECTS) not in TELEMETRY_ENCODERS:
+        return _unknown_telemetry_format()
+    prepared = get_prepared_maze(data)
+    profile = request.user.profile
+    try:
+        job = get_job_queue().submit(profile.pk, _simulate, prepared, data, profile)
+    except QueueFull:
+        return JsonResponse(
+            {"error": "The simulator is busy. Please try again later."}, status=503
+        )
+
+    return JsonResponse(
+        {"job_id": job.id, "status": job.status},
+        status=202,
+        headers={"Location": reverse("simulation_job", args=[job.id])},
+    )
+
+
+@api_view(["POST"])
+def receive_batch(request: HttpRequest) -> HttpResponse:
+    """
+        a receiver for running one Robot.java file against many mazes, which
+        queues a single job that simulates them all at once
+    Args:
+        request (HttpRequest): a POST request with the user_code and a list of
+        maze_ids, optionally with a telemetry_format like receive_file
+    Returns:
+        HttpResponse: return 202 with the id of the job to poll with
+        simulation_job, whose response lists the maze_id, status_code and
+        response of each simulation in the order of maze_ids. Each maze counts
+        as one simulation against the rate limits, so a batch gets 429 with
+        Retry-After unless the user has a token for every maze
+    """
+    data = json.loads(request.body or "null")
+    if not isinstance(data, dict) or "user_code" not in data:
+        return JsonResponse({"error": "request needs user_code"}, status=400)
+    maze_ids = data.get("maze_ids")
+    max_mazes = settings.SIMULATION_BATCH["MAX_MAZES"]
+    # A batch larger than the rate limit bursts could never be admitted
+    max_mazes = min(max_mazes, max_cost() or max_mazes)
+    if (
+        not isinstance(maze_ids, list)
+        or not 0 < len(maze_ids) <= max_mazes
+        or not all(type(maze_id) is int for maze_id in maze_ids)
+    ):
+        return JsonResponse(
+            {"error": f"maze_ids must list between 1 and {max_mazes} maze ids"},
+            status=400,
+        )
+    if data.get("telemetry_format", OBJECTS) not in TELEMETRY_ENCODERS:
+        return _unknown_telemetry_format()
+
+    maze_ids = list(dict.fromkeys(maze_ids))
+    profile = request.user.profile
+    wait = admit(profile.pk, len(maze_ids))
+    if wait:
+        return _throttled(wait)
+    mazes = MazeConfiguration.objects.defer("level_configuration").in_bulk(maze_ids)
+    try:
+        job = get_job_queue().submit(
+            profile.pk,
+            _simulate_batch,
+            [mazes.get(maze_id) for maze_id in maze_ids],
+            maze_ids,
+            data,
+            profile,
+        )
+    except QueueFull:
+        return JsonResponse(
+            {"error": "The simulator is busy. Please try again later."}, status=503
+        )
+
+    return JsonResponse(
+        {"job_id": job.id, "status": job.status},
+        status=202,
+        headers={"Location": reverse("simulation_job", args=[job.id])},
+    )
+
+
+@api_view(["GET"])
+def simulation_job(request: HttpRequest, job_id: str) -> HttpResponse:
+    """
+        poll a simulation job queued by receive_file
+    Args:
+        request (HttpRequest): a GET request from the user who queued the job
+        job_id (str): the id receive_file returned
+    Returns:
+        HttpResponse: return 202 with the job status while it is queued or
+        running, then the response of the simulation once it is done
+    """
+    job = get_job_queue().get(job_id, request.user.profile.pk)
+    if job is None:
+        return JsonResponse({"error": "Job not found"}, status=404)
+    if job.status != DONE:
+        return JsonResponse({"job_id": job.id, "status": job.status}, status=202)
+    return job.response()
+
+
+@api_view(["GET"])
+def replay(request: HttpRequest, result_id: int) -> HttpResponse:
+    """
+        stream the telemetry of one of the user's runs back from the replay
+        store, in the columns telemetry format
+    Args:
+        request (HttpRequest): a GET request from the user who submitted the
+        run, optionally with a Range header asking for a single byte range
+    Returns:
+        HttpResponse: return the replay, or the requested part of it with 206,
+        404 if the run has no replay or its segment is missing and 416 if the
+        range is past its end
+    """
+    result = (
+        RunResult.objects.filter(pk=result_id, profile=request.user.profile)
+        .exclude(replay_segment=None)
+        .first()
+    )
+    if result is None:
+        return JsonResponse({"error": "Replay not found"}, status=404)
+
+    try:
+        size = replay_size(result)
+    except FileNotFoundError:
+        logger.warning(
+            "Replay segment %s of run %d is missing", result.replay_segment, result.pk
+        )
+        return JsonResponse({"error": "Replay not found"}, status=404)
+    try:
+        byte_range = parse_range(request.headers.get("Range"), size)
+    except RangeNotSatisfiable:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    start, end = byte_range or (0, size - 1)
+    response = StreamingHttpResponse(
+        # Each chunk is already a whole read of the segment
+        in_worker_thread(read_replay(result, start, end), batch=1),
+        status=206 if byte_range else 200,
+        content_type="application/json",
+    )
+    if byte_range:
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    response["Content-Length"] = end + 1 - start
+    response["Accept-Ranges"] = "bytes"
+    return response
+
+
+async def simulate(request: HttpRequest) -> HttpResponse:
+    """
+        an async receiver for Robot.java file uploading that runs the simulation
+        in the request, awaiting the simulator without holding a thread so many
+        simulations can be in flight at once. Only the database work runs in
+        threads.
+    Args:
+        request (HttpRequest): a POST request with the same body as
+        receive_file, authenticated with a token
+    Returns:
+        HttpResponse: the response of the simulation, the same as a finished
+        receive_file job gives
+    """
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+    profile = await _authenticate(request)
+    if profile is None:
+        return JsonResponse({"detail": "Invalid token."}, status=401)
+    wait = admit(profile.pk)
+    if wait:
+        return _throttled(wait)
+    if not request.body:
+        return JsonResponse({"error": "request cannot be empty"}, status=400)
+
+    data = json.loads(request.body)
+    telemetry_format = data.get("telemetry_format", OBJECTS)
+    if telemetry_format not in TELEMETRY_ENCODERS:
+        return _unknown_telemetry_format()
+    prepared, payload = await _prepare_simulation(data)
+    maze_configuration, tournament = prepared.maze_configuration, prepared.tournament
+    result = _new_result(maze_configuration, tournament)
+    response = None
+    key = result_key(
+        data["user_code"], maze_configuration, result.robot_configuration_id
+    )
+    simulator_result = await aget_cached_result(key)
+    if simulator_result is not None:
+        result.cache_hit = True
     else:
-        maze_configuration = MazeConfiguration.objects.filter(
-            pk=data["maze_id"]
-        ).first()
-    response, result = _run_simulation(maze_configuration, data, tournament)
-    result.profile = request.user.profile
-    result.save()
+        try:
+            simulator_result = await _async_simulations.do(
+                key, _asend_to_simulator, key, payload
+            )
+        except httpx.ReadTimeout:
+            response = _timed_out(result)
+        except (httpx.TransportError, SimulatorUnavailable):
+            response = _unavailable(result)
 
+    if response is None:
+        response = await database_sync_to_async(_simulation_response)(
+            result,
+            maze_configuration,
+            tournament,
+            simulator_result,
+            telemetry_format,
+            stream=True,
+        )
+    result.profile = profile
+    writer = get_result_writer()
+    if writer.eager:
+        await database_sync_to_async(writer.add)(result)
+    else:
+        writer.add(result)
     return response
 
 
-def _run_simulation(
-    maze_configuration: MazeConfiguration,
+# Requests are authenticated by token instead of by session, like the DRF views
+simulate.csrf_exempt = True
+
+
+@database_sync_to_async
+def _authenticate(request: HttpRequest) -> Optional[Profile]:
+    """Find the profile of the request's token the way the DRF views do"""
+    try:
+        user_auth = TokenAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return None
+    return user_auth[0].profile if user_auth else None
+
+
+@database_sync_to_async
+def _prepare_simulation(request_data):
+    """Find the maze the submission is for and build the simulator request"""
+    prepared = get_prepared_maze(request_data)
+    return prepared, simulator_payload(prepared.fragment, request_data["user_code"])
+
+
+def _simulate(prepared: PreparedMaze, request_data, profile) -> HttpResponse:
+    response, result = _run_simulation(prepared, request_data)
+    result.profile = profile
+    get_result_writer().add(result)
+    return response
+
+
+def _simulate_batch(
+    maze_configurations: List[Optional[MazeConfiguration]],
+    maze_ids: List[int],
     request_data,
-    tournament: Optional[Tournament],
-):
+    profile,
+) -> HttpResponse:
+    """
+    Run one submission against many mazes. Only the simulator requests run on the
+    batch's threads, the cache lookups, scoring and saving stay on this one.
+    """
+    results: List[Optional[RunResult]] = []
+    simulator_results: List[Optional[SimulatorResult]] = []
+    pending = {}
+    for index, maze_configuration in enumerate(maze_configurations):
+        result = simulator_result = None
+        if maze_configuration is not None:
+            result = _new_result(maze_configuration, None)
+            result.profile = profile
+            key = result_key(
+                request_data["user_code"],
+                maze_configuration,
+                result.robot_configuration_id,
+            )
+            simulator_result = get_cached_result(key)
+            if simulator_result is not None:
+                result.cache_hit = True
+            else:
+                pending[index] = (
+                    key,
+                    simulator_payload(
+                        encode_maze(maze_configuration), request_data["user_code"]
+                    ),
+                )
+        results.append(result)
+        simulator_results.append(simulator_result)
+
+    futures = {}
+    if pending:
+        workers = min(settings.SIMULATION_BATCH["WORKERS"], len(pending))
+        with ThreadPoolExecutor(workers, thread_name_prefix="simulation-batch") as pool:
+            for index, (key, payload) in pending.items():
+                futures[index] = pool.submit(
+                    _simulations.do, key, _send_to_simulator, key, payload
+                )
+
+    telemetry_format = request_data.get("telemetry_format", OBJECTS)
+    chunks = []
+    for index, (maze_id, result) in enumerate(zip(maze_ids, results)):
+        if result is None:
+            chunks.append(
+                f'{{"maze_id": {maze_id}, "status_code": 404, '
+                f'"response": {{"error": "Maze not found"}}}}'.encode()
+            )
+            continue
+        try:
+            if index in futures:
+                simulator_results[index] = futures[index].result()
+        except (requests.ConnectionError, SimulatorUnavailable):
+            response = _unavailable(result)
+        except ReadTimeout:
+            response = _timed_out(result)
+        else:
+            response = _simulation_response(
+                result,
+                maze_configurations[index],
+                None,
+                simulator_results[index],
+                telemetry_format,
+            )
+        chunks.append(
+            f'{{"maze_id": {maze_id}, "status_code": {response.status_code}, '
+            f'"response": '.encode() + response.content + b"}"
+        )
+
+    get_result_writer().add(*(result for result in results if result is not None))
+    return HttpResponse(
+        b'{"results": [' + b", ".join(chunks) + b"]}",
+        content_type="application/json",
+    )
+
+
+def _run_simulation(prepared: PreparedMaze, request_data):
+    maze_configuration, tournament = prepared.maze_configuration, prepared.tournament
+    result = _new_result(maze_configuration, tournament)
+    key = result_key(
+        request_data["user_code"], maze_configuration, result.robot_configuration_id
+    )
+    simulator_result = get_cached_result(key)
+    if simulator_result is not None:
+        result.cache_hit = True
+    else:
+        payload = simulator_payload(prepared.fragment, request_data["user_code"])
+        try:
+            simulator_result = _simulations.do(key, _send_to_simulator, key, payload)
+        except (requests.ConnectionError, SimulatorUnavailable):
+            return _unavailable(result), result
+        except ReadTimeout:
+            return _timed_out(result), result
+
+    telemetry_format = request_data.get("telemetry_format", OBJECTS)
+    return (
+        _simulation_response(
+            result, maze_configuration, tournament, simulator_result, telemetry_format
+        ),
+        result,
+    )
+
+
+def _send_to_simulator(key: Optional[str], payload: bytes) -> SimulatorResult:
+    """Run a simulation and cache the simulator's response under `key`"""
+    response = get_simulator_client().post(payload)
+    simulator_result = SimulatorResult(
+        response.status_code, response.text, response.reason
+    )
+    cache_result(key, simulator_result)
+    return simulator_result
+
+
+async def _asend_to_simulator(key: Optional[str], payload: bytes) -> SimulatorResult:
+    """The async version of :func:`_send_to_simulator`"""
+    response = await get_async_simulator_client().post(payload)
+    simulator_result = SimulatorResult(
+        response.status_code, response.text, response.reason_phrase
+    )
+    await acache_result(key, simulator_result)
+    return simulator_result
+
+
+def _new_result(
+    maze_configuration: MazeConfiguration, tournament: Optional[Tournament]
+) -> RunResult:
     result = RunResult()
     result.timestamp = datetime.datetime.now(tz=pytz.timezone("America/New_York"))
     result.duration = 0
@@ -61,75 +467,97 @@ def _run_simulation(
     result.did_win = False
     if tournament:
         result.tournament = tournament
+    return result
 
-    maze = MazeConfigurationSerializer(maze_configuration).data
 
-    maze["num_row"] = len(maze["level_configuration"])
-    maze["num_col"] = len(maze["level_configuration"][0])
+def _unavailable(result: RunResult) -> JsonResponse:
+    result.run_error = "Connection error"
+    return JsonResponse(
+        {"error": "The simulator is unavailable. Please try again later."},
+        status=503,
+    )
 
-    url = "http://simulation-manager:9999/file"
 
-    del maze["id"]
+def _throttled(wait: float) -> JsonResponse:
+    # The same response as SimulationThrottle gives
+    return JsonResponse(
+        {"detail": "Request was throttled."},
+        status=429,
+        headers={"Retry-After": str(math.ceil(wait))},
+    )
 
-    payload = json.dumps({"maze": maze, "java_content": request_data["user_code"]})
 
-    headers = {"Content-Type": "application/json"}
+def _unknown_telemetry_format() -> JsonResponse:
+    formats = ", ".join(TELEMETRY_ENCODERS)
+    return JsonResponse(
+        {"error": f"telemetry_format must be one of {formats}"}, status=400
+    )
 
-    try:
-        response = requests.request(
-            "POST", url, headers=headers, data=payload, timeout=15
-        )
-    except ReadTimeout:
-        result.run_error = "Timeout error"
-        return (
-            JsonResponse(
-                {"error": "An unexpected error occurred. Please try again later."},
-                status=500,
-            ),
-            result,
-        )
 
-    if response.status_code == 200:
-        res_data = json.loads(response.text)
+def _timed_out(result: RunResult) -> JsonResponse:
+    result.run_error = "Timeout error"
+    return JsonResponse(
+        {"error": "An unexpected error occurred. Please try again later."},
+        status=500,
+    )
+
+
+def _simulation_response(
+    result: RunResult,
+    maze_configuration: MazeConfiguration,
+    tournament: Optional[Tournament],
+    simulator_result: SimulatorResult,
+    telemetry_format: str = OBJECTS,
+    stream: bool = False,
+) -> HttpResponse:
+    if simulator_result.status_code == 200:
+        res_data = json.loads(simulator_result.text)
 
-        moves = []
+        log = None
         if not res_data["error"]:
-            moves = res_data["log"].strip().split("\n")
-            if moves[0] == "-1":
-                res_data["error"] = moves[1]
+            log = SimulatorLog(res_data["log"])
+            res_data["error"] = log.error
 
         if not res_data["error"]:
-            result.did_win = moves[-1][0] == "1"
-            data = {
-                "status": "ok",
-                "total_time": len(moves) - 2,
-                "telemetry": [_convert(i, entry) for i, entry in enumerate(moves[:-1])],
-                "did_win": result.did_win,
-            }
+            result.did_win = log.did_win
+            if result.did_win:
+                result.proximity = 1.0
+            elif len(log):
+                x, y, _ = log.final_tick()
+                result.proximity = proximity(maze_configuration, y, x)
             # result.result_data = data  # removed to save storage space for db
-            result.duration = len(data["telemetry"]) - 1
-            if tournament:
-                data["telemetry"] = None
+            result.duration = len(log) - 1
+            if settings.REPLAYS["ENABLED"]:
+                # Kept in the replay store instead
+                write_replay(result, log)
+
+            chunks = _response_chunks(
+                log, None if tournament else TELEMETRY_ENCODERS[telemetry_format]
+            )
+            if stream and len(log) >= settings.SIMULATOR["STREAM_TICKS"]:
+                return StreamingHttpResponse(
+                    in_worker_thread(chunks), content_type="application/json"
+                )
+            return HttpResponse(chunks, content_type="application/json")
         else:
             data = {"status": "error", "details": res_data["error"]}
             result.run_error = res_data["error"]
-        return (
-            JsonResponse(data=data),
-            result,
-        )
+        return JsonResponse(data=data)
     else:
-        result.run_error = response.reason
-        return (
-            JsonResponse({"error": response.reason}, status=response.status_code),
-            result,
+        result.run_error = simulator_result.reason
+        return JsonResponse(
+            {"error": simulator_result.reason}, status=simulator_result.status_code
         )
 
 
-def _convert(i, entry):
-    direction, x, y = entry.split(" ")
-    return {
-        "time": i,
-        "x": int(x),
-        "y": int(y),
-        "direction": ["up", "right", "down", "left"][int(direction)],
-    }
+def _response_chunks(
+    log: SimulatorLog, encode_telemetry: Optional[Callable]
+) -> Iterator[str]:
+    """Encode the response for a finished run, parsing its ticks as they are
+    encoded, with telemetry only if there is an encoder for it"""
+    yield f'{{"status": "ok", "total_time": {len(log) - 1}, "telemetry": '
+    if encode_telemetry is not None:
+        yield from encode_telemetry(log)
+    else:
+        yield "null"
+    yield f', "did_win": {"true" if log.did_win else "false"}}}'
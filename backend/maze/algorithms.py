@@ -0,0 +1,247 @@
+"""
+Maze generation algorithms. Each algorithm carves a perfect maze (exactly one path
+between any two cells) into a MazeGrid that starts with every wall up, drawing all
+of its randomness from `rng`, which is the :mod:`random` module or a
+:class:`random.Random` instance. All of them use memory linear in the number of
+cells.
+"""
+from typing import Callable, Dict, Iterator
+
+from maze.grid import ALL_WALLS, EAST, NORTH, OPPOSITE, SOUTH, WEST, MazeGrid
+
+
+def dfs(grid: MazeGrid, rng):
+    """
+    Randomized depth-first search (recursive backtracker). Produces long, winding
+    corridors with few dead ends. Linear time.
+    """
+    walls, cols, last_row = grid.walls, grid.cols, grid.rows - 1
+    visited = bytearray(len(grid))
+
+    initial_cell = rng.randrange(len(grid))
+    visited[initial_cell] = True
+
+    # Neighbor arithmetic is inlined here since this loop runs once per cell
+    stack = [initial_cell]
+    while stack:
+        current_cell = stack[-1]
+        row, col = divmod(current_cell, cols)
+        unvisited_neighbors = []
+        if row > 0 and not visited[current_cell - cols]:
+            unvisited_neighbors.append((current_cell - cols, NORTH))
+        if row < last_row and not visited[current_cell + cols]:
+            unvisited_neighbors.append((current_cell + cols, SOUTH))
+        if col < cols - 1 and not visited[current_cell + 1]:
+            unvisited_neighbors.append((current_cell + 1, EAST))
+        if col > 0 and not visited[current_cell - 1]:
+            unvisited_neighbors.append((current_cell - 1, WEST))
+        if unvisited_neighbors:
+            new_cell, wall = rng.choice(unvisited_neighbors)
+            walls[current_cell] &= ~wall
+            walls[new_cell] &= ~OPPOSITE[wall]
+            visited[new_cell] = True
+            stack.append(new_cell)
+        else:
+            stack.pop()
+
+
+def binary_tree(grid: MazeGrid, rng):
+    """
+    Binary tree. Every cell opens either north or east, which leaves the top row
+    and right column as unbroken corridors and biases paths diagonally. Linear time
+    and the cheapest algorithm here.
+    """
+    cols = grid.cols
+    for index in range(len(grid)):
+        row, col = divmod(index, cols)
+        if row > 0 and col < cols - 1:
+            if rng.random() < 0.5:
+                grid.carve(index, index - cols, NORTH)
+            else:
+                grid.carve(index, index + 1, EAST)
+        elif row > 0:
+            grid.carve(index, index - cols, NORTH)
+        elif col < cols - 1:
+            grid.carve(index, index + 1, EAST)
+
+
+def kruskal(grid: MazeGrid, rng):
+    """
+    Randomized Kruskal's. Walls are removed in a random order whenever they separate
+    two disjoint sets, tracked with a union-find using path halving and union by
+    size. Produces many short dead ends. Near-linear time (inverse Ackermann).
+    """
+    cols = grid.cols
+    edges = []
+    for index in range(len(grid)):
+        row, col = divmod(index, cols)
+        if row > 0:
+            edges.append((index, index - cols, NORTH))
+        if col < cols - 1:
+            edges.append((index, index + 1, EAST))
+    rng.shuffle(edges)
+
+    parent = list(range(len(grid)))
+    size = [1] * len(grid)
+
+    def find(cell):
+        while parent[cell] != cell:
+            parent[cell] = parent[parent[cell]]
+            cell = parent[cell]
+        return cell
+
+    remaining = len(grid) - 1
+    for index, neighbor, wall in edges:
+        if not remaining:
+            break
+        a, b = find(index), find(neighbor)
+        if a == b:
+            continue
+        if size[a] < size[b]:
+            a, b = b, a
+        parent[b] = a
+        size[a] += size[b]
+        grid.carve(index, neighbor, wall)
+        remaining -= 1
+
+
+def prim(grid: MazeGrid, rng):
+    """
+    Randomized Prim's. The maze grows outwards from a random cell by attaching a
+    random frontier cell to a random neighbor already in the maze. The frontier is
+    a list with swap-remove plus a membership bytearray so every step is O(1).
+    Produces short, branching passages. Linear time.
+    """
+    in_maze = bytearray(len(grid))
+    in_frontier = bytearray(len(grid))
+    frontier = []
+
+    def add(cell):
+        in_maze[cell] = True
+        for neighbor, _ in grid.neighbors(cell):
+            if not in_maze[neighbor] and not in_frontier[neighbor]:
+                in_frontier[neighbor] = True
+                frontier.append(neighbor)
+
+    add(rng.randrange(len(grid)))
+    while frontier:
+        pick = rng.randrange(len(frontier))
+        frontier[pick], frontier[-1] = frontier[-1], frontier[pick]
+        cell = frontier.pop()
+        neighbor, wall = rng.choice([n for n in grid.neighbors(cell) if in_maze[n[0]]])
+        grid.carve(cell, neighbor, wall)
+        add(cell)
+
+
+def wilson(grid: MazeGrid, rng):
+    """
+    Wilson's algorithm. Loop-erased random walks from each cell not yet in the maze
+    until they hit it, giving a uniformly random spanning tree with no bias.
+    Loop erasure is implicit: the walk only remembers the last exit taken from each
+    cell. Linear memory; expected time is proportional to the grid's mean hitting
+    time, which makes it the slowest algorithm here on large grids.
+    """
+    in_maze = bytearray(len(grid))
+    exits = [None] * len(grid)
+
+    in_maze[rng.randrange(len(grid))] = True
+    for start in range(len(grid)):
+        if in_maze[start]:
+            continue
+
+        cell = start
+        while not in_maze[cell]:
+            exits[cell] = rng.choice(grid.neighbors(cell))
+            cell = exits[cell][0]
+
+        cell = start
+        while not in_maze[cell]:
+            neighbor, wall = exits[cell]
+            grid.carve(cell, neighbor, wall)
+            in_maze[cell] = True
+            cell = neighbor
+
+
+def eller_rows(rows: int, cols: int, rng) -> Iterator[bytearray]:
+    """
+    Eller's algorithm, yielding the finished wall masks of one row at a time. Only
+    the set membership of the current row is kept, so working memory is linear in
+    the number of columns no matter how many rows are generated.
+
+    :param rows: Number of rows in the maze
+    :param cols: Number of columns in the maze
+    :param rng: The source of randomness
+    :return: An iterator of bytearrays holding each row's wall masks
+    """
+    next_set = 0
+    sets = [-1] * cols
+    open_north = bytearray(cols)
+
+    for row in range(rows):
+        last_row = row == rows - 1
+        masks = bytearray([ALL_WALLS]) * cols
+
+        # Cells that were not carved into from above start in a set of their own
+        for col in range(cols):
+            if open_north[col]:
+                masks[col] &= ~NORTH
+            else:
+                sets[col] = next_set
+                next_set += 1
+
+        # Join adjacent cells in different sets, always on the last row
+        parent = {}
+
+        def find(set_id):
+            while parent.get(set_id, set_id) != set_id:
+                parent[set_id] = parent.get(parent[set_id], parent[set_id])
+                set_id = parent[set_id]
+            return set_id
+
+        for col in range(cols - 1):
+            a, b = find(sets[col]), find(sets[col + 1])
+            if a != b and (last_row or rng.random() < 0.5):
+                parent[b] = a
+                masks[col] &= ~EAST
+                masks[col + 1] &= ~WEST
+        sets = [find(set_id) for set_id in sets]
+
+        # Every set extends down at least once so no set is cut off
+        open_north = bytearray(cols)
+        if not last_row:
+            members = {}
+            for col, set_id in enumerate(sets):
+                members.setdefault(set_id, []).append(col)
+            for group in members.values():
+                down = [col for col in group if rng.random() < 0.5]
+                for col in down or [rng.choice(group)]:
+                    masks[col] &= ~SOUTH
+                    open_north[col] = True
+
+        yield masks
+
+
+def eller(grid: MazeGrid, rng):
+    """
+    Eller's algorithm, which builds the maze one row at a time. Produces horizontal
+    bias with moderate dead ends. Linear time.
+    """
+    start = 0
+    for masks in eller_rows(grid.rows, grid.cols, rng):
+        end = start + grid.cols
+        grid.walls[start:end] = masks
+        start = end
+
+
+ALGORITHMS: Dict[str, Callable[[MazeGrid, object], None]] = {
+    "dfs": dfs,
+    "binary_tree": binary_tree,
+    "kruskal": kruskal,
+    "prim": prim,
+    "wilson": wilson,
+    "eller": eller,
+}
+"""Maps each algorithm name to the function that carves it"""
+
+DEFAULT_ALGORITHM = "dfs"
+"""The algorithm used when none is requested"""
@@ -0,0 +1,243 @@
+import struct
+from array import array
+from itertools import groupby
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from maze.encoding import decode_level_configuration
+from maze.grid import EAST, NORTH, SOUTH, WEST
+from maze.models import MazeConfiguration
+
+UNREACHED = -1
+"""Distance of a cell that cannot be reached"""
+
+_WALL_COUNT = np.array([bin(mask).count("1") for mask in range(16)])
+
+
+def analyse(level_configuration, start_row, start_col, end_row, end_col) -> Dict:
+    """
+    Measure the difficulty of a maze in linear time.
+
+    :param level_configuration: The rows and columns of the maze as hex strings,
+    or its wall masks from :meth:`~maze.models.MazeConfiguration.wall_masks`
+    :param start_row: Row of the robot's start position
+    :param start_col: Column of the robot's start position
+    :param end_row: Row of the goal
+    :param end_col: Column of the goal
+    :return: A dict with
+
+        - ``shortest_path``: moves on the shortest path from start to goal, or None
+          if the goal cannot be reached
+        - ``dead_ends``: number of cells with a single opening
+        - ``branching_factor``: average number of new cells reachable from each
+          cell that leads anywhere new, when exploring outwards from the start
+        - ``longest_corridor``: cells in the longest straight, unbroken passage
+
+    :raises ValueError: If the level configuration or coordinates are invalid
+    """
+    masks = _as_masks(level_configuration)
+    rows, cols = masks.shape
+    if not (0 <= start_row < rows and 0 <= start_col < cols):
+        raise ValueError("The start position is outside of the maze")
+    if not (0 <= end_row < rows and 0 <= end_col < cols):
+        raise ValueError("The goal is outside of the maze")
+    masks = _sealed(masks)
+
+    distance, reached, parents = _search(masks, [start_row * cols + start_col])
+    goal = distance[end_row * cols + end_col]
+    return {
+        "shortest_path": None if goal == UNREACHED else goal,
+        "dead_ends": int((_WALL_COUNT[masks] == 3).sum()),
+        "branching_factor": round((reached - 1) / parents, 3) if parents else 0,
+        "longest_corridor": max(
+            _longest_run(masks & EAST), _longest_run(masks.T & SOUTH)
+        ),
+    }
+
+
+def distance_field(level_configuration, goals: Iterable[Tuple[int, int]]) -> bytes:
+    """
+    Compute how many moves every cell of a maze is from the nearest goal, with a
+    breadth-first search from all of the goals at once.
+
+    :param level_configuration: The rows and columns of the maze as hex strings,
+    or its wall masks from :meth:`~maze.models.MazeConfiguration.wall_masks`
+    :param goals: The (row, col) of each goal cell
+    :return: The distance of each cell in row-major order as little-endian unsigned
+    integers, 2 bytes each if every distance fits and 4 bytes otherwise. Cells that
+    cannot reach a goal hold the largest value of the type.
+    :raises ValueError: If the level configuration or goals are invalid
+    """
+    masks = _as_masks(level_configuration)
+    rows, cols = masks.shape
+    if not all(0 <= row < rows and 0 <= col < cols for row, col in goals):
+        raise ValueError("A goal is outside of the maze")
+
+    distance, _, _ = _search(_sealed(masks), [row * cols + col for row, col in goals])
+    distance = np.frombuffer(distance, dtype=np.int32)
+    dtype = np.dtype("<u2") if distance.max() < 0xFFFF else np.dtype("<u4")
+    return distance.astype(dtype).tobytes()  # UNREACHED wraps around to the max
+
+
+def distance_at(field: bytes, rows: int, cols: int, row: int, col: int):
+    """
+    Look up the distance of one cell in a distance field without decoding the rest.
+
+    :param field: A distance field from :func:`distance_field`
+    :param rows: Number of rows in the maze
+    :param cols: Number of columns in the maze
+    :param row: Row of the cell
+    :param col: Column of the cell
+    :return: The number of moves to the nearest goal, or None if the cell is outside
+    of the maze or cannot reach a goal
+    """
+    if not (0 <= row < rows and 0 <= col < cols):
+        return None
+    size = len(field) // (rows * cols)
+    item_format = "<H" if size == 2 else "<I"
+    (distance,) = struct.unpack_from(item_format, field, (row * cols + col) * size)
+    return None if distance == 256**size - 1 else distance
+
+
+def _as_masks(level_configuration) -> np.ndarray:
+    """Decode a level configuration into wall masks, unless it already is some"""
+    if isinstance(level_configuration, np.ndarray):
+        return level_configuration
+    return decode_level_configuration(level_configuration)
+
+
+def _sealed(masks: np.ndarray) -> np.ndarray:
+    """Get a copy of the wall masks with the outer walls closed, so searches never
+    leave the grid"""
+    masks = masks.copy()
+    masks[0] |= NORTH
+    masks[-1] |= SOUTH
+    masks[:, 0] |= WEST
+    masks[:, -1] |= EAST
+    return masks
+
+
+def _search(masks: np.ndarray, sources: List[int]) -> Tuple[array, int, int]:
+    """
+    Breadth-first search outwards from the source cells.
+
+    :param masks: The sealed wall masks of the maze
+    :param sources: Flat indexes of the cells to start from
+    :return: The distance of every cell from the nearest source (UNREACHED if it
+    cannot be reached), the number of cells reached and the number of cells that
+    led to at least one new cell
+    """
+    cols = masks.shape[1]
+    walls = masks.tobytes()
+    distance = array("i", [UNREACHED]) * len(walls)
+    for source in sources:
+        distance[source] = 0
+
+    queue = array("i", sources)
+    parents = 0
+    for cell in queue:
+        children = 0
+        mask = walls[cell]
+        for wall, neighbor in (
+            (NORTH, cell - cols),
+            (SOUTH, cell + cols),
+            (EAST, cell + 1),
+            (WEST, cell - 1),
+        ):
+            if not mask & wall and distance[neighbor] == UNREACHED:
+                distance[neighbor] = distance[cell] + 1
+                queue.append(neighbor)
+                children += 1
+        parents += children > 0
+    return distance, len(queue), parents
+
+
+def _longest_run(walls) -> int:
+    """
+    Get the most cells joined in a straight line, given the walls each cell has on
+    the side facing the next cell of its line
+    """
+    longest = 1
+    for line in walls.tolist():
+        for is_wall, run in groupby(line):
+            if not is_wall:
+                longest = max(longest, sum(1 for _ in run) + 1)
+    return longest
+
+
+def proximity(maze_configuration: MazeConfiguration, row: int, col: int):
+    """
+    Score how close a robot that stopped at (row, col) got to the goal: 1 at the
+    goal, 0 at the start or anywhere at least as far away, and in between by the
+    fraction of the start's distance to the goal that was covered.
+
+    :param maze_configuration: The maze the robot ran in
+    :param row: Row of the robot's final position
+    :param col: Column of the robot's final position
+    :return: The score, or None if the maze is invalid or the position is outside
+    of it or cannot reach the goal
+    """
+    field = get_distance_field(maze_configuration)
+    if field is None:
+        return None
+    rows, cols = maze_configuration.dimensions()
+    remaining = distance_at(field, rows, cols, row, col)
+    total = distance_at(
+        field, rows, cols, maze_configuration.start_row, maze_configuration.start_col
+    )
+    if remaining is None:
+        return None
+    if not total:
+        return 1.0 if remaining == 0 else 0.0
+    return max(0.0, 1 - remaining / total)
+
+
+def get_distance_field(maze_configuration: MazeConfiguration) -> Optional[bytes]:
+    """
+    Get the distance field to the goal of a saved maze, computing and storing it
+    on first use.
+
+    :param maze_configuration: The maze to get the distances of
+    :return: The result of :func:`distance_field`, or None if the maze is invalid
+    """
+    if maze_configuration.distance_field is None:
+        try:
+            field = distance_field(
+                maze_configuration.wall_masks(),
+                [(maze_configuration.end_row, maze_configuration.end_col)],
+            )
+        except (TypeError, ValueError, IndexError, AttributeError):
+            return None
+        maze_configuration.distance_field = field
+        if maze_configuration.pk is not None:
+            MazeConfiguration.objects.filter(pk=maze_configuration.pk).update(
+                distance_field=field
+            )
+    return maze_configuration.distance_field
+
+
+def get_analysis(maze_configuration: MazeConfiguration) -> Optional[Dict]:
+    """
+    Get the analysis of a saved maze, computing and storing it on first use.
+
+    :param maze_configuration: The maze to analyse
+    :return: The result of :func:`analyse`, or None if the maze is invalid
+    """
+    if maze_configuration.analysis is None:
+        try:
+            maze_configuration.analysis = analyse(
+                maze_configuration.wall_masks(),
+                maze_configuration.start_row,
+                maze_configuration.start_col,
+                maze_configuration.end_row,
+                maze_configuration.end_col,
+            )
+        except (TypeError, ValueError, IndexError, AttributeError):
+            return None
+        if maze_configuration.pk is not None:
+            # Update directly so the cache does not count as an edit to the maze
+            MazeConfiguration.objects.filter(pk=maze_configuration.pk).update(
+                analysis=maze_configuration.analysis
+            )
+    return maze_configuration.analysis
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class MazeConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "maze"
+
+    def ready(self):
+        # Connect the signals that keep the seeded maze cache up to date
+        from maze import seeded  # noqa: F401
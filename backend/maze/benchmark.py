@@ -0,0 +1,111 @@
+"""
+Benchmark harness for comparing the maze generation algorithms on speed and on the
+character of the mazes they produce, and for timing the level configuration
+encoder. Run it with ``python manage.py maze_benchmark``.
+"""
+import random
+import time
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from maze.algorithms import ALGORITHMS
+from maze.encoding import encode_level_configuration
+from maze.grid import EAST, NORTH, SOUTH, WEST, MazeGrid
+
+_OPENINGS = np.array([4 - bin(mask).count("1") for mask in range(16)])
+_STRAIGHT = np.zeros(16, dtype=bool)
+_STRAIGHT[[NORTH | SOUTH, EAST | WEST]] = True  # Walls on both sides, open ahead
+
+
+def maze_character(grid: MazeGrid) -> Dict[str, float]:
+    """
+    Summarize the shape of a generated maze.
+
+    :param grid: The generated maze
+    :return: The fraction of cells that are dead ends, straight corridors and
+    junctions (three or more openings)
+    """
+    masks = grid.as_array()
+    openings = _OPENINGS[masks]
+    cells = masks.size
+    return {
+        "dead_ends": float((openings == 1).sum()) / cells,
+        "straight": float(_STRAIGHT[masks].sum()) / cells,
+        "junctions": float((openings >= 3).sum()) / cells,
+    }
+
+
+def benchmark(
+    algorithms: Optional[Iterable[str]] = None,
+    sizes: Iterable[int] = (15, 50, 100),
+    repeat: int = 3,
+    seed: int = 0,
+) -> List[Dict]:
+    """
+    Time each algorithm on square grids of each size.
+
+    :param algorithms: Names of the algorithms to run, defaults to all of them
+    :param sizes: Side lengths of the grids to generate
+    :param repeat: How many mazes to generate per algorithm and size
+    :param seed: Seed for the random source so runs can be compared
+    :return: One result per algorithm and size with the best time in seconds and
+    the average maze character
+    """
+    results = []
+    for name in algorithms or ALGORITHMS:
+        for size in sizes:
+            rng = random.Random(seed)
+            best = float("inf")
+            character = {}
+            for _ in range(repeat):
+                grid = MazeGrid(size, size)
+                start = time.perf_counter()
+                ALGORITHMS[name](grid, rng)
+                best = min(best, time.perf_counter() - start)
+                for key, value in maze_character(grid).items():
+                    character[key] = character.get(key, 0) + value / repeat
+            results.append({"algorithm": name, "size": size, "seconds": best})
+            results[-1].update(character)
+    return results
+
+
+def per_cell_hex(mask: int) -> str:
+    """The per-cell formatting the hex grid used before batched encoding"""
+    return str(
+        hex(
+            int(
+                f"{mask >> 3 & 1}{mask >> 2 & 1}{mask >> 1 & 1}{mask & 1}",
+                2,
+            )
+        )[2:]
+    )
+
+
+def encoding_benchmark(
+    sizes: Iterable[int] = (15, 50, 100, 250, 500), repeat: int = 3, seed: int = 0
+) -> List[Dict]:
+    """
+    Time per-cell formatting against the batched encoder on random wall masks.
+
+    :param sizes: Side lengths of the grids to encode
+    :param repeat: How many times to encode each grid
+    :param seed: Seed for the wall masks so runs can be compared
+    :return: One result per size with the best time in seconds of each encoder
+    """
+    rng = np.random.default_rng(seed)
+    results = []
+    for size in sizes:
+        masks = rng.integers(0, 16, size=(size, size), dtype=np.uint8)
+        mask_rows = masks.tolist()
+        per_cell = batched = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            [[per_cell_hex(mask) for mask in row] for row in mask_rows]
+            per_cell = min(per_cell, time.perf_counter() - start)
+
+            start = time.perf_counter()
+            encode_level_configuration(masks)
+            batched = min(batched, time.perf_counter() - start)
+        results.append({"size": size, "per_cell": per_cell, "batched": batched})
+    return results
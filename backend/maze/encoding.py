@@ -0,0 +1,129 @@
+import struct
+from typing import List, Tuple
+
+import numpy as np
+
+HEX_DIGITS = np.array(list("0123456789abcdef"))
+"""The hex digit for each wall mask, indexed by the mask"""
+
+_INVALID = 0xFF
+
+_PACKED_HEADER = struct.Struct("<HH")
+"""The rows and columns at the start of packed level data"""
+
+# The wall mask for each ASCII byte, or _INVALID if it is not a hex digit
+_MASKS = np.full(256, _INVALID, dtype=np.uint8)
+for _mask, _digit in enumerate("0123456789abcdef"):
+    _MASKS[ord(_digit)] = _MASKS[ord(_digit.upper())] = _mask
+
+
+def encode_level_configuration(masks) -> List[List[str]]:
+    """
+    Convert a matrix of wall masks into a level configuration in a single pass.
+
+    :param masks: A 2d array-like of wall masks (0-15), one per cell
+    :return: The rows and columns of the maze as lists of one-character hex strings
+    """
+    return HEX_DIGITS[np.asarray(masks, dtype=np.uint8) & 0xF].tolist()
+
+
+def decode_level_configuration(level_configuration: List[List[str]]) -> np.ndarray:
+    """
+    Convert a level configuration back into a matrix of wall masks.
+
+    :param level_configuration: The rows and columns of the maze as hex strings
+    :return: A rows x cols uint8 array of wall masks
+    :raises ValueError: If the rows are uneven or a cell is not a hex digit
+    """
+    rows = ["".join(row) for row in level_configuration]
+    cols = len(rows[0]) if rows else 0
+    if any(len(row) != cols for row in rows):
+        raise ValueError("Every row of the maze must have the same number of cells")
+
+    try:
+        raw = "".join(rows).encode("ascii")
+    except UnicodeEncodeError:
+        raise ValueError("Maze cells must be hex digits")
+    masks = _MASKS[np.frombuffer(raw, dtype=np.uint8)]
+    if (masks == _INVALID).any():
+        raise ValueError("Maze cells must be hex digits")
+    return masks.reshape(len(rows), cols)
+
+
+def pack_masks(masks) -> bytes:
+    """
+    Pack a matrix of wall masks into two cells per byte.
+
+    :param masks: A 2d array-like of wall masks (0-15), one per cell
+    :return: The number of rows and columns as little-endian unsigned shorts,
+    followed by the cells in row-major order with the first of each pair in the
+    high nibble
+    :raises ValueError: If the maze has more than 65535 rows or columns
+    """
+    masks = np.asarray(masks, dtype=np.uint8)
+    rows, cols = masks.shape
+    try:
+        header = _PACKED_HEADER.pack(rows, cols)
+    except struct.error:
+        raise ValueError("Packed level data can have at most 65535 rows and columns")
+    cells = masks.ravel() & 0xF
+    if cells.size % 2:
+        cells = np.append(cells, np.uint8(0))
+    return header + (cells[0::2] << 4 | cells[1::2]).tobytes()
+
+
+def packed_dimensions(data) -> Tuple[int, int]:
+    """
+    Read the size of a maze from data packed by :func:`pack_masks`, without
+    unpacking its cells.
+
+    :param data: The packed bytes, or a buffer holding them
+    :return: The number of rows and columns
+    :raises ValueError: If the data is too short to hold its dimensions
+    """
+    try:
+        return _PACKED_HEADER.unpack_from(data)
+    except struct.error:
+        raise ValueError("Packed level data must start with its dimensions")
+
+
+def unpack_masks(data) -> np.ndarray:
+    """
+    Unpack wall masks packed by :func:`pack_masks`.
+
+    :param data: The packed bytes, or a buffer holding them
+    :return: A rows x cols uint8 array of wall masks
+    :raises ValueError: If the data is too short for its dimensions
+    """
+    rows, cols = packed_dimensions(data)
+    packed = np.frombuffer(data, dtype=np.uint8, offset=_PACKED_HEADER.size)
+    count = rows * cols
+    if packed.size * 2 < count:
+        raise ValueError("Packed level data is shorter than its dimensions")
+
+    masks = np.empty(packed.size * 2, dtype=np.uint8)
+    masks[0::2] = packed >> 4
+    masks[1::2] = packed & 0xF
+    return masks[:count].reshape(rows, cols)
+
+
+def pack_level_configuration(level_configuration: List[List[str]]) -> bytes:
+    """
+    Pack a level configuration into two cells per byte, see :func:`pack_masks`.
+
+    :param level_configuration: The rows and columns of the maze as hex strings
+    :return: The packed level data
+    :raises ValueError: If the rows are uneven or a cell is not a hex digit
+    """
+    return pack_masks(decode_level_configuration(level_configuration))
+
+
+def unpack_level_configuration(data) -> List[List[str]]:
+    """
+    Unpack level data packed by :func:`pack_level_configuration`.
+
+    :param data: The packed bytes, or a buffer holding them
+    :return: The rows and columns of the maze as lists of one-character hex strings
+    :raises ValueError: If the data is too short for its dimensions
+    """
+    return encode_level_configuration(unpack_masks(data))
@@ -1,90 +1,79 @@
 import random
-from typing import List
+from typing import Iterator, List
+
+from maze.algorithms import ALGORITHMS, DEFAULT_ALGORITHM, eller_rows
+from maze.encoding import encode_level_configuration
+from maze.grid import HEX_TABLE, MazeGrid
 
 
 class Maze:
     """
-    This class generates and represents mazes created with the randomized DFS
+    This class generates and represents mazes created with one of the algorithms in
+    :mod:`maze.algorithms` (the randomized DFS by default)
     """
 
-    def __init__(self, rows, cols):
+    def __init__(self, rows, cols, algorithm=DEFAULT_ALGORITHM, seed=None):
         """
         This method initializes a Maze object with the specified
-        number of rows and columns. It creates a grid of Cells and links them together
-        to form the maze structure. The input parameters `rows` and `cols` should be
+        number of rows and columns. It creates a MazeGrid with every wall up and
+        carves a random maze into it. The input parameters `rows` and `cols` should be
         positive integers representing the dimensions of the maze.
 
         :param rows: Number of rows in the maze
         :param cols: Number of columns in the maze
+        :param algorithm: Name of the generation algorithm in ALGORITHMS to use
+        :param seed: Seed for a private random source, which makes the maze the same
+        every time for the same seed, algorithm and size. Without it the global
+        :mod:`random` state is used.
+        :raises KeyError: If the algorithm is not registered
         """
+        if algorithm not in ALGORITHMS:
+            raise KeyError(f"Unknown maze generation algorithm: {algorithm}")
 
         self.rows = rows
         self.cols = cols
-
-        self._cell_grid = [[Cell() for c in range(cols)] for r in range(rows)]
-        self.all_cells = []
-
-        # Link all the rows together
-        for row in self._cell_grid:
-            for c in range(len(row)):
-                self.all_cells.append(row[c])  # Save a ref to all cells
-                if c > 0:
-                    row[c].west = row[c - 1]
-                if c < len(row) - 1:
-                    row[c].east = row[c + 1]
-
-        # Link all the columns together
-        for c in range(self.cols):
-            for r in range(self.rows):
-                if r > 0:
-                    self._cell_grid[r][c].north = self._cell_grid[r - 1][c]
-                if r < self.rows - 1:
-                    self._cell_grid[r][c].south = self._cell_grid[r + 1][c]
+        self.algorithm = algorithm
+        self.seed = seed
+        self.grid = MazeGrid(rows, cols)
 
         self._generate()
 
     def _generate(self):
         """
-        Links the Maze's cells together in a random maze formation
-        """
-        initial_cell = self._get_random_unvisited()
-        initial_cell.visited = True
-
-        stack = [initial_cell]
-        while len(stack):
-            current_cell = stack.pop()
-            unvisited_neigbors = current_cell.unvisited_neighbors
-            if len(unvisited_neigbors):
-                stack.append(current_cell)
-                new_cell = random.choice(unvisited_neigbors)
-                current_cell.break_down_walls(new_cell)
-                new_cell.visited = True
-                stack.append(new_cell)
-
-    def _get_random_unvisited(self) -> "Cell":
+        Carves the Maze's grid into a random maze formation
         """
-        Get a random unvisited cell in the grid
-        :return: A random unvisited Cell
-        """
-        return random.choice(
-            [cell for cell in self.all_cells if cell is not None and not cell.visited]
-        )
+        rng = random if self.seed is None else random.Random(self.seed)
+        ALGORITHMS[self.algorithm](self.grid, rng)
 
     def __str__(self):
         """Get the string representation of the grid of cells for the maze"""
-        return "\n".join(
-            ["".join([str(col) for col in row]) for row in self._cell_grid]
-        )
+        return "\n".join(self.grid.row_hex(r) for r in range(self.rows))
 
     @property
     def hex_grid(self):
         """Return the 2d array of hex values that represents the maze"""
-        return [[str(col) for col in row] for row in self._cell_grid]
+        return encode_level_configuration(self.grid.as_array())
+
+
+def stream_hex_rows(rows: int, cols: int, rng=random) -> Iterator[str]:
+    """
+    Generate a maze with Eller's algorithm one row at a time, without ever holding
+    the whole maze in memory. The rows match those of ``Maze(rows, cols, "eller")``
+    for the same random state.
+
+    :param rows: Number of rows in the maze
+    :param cols: Number of columns in the maze
+    :param rng: The source of randomness
+    :return: An iterator of each row of the maze as a string of hex digits
+    """
+    for masks in eller_rows(rows, cols, rng):
+        yield masks.translate(HEX_TABLE).decode()
 
 
 class Cell:
     """
-    This class represents a cell in a maze.
+    This class represents a cell in a maze as a linked object. Mazes themselves are
+    stored in a MazeGrid, but the cell's string form matches a MazeGrid wall mask.
     """
 
     def __init__(self):
@@ -137,14 +126,9 @@ class Cell:
 
         :return: The hexadecimal string representation of the Cell object.
         """
-        return str(
-            hex(
-                int(
-                    (
-                        f"{1 if self.wall_north else 0}{1 if self.wall_east else 0}"
-                        f"{1 if self.wall_south else 0}{1 if self.wall_west else 0}"
-                    ),
-                    2,
-                )
-            )[2:]
-        )
+        return "0123456789abcdef"[
+            self.wall_north << 3
+            | self.wall_east << 2
+            | self.wall_south << 1
+            | self.wall_west
+        ]
@@ -0,0 +1,90 @@
+from typing import List, Tuple
+
+import numpy as np
+
+NORTH = 0b1000
+"""Wall bit for the north side of a cell"""
+EAST = 0b0100
+"""Wall bit for the east side of a cell"""
+SOUTH = 0b0010
+"""Wall bit for the south side of a cell"""
+WEST = 0b0001
+"""Wall bit for the west side of a cell"""
+ALL_WALLS = NORTH | EAST | SOUTH | WEST
+"""Wall mask of a cell that has not been carved into yet"""
+
+OPPOSITE = {NORTH: SOUTH, SOUTH: NORTH, EAST: WEST, WEST: EAST}
+"""Maps each wall bit to the matching wall bit of the neighboring cell"""
+
+HEX_TABLE = bytes.maketrans(bytes(range(16)), b"0123456789abcdef")
+"""Translation table from wall masks (0-15) to their ASCII hex digit"""
+
+
+class MazeGrid:
+    """
+    Compact storage for the walls of a maze. Every cell is a single byte in a flat
+    bytearray holding its 4-bit wall mask (north, east, south, west from the most to
+    the least significant bit), which is the same nibble sent to the frontend and
+    the simulator. Cell (row, col) lives at index ``row * cols + col``.
+    """
+
+    __slots__ = ("rows", "cols", "walls")
+
+    def __init__(self, rows: int, cols: int):
+        """
+        Create a grid where every cell has all four of its walls up
+
+        :param rows: Number of rows in the grid
+        :param cols: Number of columns in the grid
+        """
+        self.rows = rows
+        self.cols = cols
+        self.walls = bytearray([ALL_WALLS]) * (rows * cols)
+
+    def __len__(self):
+        return len(self.walls)
+
+    def index(self, row: int, col: int) -> int:
+        """Get the flat index of the cell at (row, col)"""
+        return row * self.cols + col
+
+    def neighbors(self, index: int) -> List[Tuple[int, int]]:
+        """
+        Get the neighbors of a cell in north, south, east, west order.
+
+        :param index: The flat index of the cell
+        :return: A list of (neighbor index, wall bit towards that neighbor) pairs
+        """
+        cols = self.cols
+        row, col = divmod(index, cols)
+        result = []
+        if row > 0:
+            result.append((index - cols, NORTH))
+        if row < self.rows - 1:
+            result.append((index + cols, SOUTH))
+        if col < cols - 1:
+            result.append((index + 1, EAST))
+        if col > 0:
+            result.append((index - 1, WEST))
+        return result
+
+    def carve(self, index: int, neighbor: int, wall: int):
+        """
+        Break down the wall between a cell and its neighbor.
+
+        :param index: The flat index of the cell
+        :param neighbor: The flat index of the neighboring cell
+        :param wall: The wall bit of `index` that faces `neighbor`
+        """
+        self.walls[index] &= ~wall
+        self.walls[neighbor] &= ~OPPOSITE[wall]
+
+    def as_array(self) -> np.ndarray:
+        """Get a rows x cols view of the wall masks without copying them"""
+        return np.frombuffer(self.walls, dtype=np.uint8).reshape(self.rows, self.cols)
+
+    def row_hex(self, row: int) -> str:
+        """Get a row of the grid as a string of hex digits"""
+        start = row * self.cols
+        end = start + self.cols
+        return self.walls[start:end].translate(HEX_TABLE).decode()
@@ -0,0 +1,124 @@
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Tuple
+
+from django.core.management.base import BaseCommand, CommandError
+
+from maze.algorithms import ALGORITHMS, DEFAULT_ALGORITHM
+from maze.encoding import pack_masks, unpack_level_configuration
+from maze.generator import Maze
+from maze.models import MazeConfiguration
+
+
+def _generate(job: Tuple[int, int, str]) -> Tuple[int, int, bytes]:
+    """Generate one maze in a worker process, returning it as packed level data"""
+    seed, size, algorithm = job
+    return seed, size, pack_masks(Maze(size, size, algorithm, seed).grid.as_array())
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a library of random mazes across a pool of processes and save "
+        "them in batches. Every maze stores its seed, so re-running with the same "
+        "--seed skips mazes that already exist."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("count", type=int, help="Number of mazes to generate")
+        parser.add_argument("--min-size", type=int, default=5)
+        parser.add_argument("--max-size", type=int, default=15)
+        parser.add_argument(
+            "--algorithm", choices=sorted(ALGORITHMS), default=DEFAULT_ALGORITHM
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Number of generator processes (defaults to the CPU count)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of mazes saved per INSERT",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            help="Seed for the whole library, which makes it reproducible",
+        )
+
+    def handle(self, *args, **options):
+        count, algorithm = options["count"], options["algorithm"]
+        min_size, max_size = options["min_size"], options["max_size"]
+        if count < 1:
+            raise CommandError("count must be at least 1")
+        if not 1 <= min_size <= max_size:
+            raise CommandError("sizes must satisfy 1 <= --min-size <= --max-size")
+
+        rng = random.Random(options["seed"])
+        jobs = [
+            (rng.getrandbits(63), rng.randint(min_size, max_size), algorithm)
+            for _ in range(count)
+        ]
+        workers = max(1, options["workers"] or 1)
+        chunksize = max(1, count // (workers * 4))
+
+        start = time.perf_counter()
+        batch = []
+        saved = 0
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for seed, size, level_data in executor.map(
+                _generate, jobs, chunksize=chunksize
+            ):
+                batch.append(
+                    MazeConfiguration(
+                        start_row=0,
+                        start_col=0,
+                        end_row=size - 1,
+                        end_col=size - 1,
+                        level_configuration=unpack_level_configuration(level_data),
+                        level_data=level_data,
+                        seed=seed,
+                        algorithm=algorithm,
+                    )
+                )
+                if len(batch) >= options["batch_size"]:
+                    saved += self._save(batch)
+                    batch = []
+            saved += self._save(batch)
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Generated {count} mazes ({saved} new) in {elapsed:.2f}s "
+                f"with {workers} workers: {count / elapsed:.0f} mazes/second"
+            )
+        )
+
+    @staticmethod
+    def _save(batch) -> int:
+        """
+        Insert a batch of mazes, skipping any that are already stored.
+
+        :return: The number of mazes inserted, counting any that another process
+        inserts at the same time as new
+        """
+        if not batch:
+            return 0
+        stored = set(
+            MazeConfiguration.objects.filter(
+                seed__in=[maze.seed for maze in batch],
+                algorithm=batch[0].algorithm,
+            ).values_list("seed", "end_row", "end_col")
+        )
+        new = [
+            maze
+            for maze in batch
+            if (maze.seed, maze.end_row, maze.end_col) not in stored
+        ]
+        # Mazes stored since the lookup are skipped by the unique constraint
+        MazeConfiguration.objects.bulk_create(new, ignore_conflicts=True)
+        return len(new)
@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from maze.algorithms import ALGORITHMS
+from maze.benchmark import benchmark, encoding_benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the maze generation algorithms on speed and on the character of "
+        "the mazes they produce, and time the level configuration encoder against "
+        "per-cell formatting. Pick benchmarks by name, or run all of them."
+    )
+
+    benchmarks = ("algorithms", "encoding")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "names", nargs="*", metavar="name", help=", ".join(self.benchmarks)
+        )
+        parser.add_argument(
+            "--algorithm",
+            action="append",
+            choices=sorted(ALGORITHMS),
+            help="Algorithm to time, can be given more than once (defaults to all)",
+        )
+        parser.add_argument(
+            "--size",
+            action="append",
+            type=int,
+            help="Side length of the mazes, can be given more than once",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=3, help="Runs of each size, the best counts"
+        )
+
+    def handle(self, *args, **options):
+        unknown = set(options["names"]) - set(self.benchmarks)
+        if unknown:
+            raise CommandError(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+        for name in options["names"] or self.benchmarks:
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            getattr(self, f"_{name}")(options)
+
+    def _algorithms(self, options):
+        self.stdout.write(
+            f"{'algorithm':<12} {'size':>5} {'ms':>9} "
+            f"{'dead ends':>9} {'straight':>9} {'junctions':>9}"
+        )
+        for result in benchmark(
+            options["algorithm"], options["size"] or (15, 50, 100), options["repeat"]
+        ):
+            self.stdout.write(
+                f"{result['algorithm']:<12} {result['size']:>5} "
+                f"{result['seconds'] * 1000:>9.2f} {result['dead_ends']:>9.1%} "
+                f"{result['straight']:>9.1%} {result['junctions']:>9.1%}"
+            )
+
+    def _encoding(self, options):
+        self.stdout.write(
+            f"{'size':>5} {'per-cell ms':>12} {'batched ms':>11} {'speedup':>8}"
+        )
+        for result in encoding_benchmark(
+            options["size"] or (15, 50, 100, 250, 500), options["repeat"]
+        ):
+            self.stdout.write(
+                f"{result['size']:>5} {result['per_cell'] * 1000:>12.2f} "
+                f"{result['batched'] * 1000:>11.2f} "
+                f"{result['per_cell'] / result['batched']:>7.1f}x"
+            )
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.5 on 2026-10-18 07:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("maze", "0009_snippet_last_used"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mazeconfiguration",
+            name="algorithm",
+            field=models.CharField(blank=True, default="", max_length=16),
+        ),
+        migrations.AddField(
+            model_name="mazeconfiguration",
+            name="seed",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name="mazeconfiguration",
+            constraint=models.UniqueConstraint(
+                fields=("seed", "algorithm", "end_row", "end_col"),
+                name="maze_mazeconfiguration_unique_seed",
+            ),
+        ),
+    ]
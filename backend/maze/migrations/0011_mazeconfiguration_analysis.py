@@ -0,0 +1,17 @@
+# Generated by Django 4.2.5 on 2026-10-18 07:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("maze", "0010_mazeconfiguration_seed"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mazeconfiguration",
+            name="analysis",
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
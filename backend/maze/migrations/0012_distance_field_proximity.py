@@ -0,0 +1,22 @@
+# Generated by Django 4.2.5 on 2026-10-18 08:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("maze", "0011_mazeconfiguration_analysis"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mazeconfiguration",
+            name="distance_field",
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="runresult",
+            name="proximity",
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
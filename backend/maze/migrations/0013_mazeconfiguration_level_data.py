@@ -0,0 +1,61 @@
+# Generated by Django 4.2.5 on 2026-10-18 08:06
+
+import string
+import struct
+
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+
+def pack_level_configuration(level_configuration) -> bytes:
+    """
+    The packing of maze.encoding.pack_level_configuration when this migration was
+    written, copied so later changes to it do not change this migration: the rows
+    and columns as little-endian unsigned shorts, then two cells per byte with the
+    first in the high nibble.
+    """
+    rows = ["".join(row) for row in level_configuration]
+    cols = len(rows[0]) if rows else 0
+    if any(len(row) != cols for row in rows):
+        raise ValueError("Every row of the maze must have the same number of cells")
+    cells = "".join(rows)
+    if not set(cells) <= set(string.hexdigits):
+        raise ValueError("Maze cells must be hex digits")
+    try:
+        header = struct.pack("<HH", len(rows), cols)
+    except struct.error:
+        raise ValueError("Packed level data can have at most 65535 rows and columns")
+    return header + bytes.fromhex(cells + "0" * (len(cells) % 2))
+
+
+def pack_level_data(apps, schema_editor):
+    """Pack the level configuration of every existing maze into its level data"""
+    MazeConfiguration = apps.get_model("maze", "MazeConfiguration")
+    batch = []
+    mazes = MazeConfiguration.objects.only("pk", "level_configuration")
+    for maze in mazes.iterator(chunk_size=BATCH_SIZE):
+        try:
+            maze.level_data = pack_level_configuration(maze.level_configuration)
+        except (TypeError, ValueError, IndexError, AttributeError):
+            continue
+        batch.append(maze)
+        if len(batch) >= BATCH_SIZE:
+            MazeConfiguration.objects.bulk_update(batch, ["level_data"])
+            batch = []
+    MazeConfiguration.objects.bulk_update(batch, ["level_data"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("maze", "0012_distance_field_proximity"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mazeconfiguration",
+            name="level_data",
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.RunPython(pack_level_data, migrations.RunPython.noop),
+    ]
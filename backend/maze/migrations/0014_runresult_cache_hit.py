@@ -0,0 +1,17 @@
+# Generated by Django 4.2.5 on 2026-10-18 08:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("maze", "0013_mazeconfiguration_level_data"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="runresult",
+            name="cache_hit",
+            field=models.BooleanField(default=False),
+        ),
+    ]
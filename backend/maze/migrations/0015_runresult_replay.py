@@ -0,0 +1,27 @@
+# Generated by Django 4.2.5 on 2026-10-18 08:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("maze", "0014_runresult_cache_hit"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="runresult",
+            name="replay_length",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="runresult",
+            name="replay_offset",
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="runresult",
+            name="replay_segment",
+            field=models.CharField(blank=True, max_length=32, null=True),
+        ),
+    ]
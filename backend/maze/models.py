@@ -1,6 +1,17 @@
+from typing import Tuple
+
+import numpy as np
 from django.db import models
+from django.db.models.signals import pre_save
+from django.dispatch import receiver
 
 from accounts.models import Profile
+from maze.encoding import (
+    decode_level_configuration,
+    pack_level_configuration,
+    packed_dimensions,
+    unpack_masks,
+)
 
 
 class RunResult(models.Model):
@@ -16,10 +27,21 @@ class RunResult(models.Model):
     """Did the robot successfully finish the maze"""
     run_error = models.CharField(max_length=512)
     """Did the robot have an error."""
+    proximity = models.FloatField(null=True, blank=True)
+    """How close the robot got to the goal, from 0 at the start to 1 at the goal"""
+    cache_hit = models.BooleanField(default=False)
+    """Was the outcome replayed from an earlier identical submission instead of
+    being simulated"""
     result_data = models.JSONField(
         help_text="JSON data from the simulation with the resulting moves"
     )
     """JSON data from the simulation with the resulting moves"""
+    replay_segment = models.CharField(max_length=32, null=True, blank=True)
+    """The file of the replay store that holds the run's telemetry"""
+    replay_offset = models.PositiveBigIntegerField(null=True, blank=True)
+    """Where the run's compressed telemetry starts in its replay segment"""
+    replay_length = models.PositiveIntegerField(null=True, blank=True)
+    """The length of the run's compressed telemetry in its replay segment"""
 
     profile = models.ForeignKey("accounts.Profile", models.CASCADE)
     """The associated user profile for this run"""
@@ -74,10 +96,78 @@ class MazeConfiguration(models.Model):
         help_text="A JSON object representing the rows and columns of the maze"
     )
     """A JSON object representing the rows and columns of the maze"""
+    level_data = models.BinaryField(null=True, blank=True, editable=False)
+    """The level configuration packed two cells per byte, see
+    :func:`maze.encoding.pack_masks`. It is kept in sync whenever the maze is saved
+    and is None if the level configuration is invalid."""
+    seed = models.BigIntegerField(null=True, blank=True)
+    """Seed the maze was generated from, if it was generated reproducibly"""
+    algorithm = models.CharField(max_length=16, blank=True, default="")
+    """Name of the algorithm the maze was generated with, if it was generated"""
+    analysis = models.JSONField(null=True, blank=True, editable=False)
+    """Cached difficulty measurements of the maze, see :mod:`maze.analysis`"""
+    distance_field = models.BinaryField(null=True, blank=True, editable=False)
+    """Cached number of moves from each cell to the goal, see
+    :func:`maze.analysis.distance_field`"""
+
+    class Meta:
+        """Meta options for the maze configuration to require that there is only one
+        stored maze for each seed, algorithm and size"""
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=["seed", "algorithm", "end_row", "end_col"],
+                name="%(app_label)s_%(class)s_unique_seed",
+            )
+        ]
 
     def __str__(self):
         return self.name or f"Maze {self.pk}"
 
+    def wall_masks(self) -> np.ndarray:
+        """
+        Get the wall mask of every cell, from the packed level data when it is
+        stored, so the level configuration can be deferred when loading the maze.
+
+        :return: A rows x cols uint8 array of wall masks
+        :raises ValueError: If the level configuration is invalid
+        """
+        if self.level_data is not None:
+            return unpack_masks(self.level_data)
+        return decode_level_configuration(self.level_configuration)
+
+    def dimensions(self) -> Tuple[int, int]:
+        """
+        Get the number of rows and columns of the maze, from the header of the
+        packed level data when it is stored, without decoding any cells.
+
+        :return: The number of rows and columns
+        :raises ValueError: If the level configuration is invalid
+        """
+        if self.level_data is not None:
+            return packed_dimensions(self.level_data)
+        return self.wall_masks().shape
+
+
+@receiver(pre_save, sender=MazeConfiguration)
+def reset_maze_analysis(sender, instance, update_fields=None, **kwargs):
+    """Clears the cached analysis and distance field any time an existing maze is
+    edited, so that they are recomputed from the new layout"""
+    if instance.pk is not None and update_fields is None:
+        instance.analysis = None
+        instance.distance_field = None
+
+
+@receiver(pre_save, sender=MazeConfiguration)
+def pack_level_data(sender, instance, update_fields=None, **kwargs):
+    """Packs the level configuration into the level data any time the maze is
+    saved in full"""
+    if update_fields is None:
+        try:
+            instance.level_data = pack_level_configuration(instance.level_configuration)
+        except (TypeError, ValueError, IndexError, AttributeError):
+            instance.level_data = None
+
 
 class Snippet(models.Model):
     """
@@ -0,0 +1,117 @@
+import random
+import threading
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+
+from maze.algorithms import DEFAULT_ALGORITHM
+from maze.generator import Maze
+from zigzag_backend import metrics
+
+pool_hits = metrics.counter(
+    "maze_pool_hits", "Random mazes served from the pre-generated pool"
+)
+pool_fallbacks = metrics.counter(
+    "maze_pool_fallbacks", "Random mazes generated during the request"
+)
+
+
+class MazePool:
+    """
+    A pool of pre-generated level configurations for each maze size. Requests pop
+    from the pool in O(1) while a background worker refills any size that drops
+    below the low watermark back up to the high watermark.
+    """
+
+    def __init__(
+        self,
+        sizes: Iterable[int],
+        low_watermark: int,
+        high_watermark: int,
+        algorithm: str = DEFAULT_ALGORITHM,
+    ):
+        """
+        :param sizes: The maze sizes (rows and columns) to keep in the pool
+        :param low_watermark: Refill a size once it has fewer mazes than this
+        :param high_watermark: How many mazes of each size a refill stops at
+        :param algorithm: The generation algorithm of the pooled mazes
+        """
+        self.low_watermark = low_watermark
+        self.high_watermark = high_watermark
+        self.algorithm = algorithm
+        self._mazes: Dict[int, deque] = {size: deque() for size in sizes}
+        self._rng = random.Random()
+        self._refill = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+
+    def pop(self, size: int) -> Optional[List[List[str]]]:
+        """
+        Take a pre-generated maze of the given size out of the pool.
+
+        :param size: Number of rows and columns of the maze
+        :return: The maze's level configuration, or None if the pool has no maze of
+        that size and the caller has to generate one itself
+        """
+        mazes = self._mazes.get(size)
+        if mazes is None:
+            pool_fallbacks.inc()
+            return None
+        try:
+            level_configuration = mazes.popleft()
+        except IndexError:
+            level_configuration = None
+        if len(mazes) < self.low_watermark:
+            self._refill.set()
+
+        (pool_fallbacks if level_configuration is None else pool_hits).inc()
+        return level_configuration
+
+    def __len__(self):
+        return sum(len(mazes) for mazes in self._mazes.values())
+
+    def fill(self):
+        """Generate mazes until every size is at the high watermark"""
+        for size, mazes in self._mazes.items():
+            while len(mazes) < self.high_watermark:
+                seed = self._rng.getrandbits(63)
+                mazes.append(Maze(size, size, self.algorithm, seed).hex_grid)
+
+    def start(self):
+        """Start the background worker that refills the pool"""
+        if self._worker is None:
+            self._worker = threading.Thread(
+                target=self._run, name="maze-pool", daemon=True
+            )
+            self._refill.set()
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            self._refill.wait()
+            self._refill.clear()
+            self.fill()
+
+
+_pool: Optional[MazePool] = None
+_pool_lock = threading.Lock()
+
+
+def get_maze_pool() -> Optional[MazePool]:
+    """
+    Get the process-wide maze pool configured by the MAZE_POOL setting, starting its
+    worker on first use.
+
+    :return: The pool, or None if it is disabled
+    """
+    global _pool
+    config = settings.MAZE_POOL
+    if not config["ENABLED"]:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = MazePool(
+                config["SIZES"], config["LOW_WATERMARK"], config["HIGH_WATERMARK"]
+            )
+            _pool.start()
+    return _pool
@@ -0,0 +1,71 @@
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from maze.analysis import get_analysis
+from maze.generator import Maze
+from maze.models import MazeConfiguration
+from zigzag_backend.cache import LRUCache
+
+_stored_mazes = LRUCache(settings.MAZE_SEED_CACHE_SIZE)
+"""Maps (seed, algorithm, rows, cols) to the time it expires and the stored maze"""
+_maze_keys = LRUCache(settings.MAZE_SEED_CACHE_SIZE)
+"""Maps the pk of each cached maze to its key in _stored_mazes"""
+
+
+def get_seeded_maze(seed: int, algorithm: str, size: int) -> MazeConfiguration:
+    """
+    Get the maze configuration generated from a seed, algorithm and size. Each
+    combination is generated and inserted only once; later calls return the stored
+    row, from a per-process LRU cache of rows when possible.
+
+    Saving or deleting a maze drops it from the cache of the process that made the
+    change, other processes can keep returning their copy for up to
+    MAZE_SEED_CACHE_TIMEOUT seconds.
+
+    :param seed: The seed to generate the maze from
+    :param algorithm: Name of the generation algorithm
+    :param size: Number of rows and columns in the maze
+    :return: The saved maze configuration, which must not be modified
+    """
+    key = (seed, algorithm, size, size)
+    cached = _stored_mazes.get(key)
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+
+    lookup = {
+        "seed": seed,
+        "algorithm": algorithm,
+        "end_row": size - 1,
+        "end_col": size - 1,
+    }
+    maze = MazeConfiguration.objects.filter(**lookup).first()
+    if maze is None:
+        maze = MazeConfiguration(start_row=0, start_col=0, **lookup)
+        maze.level_configuration = Maze(size, size, algorithm, seed).hex_grid
+        get_analysis(maze)
+        try:
+            with transaction.atomic():
+                maze.save()
+        except IntegrityError:
+            # Another request stored the same maze first
+            maze = MazeConfiguration.objects.get(**lookup)
+
+    expires = time.monotonic() + settings.MAZE_SEED_CACHE_TIMEOUT
+    _stored_mazes.set(key, (expires, maze))
+    _maze_keys.set(maze.pk, key)
+    return maze
+
+
+@receiver(post_save, sender=MazeConfiguration)
+@receiver(post_delete, sender=MazeConfiguration)
+def forget_seeded_maze(sender, instance: MazeConfiguration, **kwargs):
+    """Drop a changed maze, under the key it was cached with in case its seed,
+    algorithm or size changed"""
+    key = _maze_keys.get(instance.pk)
+    if key is not None:
+        _stored_mazes.delete(key)
+        _maze_keys.delete(instance.pk)
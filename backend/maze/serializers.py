@@ -1,18 +1,61 @@
 from rest_framework import serializers
 
 from maze import models
+from maze.analysis import get_analysis
+from maze.encoding import unpack_level_configuration
 
 
 class RunResultSerializer(serializers.ModelSerializer):
     class Meta:
         model = models.RunResult
-        fields = ["id", "tournament", "duration", "did_win", "timestamp", "profile"]
+        fields = [
+            "id",
+            "tournament",
+            "duration",
+            "did_win",
+            "proximity",
+            "cache_hit",
+            "timestamp",
+            "profile",
+        ]
 
 
 class MazeConfigurationSerializer(serializers.ModelSerializer):
+    analysis = serializers.SerializerMethodField()
+
     class Meta:
         model = models.MazeConfiguration
-        fields = "__all__"
+        exclude = ["distance_field", "level_data"]
+        # Only mazes generated by get_seeded_maze can claim a seed
+        read_only_fields = ["seed", "algorithm"]
+
+    def get_analysis(self, maze_configuration):
+        """Difficulty measurements of the maze, computed once and then cached"""
+        return get_analysis(maze_configuration)
+
+
+class SimulatorMazeSerializer(serializers.ModelSerializer):
+    """The parts of a maze configuration the simulator reads"""
+
+    level_configuration = serializers.SerializerMethodField()
+
+    class Meta:
+        model = models.MazeConfiguration
+        fields = [
+            "name",
+            "start_row",
+            "start_col",
+            "end_row",
+            "end_col",
+            "level_configuration",
+        ]
+
+    def get_level_configuration(self, maze_configuration):
+        """The level configuration, unpacked from the level data when it is stored so
+        that the JSON does not have to be loaded"""
+        if maze_configuration.level_data is None:
+            return maze_configuration.level_configuration
+        return unpack_level_configuration(maze_configuration.level_data)
 
 
 class RobotConfigurationSerializer(serializers.ModelSerializer):
@@ -1,6 +1,14 @@
+import importlib
+import json
 import random
+import warnings
+from io import StringIO
+from unittest import mock
 
-from hypothesis import given
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from hypothesis import given, settings
 from hypothesis.extra.django import TestCase
 from hypothesis.extra.django import from_model
 from hypothesis.strategies import dictionaries
@@ -12,8 +20,31 @@ from rest_framework.test import APITestCase
 
 from accounts.models import Profile
 from accounts.tests import user_profiles
-from maze.generator import Cell, Maze
+from maze import seeded
+from maze.algorithms import ALGORITHMS
+from maze.analysis import (
+    analyse,
+    distance_at,
+    distance_field,
+    get_analysis,
+    get_distance_field,
+    proximity,
+)
+from maze.benchmark import benchmark, encoding_benchmark, per_cell_hex
+from maze.encoding import (
+    decode_level_configuration,
+    encode_level_configuration,
+    pack_level_configuration,
+    pack_masks,
+    unpack_level_configuration,
+    unpack_masks,
+)
+from maze.generator import Cell, Maze, stream_hex_rows
+from maze.grid import ALL_WALLS, EAST, NORTH, OPPOSITE, SOUTH, WEST, MazeGrid
 from maze.models import RunResult, MazeConfiguration, RobotConfiguration
+from maze.pool import MazePool, pool_fallbacks, pool_hits
+from maze.seeded import get_seeded_maze
+from maze.serializers import SimulatorMazeSerializer
 
 
 class MazeTest(TestCase):
@@ -134,6 +165,417 @@ class MazeGenTest(TestCase):
         maze = Maze(5, 5)
         self.assertEqual(str(maze), "9aacd\n5bc36\n594bc\n36594\nba267")
 
+    def test_grid_starts_all_walls(self):
+        """Test that every cell of a new grid has all its walls up"""
+        grid = MazeGrid(3, 4)
+        self.assertEqual(len(grid), 12)
+        self.assertTrue(all(mask == ALL_WALLS for mask in grid.walls))
+        self.assertEqual(grid.row_hex(0), "ffff")
+
+    def test_grid_neighbors(self):
+        """Test that grid neighbors are listed north, south, east, west"""
+        grid = MazeGrid(3, 3)
+        self.assertEqual(
+            grid.neighbors(grid.index(1, 1)),
+            [(1, NORTH), (7, SOUTH), (5, EAST), (3, WEST)],
+        )
+        self.assertEqual(grid.neighbors(0), [(3, SOUTH), (1, EAST)])
+
+    def test_grid_carve(self):
+        """Test that carving removes the wall on both sides"""
+        grid = MazeGrid(2, 2)
+        grid.carve(0, 1, EAST)
+        grid.carve(1, 3, SOUTH)
+        self.assertEqual(grid.row_hex(0), "bc")
+        self.assertEqual(grid.row_hex(1), "f7")
+        self.assertEqual(grid.walls[3] & NORTH, 0)
+        self.assertEqual(grid.walls[1] & WEST, 0)
+
+    def test_maze_hex_grid_matches_str(self):
+        """Test that the hex grid and string forms of a maze agree"""
+        random.seed(2)
+        maze = Maze(6, 9)
+        self.assertEqual(str(maze), "\n".join("".join(row) for row in maze.hex_grid))
+
+    def assertPerfectMaze(self, grid: MazeGrid):
+        """Assert that the grid is a spanning tree enclosed by its outer walls"""
+        passages = 0
+        for index in range(len(grid)):
+            for neighbor, wall in grid.neighbors(index):
+                is_open = not grid.walls[index] & wall
+                self.assertEqual(is_open, not grid.walls[neighbor] & OPPOSITE[wall])
+                passages += is_open
+        self.assertEqual(passages // 2, len(grid) - 1)
+
+        reached = {0}
+        stack = [0]
+        while stack:
+            index = stack.pop()
+            for neighbor, wall in grid.neighbors(index):
+                if not grid.walls[index] & wall and neighbor not in reached:
+                    reached.add(neighbor)
+                    stack.append(neighbor)
+        self.assertEqual(len(reached), len(grid))
+
+        masks = grid.as_array()
+        self.assertTrue((masks[0] & NORTH).all() and (masks[-1] & SOUTH).all())
+        self.assertTrue((masks[:, 0] & WEST).all() and (masks[:, -1] & EAST).all())
+
+    def test_algorithms_make_perfect_mazes(self):
+        """Test that every registered algorithm carves a perfect maze"""
+        random.seed(4)
+        for algorithm in ALGORITHMS:
+            for rows, cols in [(1, 1), (1, 6), (6, 1), (5, 5), (9, 14)]:
+                with self.subTest(algorithm=algorithm, rows=rows, cols=cols):
+                    self.assertPerfectMaze(Maze(rows, cols, algorithm).grid)
+
+    def test_stream_hex_rows(self):
+        """Test that streamed rows match the same maze generated in memory"""
+        random.seed(6)
+        expected = str(Maze(8, 11, "eller")).split("\n")
+        random.seed(6)
+        self.assertEqual(list(stream_hex_rows(8, 11)), expected)
+
+    def test_seeded_maze_is_reproducible(self):
+        """Test that a seed gives the same maze regardless of the global state"""
+        random.seed(7)
+        first = str(Maze(9, 12, "prim", seed=99))
+        random.seed(8)
+        self.assertEqual(str(Maze(9, 12, "prim", seed=99)), first)
+        self.assertNotEqual(str(Maze(9, 12, "prim", seed=100)), first)
+
+    def test_unknown_algorithm(self):
+        """Test that an unregistered algorithm is rejected"""
+        self.assertRaises(KeyError, Maze, 5, 5, "unknown")
+
+    def test_benchmark(self):
+        """Test that the benchmark harness reports every algorithm and size"""
+        results = benchmark(sizes=(5, 8), repeat=1)
+        self.assertEqual(len(results), len(ALGORITHMS) * 2)
+        for result in results:
+            self.assertGreater(result["seconds"], 0)
+            self.assertTrue(0 <= result["dead_ends"] <= 1)
+
+
+class EncodingTest(TestCase):
+    """Testing for the batched level configuration encoder and decoder"""
+
+    def test_encode_level_configuration(self):
+        """Test that wall masks are encoded as one hex digit per cell"""
+        self.assertEqual(
+            encode_level_configuration([[0, 9, 10], [15, 12, 3]]),
+            [["0", "9", "a"], ["f", "c", "3"]],
+        )
+
+    def test_decode_level_configuration(self):
+        """Test that hex digits are decoded back into wall masks"""
+        masks = decode_level_configuration([["0", "9", "a"], ["F", "c", "3"]])
+        self.assertEqual(masks.tolist(), [[0, 9, 10], [15, 12, 3]])
+
+    def test_decode_rejects_invalid(self):
+        """Test that malformed level configurations are rejected"""
+        self.assertRaises(ValueError, decode_level_configuration, [["a"], ["b", "c"]])
+        self.assertRaises(ValueError, decode_level_configuration, [["g", "1"]])
+        self.assertRaises(ValueError, decode_level_configuration, [["é", "1"]])
+
+    def test_round_trip(self):
+        """Test that decoding an encoded maze gives back the same wall masks"""
+        random.seed(3)
+        maze = Maze(12, 17)
+        masks = decode_level_configuration(maze.hex_grid)
+        self.assertTrue(np.array_equal(masks, maze.grid.as_array()))
+        self.assertEqual(encode_level_configuration(masks), maze.hex_grid)
+
+    def test_pack_masks(self):
+        """Test that wall masks are packed two per byte after the dimensions"""
+        packed = pack_masks([[0, 9, 10], [15, 12, 3]])
+        self.assertEqual(packed, b"\x02\x00\x03\x00\x09\xaf\xc3")
+        self.assertEqual(unpack_masks(packed).tolist(), [[0, 9, 10], [15, 12, 3]])
+
+    def test_pack_odd_cell_count(self):
+        """Test that a maze with an odd number of cells survives a round trip"""
+        random.seed(4)
+        maze = Maze(7, 9)
+        packed = pack_level_configuration(maze.hex_grid)
+        self.assertEqual(len(packed), 4 + 32)
+        self.assertEqual(unpack_level_configuration(memoryview(packed)), maze.hex_grid)
+
+    def test_unpack_rejects_truncated(self):
+        """Test that packed data shorter than its dimensions is rejected"""
+        self.assertRaises(ValueError, unpack_masks, b"\x02")
+        self.assertRaises(ValueError, unpack_masks, b"\x02\x00\x03\x00\x09")
+
+    def test_migration_packing(self):
+        """Test that the backfill migration packs like the encoder did"""
+        migration = importlib.import_module(
+            "maze.migrations.0013_mazeconfiguration_level_data"
+        )
+        for level_configuration, packed in (
+            ([["b", "8", "c"], ["f", "5", "5"]], b"\x02\x00\x03\x00\xb8\xcf\x55"),
+            ([["A", "1"]], b"\x01\x00\x02\x00\xa1"),
+            ([], b"\x00\x00\x00\x00"),
+        ):
+            self.assertEqual(
+                migration.pack_level_configuration(level_configuration), packed
+            )
+            self.assertEqual(pack_level_configuration(level_configuration), packed)
+        for invalid in ([["a"], ["b", "c"]], [["g", "1"]], [["é", "1"]], [[" ", "1"]]):
+            self.assertRaises(ValueError, migration.pack_level_configuration, invalid)
+
+    def test_encode_matches_per_cell(self):
+        """Test that the batched encoder formats cells like the per-cell code"""
+        masks = np.random.default_rng(0).integers(0, 16, size=(15, 15), dtype=np.uint8)
+        self.assertEqual(
+            encode_level_configuration(masks),
+            [[per_cell_hex(mask) for mask in row] for row in masks.tolist()],
+        )
+
+    def test_encoding_benchmark(self):
+        """Test that the encoding benchmark reports every size"""
+        results = encoding_benchmark(sizes=(5, 8), repeat=1)
+        self.assertEqual([result["size"] for result in results], [5, 8])
+        for result in results:
+            self.assertGreater(result["per_cell"], 0)
+            self.assertGreater(result["batched"], 0)
+
+    def test_benchmark_command(self):
+        """Test that the benchmark command reports each benchmark"""
+        out = StringIO()
+        call_command(
+            "maze_benchmark",
+            "algorithms",
+            "encoding",
+            algorithm=["prim"],
+            size=[5],
+            repeat=1,
+            stdout=out,
+        )
+        self.assertIn("prim", out.getvalue())
+        self.assertIn("speedup", out.getvalue())
+        self.assertRaises(CommandError, call_command, "maze_benchmark", "unknown")
+
+
+class AnalysisTest(TestCase):
+    """Testing for the maze difficulty analysis"""
+
+    def test_analyse(self):
+        """Test the measurements of a small hand-made maze"""
+        # A corridor along the top row that turns down the right side, with a
+        # branch down the middle column that ends to the bottom left
+        level_configuration = [
+            ["b", "8", "c"],
+            ["f", "5", "5"],
+            ["b", "6", "7"],
+        ]
+        self.assertEqual(
+            analyse(level_configuration, 0, 0, 2, 2),
+            {
+                "shortest_path": 4,
+                "dead_ends": 3,
+                "branching_factor": 1.167,
+                "longest_corridor": 3,
+            },
+        )
+
+    def test_analyse_unreachable_goal(self):
+        """Test that an unreachable goal has no shortest path"""
+        analysis = analyse([["d", "f"], ["7", "f"]], 0, 0, 1, 1)
+        self.assertIsNone(analysis["shortest_path"])
+
+    def test_analyse_ignores_open_outer_walls(self):
+        """Test that openings in the outer wall do not lead out of the maze"""
+        analysis = analyse([["0", "0"], ["0", "0"]], 0, 0, 1, 1)
+        self.assertEqual(analysis["shortest_path"], 2)
+        self.assertEqual(analysis["longest_corridor"], 2)
+
+    def test_analyse_rejects_invalid(self):
+        """Test that invalid mazes and positions are rejected"""
+        self.assertRaises(ValueError, analyse, [["x"]], 0, 0, 0, 0)
+        self.assertRaises(ValueError, analyse, [["f"]], 0, 0, 1, 0)
+        self.assertRaises(ValueError, analyse, [["f"]], 0, -1, 0, 0)
+
+    def test_get_analysis_is_cached(self):
+        """Test that the analysis is stored and cleared when the maze is edited"""
+        maze = MazeConfiguration.objects.create(
+            start_row=0,
+            start_col=0,
+            end_row=0,
+            end_col=1,
+            level_configuration=[["b", "e"]],
+        )
+        self.assertEqual(get_analysis(maze)["shortest_path"], 1)
+        maze = MazeConfiguration.objects.get(pk=maze.pk)
+        self.assertEqual(maze.analysis["shortest_path"], 1)
+
+        maze.level_configuration = [["f", "f"]]
+        maze.save()
+        self.assertIsNone(maze.analysis)
+        self.assertIsNone(get_analysis(maze)["shortest_path"])
+
+    def test_level_data_is_packed_on_save(self):
+        """Test that saving a maze packs its level configuration, or clears the level
+        data if the configuration is invalid"""
+        maze = MazeConfiguration.objects.create(
+            start_row=0,
+            start_col=0,
+            end_row=0,
+            end_col=1,
+            level_configuration=[["b", "e"]],
+        )
+        self.assertEqual(maze.level_data, pack_level_configuration([["b", "e"]]))
+        maze = MazeConfiguration.objects.defer("level_configuration").get(pk=maze.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(maze.wall_masks().tolist(), [[11, 14]])
+            self.assertEqual(
+                SimulatorMazeSerializer(maze).data["level_configuration"],
+                [["b", "e"]],
+            )
+
+        maze.level_configuration = [["x"]]
+        maze.save()
+        self.assertIsNone(maze.level_data)
+        self.assertRaises(ValueError, maze.wall_masks)
+
+    def test_distance_field(self):
+        """Test the distance of every cell to the goal"""
+        level_configuration = [["b", "8", "c"], ["f", "5", "5"], ["b", "6", "7"]]
+        field = distance_field(level_configuration, [(2, 2)])
+        self.assertEqual(len(field), 9 * 2)
+        distances = [
+            [distance_at(field, 3, 3, row, col) for col in range(3)] for row in range(3)
+        ]
+        self.assertEqual(distances, [[4, 3, 2], [None, 4, 1], [6, 5, 0]])
+        self.assertIsNone(distance_at(field, 3, 3, 3, 0))
+
+    def test_distance_field_multiple_goals(self):
+        """Test that distances are to the nearest of several goals"""
+        field = distance_field([["b", "a", "a", "a", "e"]], [(0, 0), (0, 4)])
+        self.assertEqual(
+            [distance_at(field, 1, 5, 0, col) for col in range(5)], [0, 1, 2, 1, 0]
+        )
+
+    def test_distance_field_long(self):
+        """Test that distances that do not fit in 2 bytes are stored in 4"""
+        cols = 70000
+        field = distance_field([["b"] + ["a"] * (cols - 2) + ["e"]], [(0, 0)])
+        self.assertEqual(len(field), cols * 4)
+        self.assertEqual(distance_at(field, 1, cols, 0, cols - 1), cols - 1)
+
+    def test_proximity(self):
+        """Test scoring how close a position is to the goal"""
+        maze = MazeConfiguration.objects.create(
+            start_row=0,
+            start_col=0,
+            end_row=2,
+            end_col=2,
+            level_configuration=[["b", "8", "c"], ["f", "5", "5"], ["b", "6", "7"]],
+        )
+        self.assertEqual(proximity(maze, 2, 2), 1.0)
+        self.assertEqual(proximity(maze, 0, 0), 0.0)
+        self.assertEqual(proximity(maze, 0, 2), 0.5)
+        self.assertEqual(proximity(maze, 2, 0), 0.0)
+        self.assertIsNone(proximity(maze, 1, 0))
+        self.assertIsNone(proximity(maze, 5, 5))
+        stored = MazeConfiguration.objects.get(pk=maze.pk).distance_field
+        self.assertEqual(bytes(stored), bytes(get_distance_field(maze)))
+
+        # Scoring a maze with a stored distance field decodes none of its cells
+        loaded = MazeConfiguration.objects.defer("level_configuration").get(pk=maze.pk)
+        with mock.patch.object(
+            MazeConfiguration, "wall_masks", side_effect=AssertionError
+        ), self.assertNumQueries(0):
+            self.assertEqual(proximity(loaded, 0, 2), 0.5)
+
+    def test_get_analysis_invalid(self):
+        """Test that invalid mazes have no analysis"""
+        maze = MazeConfiguration(
+            start_row=0, start_col=0, end_row=0, end_col=0, level_configuration={}
+        )
+        self.assertIsNone(get_analysis(maze))
+
+
+class MazePoolTest(TestCase):
+    """Testing for the pool of pre-generated mazes"""
+
+    def test_fill_to_high_watermark(self):
+        """Test that filling the pool generates mazes up to the high watermark"""
+        pool = MazePool([5, 7], low_watermark=1, high_watermark=3)
+        pool.fill()
+        self.assertEqual(len(pool), 6)
+
+    def test_pop(self):
+        """Test that popping gives a maze of the requested size and counts a hit"""
+        pool = MazePool([6], low_watermark=1, high_watermark=2)
+        pool.fill()
+        hits = pool_hits.value
+        level_configuration = pool.pop(6)
+        self.assertEqual(len(level_configuration), 6)
+        self.assertTrue(all(len(row) == 6 for row in level_configuration))
+        self.assertEqual(pool_hits.value, hits + 1)
+        self.assertEqual(len(pool), 1)
+
+    def test_pop_fallback(self):
+        """Test that an empty or unpooled size counts a fallback"""
+        pool = MazePool([6], low_watermark=1, high_watermark=2)
+        fallbacks = pool_fallbacks.value
+        self.assertIsNone(pool.pop(6))
+        self.assertIsNone(pool.pop(9))
+        self.assertEqual(pool_fallbacks.value, fallbacks + 2)
+
+    def test_low_watermark_triggers_refill(self):
+        """Test that dropping below the low watermark wakes the refill worker"""
+        pool = MazePool([5], low_watermark=2, high_watermark=3)
+        pool.fill()
+        pool.pop(5)
+        self.assertFalse(pool._refill.is_set())
+        pool.pop(5)
+        self.assertTrue(pool._refill.is_set())
+
+
+class GenerateMazesTest(TestCase):
+    """Testing for the bulk maze generation command"""
+
+    def test_generate_mazes(self):
+        """Test that the command saves the requested number of mazes in batches"""
+        out = StringIO()
+        call_command(
+            "generate_mazes",
+            12,
+            min_size=4,
+            max_size=8,
+            workers=2,
+            batch_size=5,
+            seed=1,
+            stdout=out,
+        )
+        self.assertEqual(MazeConfiguration.objects.count(), 12)
+        self.assertIn("mazes/second", out.getvalue())
+        for maze in MazeConfiguration.objects.all():
+            size = len(maze.level_configuration)
+            self.assertTrue(4 <= size <= 8)
+            self.assertEqual((maze.end_row, maze.end_col), (size - 1, size - 1))
+            self.assertEqual(
+                maze.level_configuration,
+                Maze(size, size, "dfs", maze.seed).hex_grid,
+            )
+
+    def test_generate_mazes_is_reproducible(self):
+        """Test that re-running with the same seed skips the mazes already stored"""
+        out = StringIO()
+        call_command("generate_mazes", 5, workers=1, seed=2, stdout=out)
+        self.assertIn("(5 new)", out.getvalue())
+        out = StringIO()
+        # One lookup of the batch's seeds, and nothing left to insert
+        with self.assertNumQueries(1):
+            call_command("generate_mazes", 5, workers=1, seed=2, stdout=out)
+        self.assertIn("(0 new)", out.getvalue())
+        self.assertEqual(MazeConfiguration.objects.count(), 5)
+
+    def test_generate_mazes_invalid_sizes(self):
+        """Test that an impossible size range is rejected"""
+        with self.assertRaises(CommandError):
+            call_command("generate_mazes", 5, min_size=9, max_size=3)
+
 
 class APITests(APITestCase, TestCase):
     def test_random_maze_url(self):
@@ -174,5 +616,219 @@ class APITests(APITestCase, TestCase):
                     ["5", "7", "b", "a", "c", "5", "5"],
                     ["3", "a", "a", "a", "6", "3", "6"],
                 ],
+                "seed": None,
+                "algorithm": "dfs",
+                "analysis": {
+                    "shortest_path": 18,
+                    "dead_ends": 6,
+                    "branching_factor": 1.091,
+                    "longest_corridor": 7,
+                },
             },
         )
+
+    @given(profile=user_profiles())
+    def test_new_random_maze_algorithm(self, profile: Profile):
+        """
+        Test generating a new random maze with a chosen algorithm
+        """
+        token = Token.objects.create(user=profile.user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+
+        response = self.client.get(
+            reverse("maze_configurations-random_maze"),
+            {"algorithm": "kruskal"},
+            format="json",
+            follow=True,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        size = len(response.data["level_configuration"])
+        self.assertEqual(response.data["end_row"], size - 1)
+        self.assertTrue(
+            all(len(row) == size for row in response.data["level_configuration"])
+        )
+
+    @given(profile=user_profiles())
+    def test_new_random_maze_unknown_algorithm(self, profile: Profile):
+        """
+        Test that requesting an unknown algorithm is rejected
+        """
+        token = Token.objects.create(user=profile.user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+
+        response = self.client.get(
+            reverse("maze_configurations-random_maze"),
+            {"algorithm": "unknown"},
+            format="json",
+            follow=True,
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @settings(deadline=None, max_examples=10)
+    @given(profile=user_profiles())
+    def test_stream_maze(self, profile: Profile):
+        """
+        Test streaming a new random maze
+        """
+        token = Token.objects.create(user=profile.user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+
+        response = self.client.get(
+            reverse("maze_configurations-stream_maze"), {"rows": 4, "cols": 9}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        with warnings.catch_warnings():
+            # The test client consumes the async stream synchronously
+            warnings.simplefilter("ignore")
+            data = json.loads(b"".join(response))
+        self.assertEqual(data["end_row"], 3)
+        self.assertEqual(data["end_col"], 8)
+        grid = MazeGrid(4, 9)
+        grid.walls[:] = decode_level_configuration(
+            data["level_configuration"]
+        ).tobytes()
+        MazeGenTest().assertPerfectMaze(grid)
+
+    @settings(deadline=None, max_examples=10)
+    @given(profile=user_profiles())
+    def test_stream_maze_invalid_size(self, profile: Profile):
+        """
+        Test that streamed mazes must have a valid size
+        """
+        token = Token.objects.create(user=profile.user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+
+        url = reverse("maze_configurations-stream_maze")
+        for params in [{}, {"size": "big"}, {"size": 0}, {"rows": 5, "cols": 2001}]:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @given(profile=user_profiles())
+    def test_seeded_random_maze(self, profile: Profile):
+        """
+        Test that a seeded random maze is generated and stored only once
+        """
+        # Each example's rows are rolled back, but not the process cache
+        seeded._stored_mazes.clear()
+        seeded._maze_keys.clear()
+        token = Token.objects.create(user=profile.user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+
+        url = reverse("maze_configurations-random_maze")
+        params = {"seed": 42, "algorithm": "wilson", "size": 9}
+        first = self.client.get(url, params)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.data["seed"], 42)
+        self.assertEqual(first.data["algorithm"], "wilson")
+        self.assertEqual(
+            first.data["level_configuration"], Maze(9, 9, "wilson", 42).hex_grid
+        )
+
+        with mock.patch("maze.seeded.Maze") as maze_class, self.assertNumQueries(1):
+            # Only the token is looked up, the maze comes from the cache
+            second = self.client.get(url, params)
+            maze_class.assert_not_called()
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(MazeConfiguration.objects.filter(seed=42).count(), 1)
+
+        # Changing the maze drops it from the cache
+        maze = MazeConfiguration.objects.get(seed=42)
+        maze.name = "Renamed"
+        maze.save()
+        self.assertEqual(self.client.get(url, params).data["name"], "Renamed")
+        maze.delete()
+        third = self.client.get(url, params)
+        self.assertNotEqual(third.data["id"], first.data["id"])
+        self.assertEqual(
+            third.data["level_configuration"], first.data["level_configuration"]
+        )
+
+    @given(profile=user_profiles())
+    def test_seed_is_read_only(self, profile: Profile):
+        """
+        Test that mazes saved through the API cannot claim a seed, and that an
+        edit that would duplicate a seeded maze is rejected
+        """
+        token = Token.objects.create(user=profile.user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+        seeded._stored_mazes.clear()
+        seeded._maze_keys.clear()
+
+        forged = {
+            "start_row": 0,
+            "start_col": 0,
+            "end_row": 1,
+            "end_col": 1,
+            "level_configuration": [["f", "f"], ["f", "f"]],
+            "seed": 42,
+            "algorithm": "wilson",
+        }
+        response = self.client.post(
+            reverse("maze_configurations-list"), forged, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIsNone(response.data["seed"])
+        self.assertEqual(response.data["algorithm"], "")
+        self.assertEqual(
+            self.client.get(
+                reverse("maze_configurations-random_maze"),
+                {"seed": 42, "algorithm": "wilson", "size": 2},
+            ).data["level_configuration"],
+            Maze(2, 2, "wilson", 42).hex_grid,
+        )
+
+        larger = get_seeded_maze(42, "wilson", 3)
+        response = self.client.patch(
+            reverse("maze_configurations-detail", args=[larger.pk]),
+            {"end_row": 1, "end_col": 1},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("error", response.data)
+
+    @given(profile=user_profiles())
+    def test_random_maze_invalid_params(self, profile: Profile):
+        """
+        Test that random mazes reject invalid seeds and sizes
+        """
+        token = Token.objects.create(user=profile.user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+
+        url = reverse("maze_configurations-random_maze")
+        for params in [{"seed": "x"}, {"seed": -1}, {"size": 0}, {"size": 201}]:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @given(profile=user_profiles())
+    def test_new_random_maze_from_pool(self, profile: Profile):
+        """
+        Test that random mazes are served from the pool when it is enabled
+        """
+        token = Token.objects.create(user=profile.user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+
+        pool = MazePool([8], low_watermark=0, high_watermark=1)
+        pool.fill()
+        pooled = list(pool._mazes[8])[0]
+        with mock.patch("maze.views.get_maze_pool", return_value=pool):
+            response = self.client.get(
+                reverse("maze_configurations-random_maze"), {"size": 8}
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["level_configuration"], pooled)
+        self.assertEqual(len(pool), 0)
+
+    def test_metrics_requires_admin(self):
+        """
+        Test that only admins can read the metrics
+        """
+        self.assertEqual(
+            self.client.get(reverse("metrics")).status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+        admin = User.objects.create_superuser("admin", password="admin")
+        self.client.force_authenticate(admin)
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("maze_pool_hits", response.data)
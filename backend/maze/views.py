@@ -1,13 +1,30 @@
+import json
 import random
+from typing import Iterator
 
-from rest_framework import viewsets
+from django.db import IntegrityError, transaction
+from django.http import StreamingHttpResponse
+from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
 from maze import models
 from maze import serializers
-from maze.generator import Maze
+from maze.algorithms import ALGORITHMS, DEFAULT_ALGORITHM
+from maze.analysis import get_analysis
+from maze.generator import Maze, stream_hex_rows
+from maze.pool import get_maze_pool
+from maze.seeded import get_seeded_maze
+from zigzag_backend.streaming import in_worker_thread
+
+RANDOM_MAX_SIZE = 200
+"""The largest number of rows or columns a random maze can be asked for"""
+STREAM_MAX_SIZE = 2000
+"""The largest number of rows or columns a streamed maze can have"""
+SEED_MAX = 2**63 - 1
+"""The largest seed that fits in the database"""
 
 
 class RunResultViewSet(viewsets.ModelViewSet):
@@ -30,19 +47,122 @@ class MazeConfigurationViewSet(viewsets.ModelViewSet):
     queryset = models.MazeConfiguration.objects.all()
     serializer_class = serializers.MazeConfigurationSerializer
 
+    def perform_create(self, serializer):
+        self._save(serializer)
+
+    def perform_update(self, serializer):
+        self._save(serializer)
+
+    @staticmethod
+    def _save(serializer):
+        """Save a maze, rejecting one that would duplicate a seeded maze"""
+        try:
+            with transaction.atomic():
+                serializer.save()
+        except IntegrityError:
+            raise ValidationError(
+                {"error": "A maze with this seed, algorithm and size already exists"}
+            )
+
     @action(detail=False, url_name="random_maze")
     def random(self, request):
-        """Get a new random maze configuration. It is not saved into the database."""
-        size = random.randint(5, 15)
-        maze_data = Maze(size, size)
+        """
+        Get a new random maze configuration. The `algorithm` query parameter picks
+        the generation algorithm from :mod:`maze.algorithms` (randomized DFS by
+        default) and `size` sets the number of rows and columns, up to
+        RANDOM_MAX_SIZE (a random size from 5 to 15 by default). Default algorithm
+        mazes come from the pre-generated pool when it has one of the right size.
+        Passing a `seed` makes the maze reproducible: the same seed, algorithm and
+        size always give back the same stored maze instead of generating and saving
+        a new one.
+        """
+        algorithm = request.query_params.get("algorithm", DEFAULT_ALGORITHM)
+        if algorithm not in ALGORITHMS:
+            return Response(
+                {"error": f"algorithm must be one of {', '.join(ALGORITHMS)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            seed = _int_param(request, "seed", 0, SEED_MAX)
+            size = _int_param(request, "size", 1, RANDOM_MAX_SIZE)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if seed is not None:
+            if size is None:
+                size = random.Random(seed).randint(5, 15)
+            maze = get_seeded_maze(seed, algorithm, size)
+            return Response(self.serializer_class(maze).data)
+
+        if size is None:
+            size = random.randint(5, 15)
+        pool = get_maze_pool() if algorithm == DEFAULT_ALGORITHM else None
+        level_configuration = pool.pop(size) if pool else None
+        if level_configuration is None:
+            level_configuration = Maze(size, size, algorithm).hex_grid
         maze = models.MazeConfiguration()
         maze.start_row, maze.start_col = 0, 0
         maze.end_row, maze.end_col = size - 1, size - 1
-        maze.level_configuration = maze_data.hex_grid
+        maze.level_configuration = level_configuration
+        maze.algorithm = algorithm
+        get_analysis(maze)  # Analyse before saving so it is stored with the maze
         maze.save()  # Include this to save it in the database
         maze_ser = self.serializer_class(maze).data
         return Response(maze_ser)
 
+    @action(detail=False, url_name="stream_maze")
+    def stream(self, request):
+        """
+        Stream a new random maze generated row by row with Eller's algorithm, for
+        mazes too large to build in memory. The `rows` and `cols` (or `size`) query
+        parameters set the dimensions, up to STREAM_MAX_SIZE, and an optional `seed`
+        makes it reproducible. It is not saved into the database, so the response
+        has no id.
+        """
+        try:
+            size = _int_param(request, "size", 1, STREAM_MAX_SIZE)
+            rows = _int_param(request, "rows", 1, STREAM_MAX_SIZE, size)
+            cols = _int_param(request, "cols", 1, STREAM_MAX_SIZE, size)
+            seed = _int_param(request, "seed", 0, SEED_MAX)
+            if rows is None or cols is None:
+                raise ValueError("rows and cols (or size) are required")
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        rng = random if seed is None else random.Random(seed)
+        return StreamingHttpResponse(
+            in_worker_thread(_maze_json_chunks(rows, cols, rng)),
+            content_type="application/json",
+        )
+
+
+def _int_param(request, name: str, low: int, high: int, default=None):
+    """
+    Read an optional integer query parameter.
+
+    :raises ValueError: If the parameter is not an integer from low to high
+    """
+    value = request.query_params.get(name)
+    if value is None:
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer")
+    if not low <= value <= high:
+        raise ValueError(f"{name} must be between {low} and {high}")
+    return value
+
+
+def _maze_json_chunks(rows: int, cols: int, rng) -> Iterator[str]:
+    """Encode a streamed maze as JSON in the shape of a maze configuration"""
+    header = {"name": "", "start_row": 0, "start_col": 0}
+    header.update(end_row=rows - 1, end_col=cols - 1)
+    yield json.dumps(header)[:-1] + ', "level_configuration": ['
+    for r, row in enumerate(stream_hex_rows(rows, cols, rng)):
+        yield ('["' if r == 0 else ', ["') + '", "'.join(row) + '"]'
+    yield "]}"
+
 
 class RobotConfigurationViewSet(viewsets.ModelViewSet):
     """
@@ -1,7 +1,13 @@
+from django.utils import timezone
 from hypothesis import given
 from hypothesis.extra.django import TestCase, from_model
 from hypothesis.strategies import text, datetimes, timezones
+from rest_framework.reverse import reverse
+from rest_framework.test import APITestCase
 
+from accounts.models import Profile
+from accounts.tests import user_profiles
+from maze.models import RunResult
 from tournament.models import Tournament
 
 
@@ -25,3 +31,38 @@ class TournamentTest(TestCase):
     def test_tournament_name(self, tournament):
         """Check if a tournament receives the correct name."""
         self.assertEqual(tournament.name, str(tournament))
+
+
+class LeaderboardTest(APITestCase, TestCase):
+    """Tests for the tournament leaderboard"""
+
+    @given(profile=user_profiles(), other=user_profiles())
+    def test_partial_leaderboard(self, profile: Profile, other: Profile):
+        """Check that the partial leaderboard ranks unfinished runs by proximity."""
+        tournament = Tournament.create("t", timezone.now(), timezone.now())
+        for run_profile, did_win, duration, proximity in [
+            (profile, False, 3, 0.5),
+            (other, False, 9, 0.75),
+            (profile, False, 1, None),
+        ]:
+            RunResult.objects.create(
+                timestamp=timezone.now(),
+                duration=duration,
+                did_win=did_win,
+                run_error="",
+                result_data={},
+                proximity=proximity,
+                profile=run_profile,
+                tournament=tournament,
+            )
+        self.client.force_authenticate(profile.user)
+        url = reverse("tournament-leaderboard", args=[tournament.pk])
+
+        self.assertEqual(self.client.get(url).json(), [])
+        for false in ("false", "0", "no"):
+            self.assertEqual(self.client.get(url, {"partial": false}).json(), [])
+        leaderboard = self.client.get(url, {"partial": "true"}).json()
+        self.assertEqual(
+            [(entry["profile"], entry["proximity"]) for entry in leaderboard],
+            [(other.pk, 0.75), (profile.pk, 0.5)],
+        )
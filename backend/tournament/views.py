@@ -23,9 +23,19 @@ class TournamentViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, url_name="leaderboard", methods=["GET"])
     def leaderboard(self, request, pk=None):
-        """Get the leaderboard of the tournament"""
+        """
+        Get the leaderboard of the tournament. With the `partial` query parameter set
+        to true or 1, robots that did not finish are ranked too, by how close they
+        got to the goal.
+        """
         tournament = Tournament.objects.get(pk=pk)
-        results = tournament.run_results.filter(did_win=True).order_by("duration")
+        partial = request.query_params.get("partial", "").lower() in ("1", "true")
+        if partial:
+            results = tournament.run_results.filter(proximity__isnull=False).order_by(
+                "-proximity", "duration"
+            )
+        else:
+            results = tournament.run_results.filter(did_win=True).order_by("duration")
         leaderboard = []
         seen = set()
         for result in results:
@@ -0,0 +1,102 @@
+import bisect
+import threading
+from typing import Dict, Sequence, Union
+
+
+class Counter:
+    """A thread-safe number that can be changed from any thread"""
+
+    def __init__(self, name: str, description: str = ""):
+        self.name = name
+        self.description = description
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        """Add `amount` to the counter"""
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount=1):
+        """Subtract `amount` from the counter, for counters that track a level"""
+        self.inc(-amount)
+
+    @property
+    def value(self):
+        return self._value
+
+
+class Histogram:
+    """A thread-safe count of observations in buckets of increasing upper bounds"""
+
+    def __init__(self, name: str, description: str, buckets: Sequence[float]):
+        """
+        :param name: Unique name of the histogram
+        :param description: What the histogram measures
+        :param buckets: The upper bounds of the buckets in increasing order, an
+        unbounded bucket is added for anything above the last
+        """
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        """Count `value` in the first bucket whose upper bound it is at most"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    @property
+    def value(self) -> Dict:
+        """The cumulative count of each bucket, the total count and the sum"""
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        cumulative, buckets = 0, {}
+        for bound, count in zip([*map(str, self.buckets), "+Inf"], counts):
+            cumulative += count
+            buckets[bound] = cumulative
+        return {"buckets": buckets, "count": cumulative, "sum": total}
+
+
+_registry: Dict[str, Union[Counter, Histogram]] = {}
+_registry_lock = threading.Lock()
+
+
+def counter(name: str, description: str = "") -> Counter:
+    """
+    Get the counter registered under `name`, creating it the first time
+
+    :param name: Unique name of the counter, e.g. ``maze_pool_hits``
+    :param description: What the counter counts
+    :return: The shared counter
+    """
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = Counter(name, description)
+        return _registry[name]
+
+
+def histogram(name: str, description: str, buckets: Sequence[float]) -> Histogram:
+    """
+    Get the histogram registered under `name`, creating it the first time
+
+    :param name: Unique name of the histogram, e.g. ``simulator_latency_seconds``
+    :param description: What the histogram measures
+    :param buckets: The upper bounds of its buckets, used when it is created
+    :return: The shared histogram
+    """
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = Histogram(name, description, buckets)
+        return _registry[name]
+
+
+def snapshot() -> Dict[str, Union[float, Dict]]:
+    """Get the current value of every registered counter and histogram"""
+    with _registry_lock:
+        metrics = list(_registry.values())
+    return {metric.name: metric.value for metric in metrics}
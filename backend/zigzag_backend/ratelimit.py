@@ -0,0 +1,55 @@
+import threading
+import time
+from typing import Callable
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket. It holds at most `burst` tokens and refills at
+    `rate` tokens per second, so it allows bursts of `burst` calls and an average
+    of `rate` calls per second after that.
+    """
+
+    def __init__(
+        self, rate: float, burst: int, clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        :param rate: Tokens added per second
+        :param burst: Most tokens the bucket holds, it starts full
+        :param clock: Gives the current time in seconds, for tests
+        """
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def take(self, cost: int = 1) -> float:
+        """
+        Take tokens if there are enough.
+
+        :param cost: Number of tokens to take, at most burst
+        :return: 0 if the tokens were taken, otherwise the seconds until there are
+        enough
+        """
+        if cost > self.burst:
+            raise ValueError(f"Cannot take {cost} tokens from a burst of {self.burst}")
+        with self._lock:
+            now = self.clock()
+            elapsed = now - self._updated
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+            self._updated = now
+            if self._tokens >= cost:
+                self._tokens -= cost
+                return 0.0
+            return (cost - self._tokens) / self.rate
+
+    def give_back(self, cost: int = 1):
+        """
+        Return tokens taken for a call that did not go ahead after all.
+
+        :param cost: Number of tokens to return
+        """
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + cost)
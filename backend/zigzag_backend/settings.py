@@ -156,7 +156,130 @@ STATIC_URL = "backend_static/"
 STATIC_ROOT = "/static"
 MEDIA_ROOT = "/media"
 
+# Replays
+# The telemetry of every successful run is compressed and appended to a file per
+# day in ROOT. It must not be under MEDIA_ROOT, which is served publicly.
+REPLAYS = {
+    "ENABLED": bool(strtobool(os.environ.get("REPLAYS_ENABLED", "True"))),
+    "ROOT": os.environ.get("REPLAY_ROOT", "/replays"),
+    "COMPRESS_LEVEL": 6,
+}
+
+# Caches
+# "simulations" holds simulator responses to replay for identical submissions,
+# evicting the least recently used once it holds MAX_ENTRIES
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "simulations": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "simulations",
+        "TIMEOUT": int(os.environ.get("SIMULATION_CACHE_TIMEOUT", 24 * 60 * 60)),
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.environ.get("SIMULATION_CACHE_ENTRIES", 10000))
+        },
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# Maze generation
+# Number of seeded mazes whose database row is remembered in each process, and for
+# how many seconds
+MAZE_SEED_CACHE_SIZE = int(os.environ.get("MAZE_SEED_CACHE_SIZE", 1024))
+MAZE_SEED_CACHE_TIMEOUT = 30
+# Pre-generated mazes served by the random maze endpoint. Each size in SIZES is
+# refilled up to HIGH_WATERMARK mazes once it falls below LOW_WATERMARK.
+MAZE_POOL = {
+    "ENABLED": bool(strtobool(os.environ.get("MAZE_POOL_ENABLED", "True"))),
+    "SIZES": [*range(5, 16), 25, 50, 100],
+    "LOW_WATERMARK": int(os.environ.get("MAZE_POOL_LOW_WATERMARK", 4)),
+    "HIGH_WATERMARK": int(os.environ.get("MAZE_POOL_HIGH_WATERMARK", 16)),
+}
+
+# Prepared mazes
+# The mazes submissions run in are kept ready to send to the simulator, up to
+# LOCAL_SIZE in each process for LOCAL_TIMEOUT seconds, and in the default cache
+# for TIMEOUT seconds. Other processes only see a changed maze once their copies
+# expire, and the default cache above is per-process too, so TIMEOUT should only
+# be raised above LOCAL_TIMEOUT when it is pointed at a cache shared between
+# processes.
+PREPARED_MAZE_CACHE = {
+    "LOCAL_SIZE": int(os.environ.get("PREPARED_MAZE_CACHE_SIZE", 1024)),
+    "LOCAL_TIMEOUT": 30,
+    "TIMEOUT": int(os.environ.get("PREPARED_MAZE_CACHE_TIMEOUT", 30)),
+}
+
+# Simulation jobs
+# Submissions are queued and run against the simulator by WORKERS threads. At most
+# MAX_QUEUED jobs can be unfinished at once and the latest MAX_JOBS jobs are kept
+# for polling, each for at most TTL seconds after it finishes. EAGER runs each job
+# in the request that submits it.
+SIMULATION_JOBS = {
+    "WORKERS": int(os.environ.get("SIMULATION_WORKERS", 8)),
+    "MAX_QUEUED": int(os.environ.get("SIMULATION_MAX_QUEUED", 256)),
+    "MAX_JOBS": 4096,
+    "TTL": float(os.environ.get("SIMULATION_JOB_TTL", 5 * 60)),
+    "EAGER": False,
+}
+
+# Run result writes
+# Results are saved in bulk once BATCH_SIZE of them are buffered or every
+# FLUSH_INTERVAL seconds. Results that cannot be saved are appended to SPOOL until
+# the database is back. It must not be under MEDIA_ROOT, which is served
+# publicly. EAGER saves each result in its request.
+RESULT_WRITES = {
+    "BATCH_SIZE": int(os.environ.get("RESULT_WRITES_BATCH_SIZE", 100)),
+    "FLUSH_INTERVAL": float(os.environ.get("RESULT_WRITES_FLUSH_INTERVAL", 1)),
+    "SPOOL": os.environ.get("RESULT_SPOOL", "/spool/run-results.jsonl"),
+    "EAGER": False,
+}
+
+# Simulation batches
+# A batch runs one submission against at most MAX_MAZES mazes, sending up to
+# WORKERS of its simulations at once
+SIMULATION_BATCH = {
+    "MAX_MAZES": int(os.environ.get("SIMULATION_BATCH_MAX_MAZES", 50)),
+    "WORKERS": int(os.environ.get("SIMULATION_BATCH_WORKERS", 8)),
+}
+
+# Simulation rate limits
+# Each user can start USER_BURST simulations at once and USER_RATE per second after
+# that, and everyone together GLOBAL_BURST at once and GLOBAL_RATE per second. The
+# limits apply to each process separately, and the buckets of the MAX_USERS most
+# recent users are remembered.
+SIMULATION_RATE = {
+    "ENABLED": bool(strtobool(os.environ.get("SIMULATION_RATE_ENABLED", "True"))),
+    "USER_RATE": float(os.environ.get("SIMULATION_USER_RATE", 0.5)),
+    "USER_BURST": int(os.environ.get("SIMULATION_USER_BURST", 5)),
+    "GLOBAL_RATE": float(os.environ.get("SIMULATION_GLOBAL_RATE", 20)),
+    "GLOBAL_BURST": int(os.environ.get("SIMULATION_GLOBAL_BURST", 50)),
+    "MAX_USERS": 10000,
+}
+
+# Simulation managers
+# Requests are spread over the comma separated SIMULATOR_URLS, going to the
+# healthy simulator with the fewest requests outstanding. A simulator that fails
+# FAILURE_THRESHOLD requests in a row is left alone for RESET_TIMEOUT seconds, and
+# HEALTH_PATH is requested on each one every HEALTH_INTERVAL seconds. Requests
+# share a keep-alive pool of at most MAX_CONNECTIONS connections and connection
+# failures are retried CONNECT_RETRIES times, BACKOFF seconds apart at first and
+# doubling after that. The async endpoint streams responses with at least
+# STREAM_TICKS ticks of telemetry instead of building them in memory.
+SIMULATOR = {
+    "URLS": os.environ.get(
+        "SIMULATOR_URLS",
+        os.environ.get("SIMULATOR_URL", "http://simulation-manager:9999/file"),
+    ).split(","),
+    "TIMEOUT": 15,
+    "MAX_CONNECTIONS": int(os.environ.get("SIMULATOR_MAX_CONNECTIONS", 16)),
+    "CONNECT_RETRIES": 3,
+    "BACKOFF": 0.2,
+    "FAILURE_THRESHOLD": 5,
+    "RESET_TIMEOUT": 10,
+    "HEALTH_PATH": "/hello",
+    "HEALTH_INTERVAL": 5,
+    "STREAM_TICKS": 10000,
+}
@@ -0,0 +1,114 @@
+import asyncio
+import threading
+from typing import Callable, Dict, Hashable, Optional
+
+from zigzag_backend.metrics import Counter
+
+
+class _Call:
+    """One in-flight call and, once it returns, its outcome"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key: the first caller runs the
+    function while the others wait for it, and every caller gets the same result
+    or exception. Once the call returns the key is free again, so results are not
+    cached.
+    """
+
+    def __init__(self, coalesced: Optional[Counter] = None):
+        """
+        :param coalesced: Counts the calls that waited for another caller's result
+        """
+        self.coalesced = coalesced
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Optional[Hashable], fn: Callable, *args):
+        """
+        Call `fn(*args)`, or wait for the call already in flight for `key`.
+
+        :param key: Identifies calls that have the same result, calls with a None
+        key are never coalesced
+        :param fn: The function to call
+        :return: What the call returned
+        :raises: Whatever the call raised
+        """
+        if key is None:
+            return fn(*args)
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if leader:
+            try:
+                call.result = fn(*args)
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        else:
+            if self.coalesced is not None:
+                self.coalesced.inc()
+            call.done.wait()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+
+class AsyncSingleFlight:
+    """The asyncio version of :class:`SingleFlight`, for calls on one event loop"""
+
+    def __init__(self, coalesced: Optional[Counter] = None):
+        """
+        :param coalesced: Counts the calls that waited for another caller's result
+        """
+        self.coalesced = coalesced
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Optional[Hashable], fn: Callable, *args):
+        """
+        Await `fn(*args)`, or wait for the call already in flight for `key`.
+
+        :param key: Identifies calls that have the same result, calls with a None
+        key are never coalesced
+        :param fn: The coroutine function to call
+        :return: What the call returned
+        :raises: Whatever the call raised
+        """
+        if key is None:
+            return await fn(*args)
+        future = self._calls.get(key)
+        if future is not None and future.get_loop() is asyncio.get_running_loop():
+            if self.coalesced is not None:
+                self.coalesced.inc()
+            # Shielded so that a waiter giving up does not cancel the call
+            return await asyncio.shield(future)
+
+        future = self._calls[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await fn(*args)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # Retrieved, so an unawaited future is not logged
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            if self._calls.get(key) is future:
+                del self._calls[key]
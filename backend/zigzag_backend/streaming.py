@@ -0,0 +1,24 @@
+import itertools
+from typing import AnyStr, AsyncIterator, Iterator
+
+from asgiref.sync import sync_to_async
+
+
+async def in_worker_thread(
+    chunks: Iterator[AnyStr], batch: int = 64
+) -> AsyncIterator[AnyStr]:
+    """
+    Run a synchronous iterator of str or bytes in a worker thread `batch` items at
+    a time. Django buffers synchronous iterators completely when serving them over
+    ASGI, so this keeps streamed responses incremental without blocking the event
+    loop.
+    """
+
+    def join_batch():
+        part = list(itertools.islice(chunks, batch))
+        # Join with an empty str or bytes, whichever the chunks are
+        return part[0][:0].join(part) if part else None
+
+    take = sync_to_async(join_batch, thread_sensitive=False)
+    while (part := await take()) is not None:
+        yield part
@@ -1,3 +1,6 @@
+import os
+import tempfile
+
 from django.contrib.auth.hashers import BasePasswordHasher
 
 from zigzag_backend.settings import *  # noqa: F403
@@ -14,6 +17,35 @@ DATABASES = {
 
 PASSWORD_HASHERS = ("zigzag_backend.test_settings.PlaintextPasswordHasher",)
 
+# Keep random mazes generated in the request so seeded tests are deterministic
+MAZE_POOL = {**MAZE_POOL, "ENABLED": False}  # noqa: F405
+
+# Always reach the simulator so each test sees the response it sets up
+CACHES = {
+    **CACHES,  # noqa: F405
+    "simulations": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+}
+
+# Run simulation jobs in the request so their results can be checked straight away
+SIMULATION_JOBS = {**SIMULATION_JOBS, "EAGER": True}  # noqa: F405
+
+# Save run results in the request so tests can query them straight away
+RESULT_WRITES = {
+    **RESULT_WRITES,  # noqa: F405
+    "SPOOL": os.path.join(tempfile.mkdtemp(prefix="zigzag-spool-"), "results.jsonl"),
+    "EAGER": True,
+}
+
+# Only check the simulator's health when a test asks to
+SIMULATOR = {**SIMULATOR, "HEALTH_INTERVAL": 0}  # noqa: F405
+
+# Let tests submit as often as they need to
+SIMULATION_RATE = {**SIMULATION_RATE, "ENABLED": False}  # noqa: F405
+
+# Write files somewhere that does not need to exist on the test machine
+MEDIA_ROOT = tempfile.mkdtemp(prefix="zigzag-media-")
+REPLAYS = {**REPLAYS, "ROOT": tempfile.mkdtemp(prefix="zigzag-replays-")}  # noqa: F405
+
 
 class PlaintextPasswordHasher(BasePasswordHasher):
     """
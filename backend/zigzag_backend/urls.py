@@ -44,6 +44,7 @@ urlpatterns = [
     path("admin/doc/", include("django.contrib.admindocs.urls")),
     path("admin/", admin.site.urls),
     path("backend/", include(router.urls)),
+    path("backend/metrics/", views.metrics, name="metrics"),
     path(r"backend/auth/", include("djoser.urls")),
     path(r"backend/auth/", include("djoser.urls.authtoken")),
     path(r"backend/communication/", include("communication.urls")),
@@ -1,8 +1,13 @@
 from django.contrib.auth.models import User, Group
 from rest_framework import viewsets
+from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import (
+    IsAdminUser,
     IsAuthenticated,
 )
+from rest_framework.response import Response
+
+from zigzag_backend import metrics as metrics_registry
 from zigzag_backend.serializers import UserSerializer, GroupSerializer
 
 
@@ -25,3 +30,13 @@ class GroupViewSet(viewsets.ModelViewSet):
     queryset = Group.objects.all()
     serializer_class = GroupSerializer
     permission_classes = [IsAuthenticated]
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def metrics(request):
+    """
+    API endpoint that reports the value of every counter in this process for
+    monitoring.
+    """
+    return Response(metrics_registry.snapshot())
@@ -13,6 +13,9 @@ import { useNavigate } from "react-router-dom";
  *   getRandomMaze: function(): Promise<object>
  * }}
  */
+/** How long to wait between polls of a simulation job, in milliseconds */
+const SIMULATION_POLL_INTERVAL = 500;
+
 export default function useBackend() {
   const [isAuthenticated, setIsAuthenticated] = useState(false);
   const [userProfile, setUserProfile] = useState(null);
@@ -121,15 +124,29 @@ export default function useBackend() {
    */
   function submitUserEntry(userCode, maze_id) {
     console.log("submitting tournament entry");
-    return authenticatedPOST("/backend/communication/receive_file/", {
+    return submitSimulationJob({
       user_code: userCode,
       maze_id: maze_id,
     });
   }
 
+  /**
+   * Submit user code to run against several mazes at once
+   *
+   * @param userCode - The user's java code
+   * @param mazeIds - The database pks of the mazes
+   * @returns {Promise} - A promise that resolves with the result of each maze
+   */
+  function submitPracticeSet(userCode, mazeIds) {
+    return authenticatedPOST("/backend/communication/receive_batch/", {
+      user_code: userCode,
+      maze_ids: mazeIds,
+    }).then((res) => pollSimulationJob(res.data.job_id));
+  }
+
   function submitTournamentEntry(userCode, tournament_id) {
     console.log("submitting tournament entry", tournament_id);
-    return authenticatedPOST("/backend/communication/receive_file/", {
+    return submitSimulationJob({
       user_code: userCode,
       tournament_id: tournament_id,
     });
@@ -240,6 +257,7 @@ export default function useBackend() {
     doLogout,
     getRandomMaze,
     submitUserEntry,
+    submitPracticeSet,
     getSnippets,
     createSnippet,
     submitTournamentEntry,
@@ -269,6 +287,37 @@ function authenticatedGET(address) {
   });
 }
 
+/**
+ * Queues a simulation job and waits for it to finish.
+ *
+ * @param {object} data - The user code and the maze or tournament to run it in.
+ * @returns {Promise} - A Promise that resolves to the response of the finished simulation.
+ */
+function submitSimulationJob(data) {
+  return authenticatedPOST("/backend/communication/receive_file/", data).then(
+    (res) => pollSimulationJob(res.data.job_id)
+  );
+}
+
+/**
+ * Polls a simulation job until the backend has its response.
+ *
+ * @param {string} jobId - The id of the job returned when it was queued.
+ * @returns {Promise} - A Promise that resolves to the response of the finished simulation.
+ */
+function pollSimulationJob(jobId) {
+  return authenticatedGET(`/backend/communication/jobs/${jobId}/`).then(
+    (res) => {
+      if (res.status !== 202) {
+        return res;
+      }
+      return new Promise((resolve) =>
+        setTimeout(resolve, SIMULATION_POLL_INTERVAL)
+      ).then(() => pollSimulationJob(jobId));
+    }
+  );
+}
+
 /**
  * Sends a POST request to the specified address with the provided data, including an authorization token in the headers.
  *